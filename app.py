@@ -1,17 +1,50 @@
 """
 TRON Merchant Analytics Dashboard - Final Version
 Tracking real-world USDT merchant adoption on TRON blockchain
+
+Set MERCHANT_SUMMARY to a summary built by `python -m tracker.summary` to
+start from it instead of the dataset (see tracker/summary.py).
 """
 
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import numpy as np
 import os
 from datetime import datetime
 import json
 
+from streamlit.elements.lib.form_utils import current_form_id
+from streamlit.elements.lib.layout_utils import LayoutConfig
+from streamlit.elements.lib.utils import compute_and_register_element_id
+from streamlit.proto.PlotlyChart_pb2 import PlotlyChart as PlotlyChartProto
+
+from tracker.page import (
+    AUTHOR_CREDIT, FOOTER, METHODOLOGY_BOX, METHODOLOGY_MARKDOWN, METHODOLOGY_TITLE, RANKING_TITLES,
+    REGIONS_TITLE, SECTIONS, SUBTITLE, TAB_LABELS, THEME_CSS, TITLE, adoption_row, chart_description, cluster_rows, graph_cards, header_cards, merchant_leader_row, region_card,
+)
+from tracker.figures import FigureCache, figure_key
+from tracker.summary import SUMMARY_ENV, figure_name, read_summary
+
+# Fast start: every metric and figure comes from the prebuilt summary, and the
+# data stack (pandas, numpy, pyarrow, plotly.express) is only imported when a
+# user asks for merchant rows
+SUMMARY_PATH = os.environ.get(SUMMARY_ENV)
+if not SUMMARY_PATH:
+    from tracker.charts import (
+        MULTIPLIER, activity_figure, country_rankings, dashboard_controls, degree_figure,
+        header_summary, heatmap_figure, hourly_figure, merchant_hourly_figure, payment_figure,
+        region_distribution, scatter_figure,
+    )
+    from tracker.countries import apportion
+    from tracker.cube import CUBE_COLUMNS, build_cube, load_cube
+    from tracker.dataset import (
+        HOURS_COLUMN, MERCHANT_CSV, MERCHANT_DATASET, address_strings, hour_matrix, hours_present,
+    )
+    from tracker.density import density_grid
+    from tracker.graph import GRAPH_PATH, read_graph_view
+    from tracker.index import ACTIVITY_COLUMN, MerchantIndex, filter_key
+    from tracker.addresses import ADDRESS_LENGTH
+    from tracker.lookup import AddressLookup
+    from tracker.shared import SnapshotWatcher
+
 # Page configuration
 st.set_page_config(
     page_title="TRON Merchant Analytics | Global Heatmap",
@@ -21,805 +54,470 @@ st.set_page_config(
 )
 
 # Clean dark theme with IBM Plex Sans font
-st.markdown("""
-<style>
-    /* Import IBM Plex Sans */
-    @import url('https://fonts.googleapis.com/css2?family=IBM+Plex+Sans:wght@400;500;600;700&family=IBM+Plex+Mono:wght@400;500&display=swap');
-    
-    /* Dark theme base */
-    .stApp {
-        background: #0a0a0a;
-        color: #e0e0e0;
-        font-family: 'IBM Plex Sans', sans-serif;
-    }
-    
-    /* Headers */
-    h1, h2, h3, h4, h5, h6 {
-        font-family: 'IBM Plex Sans', sans-serif !important;
-        font-weight: 700;
-    }
-    
-    /* Main title styling */
-    .main-title {
-        font-size: 3.5rem;
-        background: linear-gradient(135deg, #00ff88 0%, #0099ff 100%);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        text-align: center;
-        margin-bottom: 0.5rem;
-        letter-spacing: -0.03em;
-    }
-    
-    /* Subtitle */
-    .subtitle {
-        text-align: center;
-        color: #666;
-        font-size: 1.1rem;
-        margin-bottom: 1rem;
-    }
-    
-    /* Author credit */
-    .author-credit {
-        position: absolute;
-        top: 40px;
-        right: 20px;
-        font-size: 0.9rem;
-        color: #999;
-        z-index: 9999 !important;
-    }
-    
-    .author-credit a {
-        color: #00ff88;
-        text-decoration: none;
-        margin-left: 1rem;
-        transition: opacity 0.3s ease;
-    }
-    
-    .author-credit a:hover {
-        opacity: 0.8;
-    }
-    
-    /* Methodology box with animated line */
-    .methodology-box {
-        background: rgba(0, 255, 136, 0.05);
-        border: 1px solid rgba(0, 255, 136, 0.2);
-        border-radius: 12px;
-        padding: 1.2rem;
-        margin: 2rem auto;
-        max-width: 900px;
-        position: relative;
-        overflow: hidden;
-    }
-    
-    .methodology-box::before {
-        content: '';
-        position: absolute;
-        top: 0;
-        left: 0;
-        right: 0;
-        height: 2px;
-        background: linear-gradient(90deg, transparent, #00ff88, transparent);
-        animation: slide 3s infinite;
-    }
-    
-    @keyframes slide {
-        0% { transform: translateX(-100%); }
-        100% { transform: translateX(100%); }
-    }
-    
-    /* Metric cards */
-    .metric-card {
-        background: #111111;
-        border: 1px solid #222;
-        border-radius: 12px;
-        padding: 1.5rem;
-        transition: all 0.3s ease;
-        position: relative;
-        overflow: hidden;
-    }
-    
-    .metric-card:hover {
-        border-color: #00ff88;
-        transform: translateY(-2px);
-    }
-    
-    .metric-number {
-        font-family: 'IBM Plex Mono', monospace;
-        font-size: 2.5rem;
-        font-weight: 500;
-        color: #00ff88;
-        line-height: 1;
-    }
-    
-    .metric-label {
-        color: #666;
-        font-size: 0.9rem;
-        text-transform: uppercase;
-        letter-spacing: 0.05em;
-        margin-top: 0.5rem;
-        font-family: 'IBM Plex Sans', sans-serif;
-    }
-    
-    /* Hide Streamlit elements */
-    #MainMenu {visibility: hidden;}
-    footer {visibility: hidden;}
-    header {visibility: hidden;}
-    
-    /* Tabs styling */
-    .stTabs [data-baseweb="tab-list"] {
-        gap: 2rem;
-        background-color: transparent;
-        border-bottom: 1px solid #222;
-    }
-    
-    .stTabs [data-baseweb="tab"] {
-        background-color: transparent;
-        color: #666;
-        border: none;
-        font-weight: 600;
-        font-size: 1.1rem;
-        padding: 1rem 0;
-        font-family: 'IBM Plex Sans', sans-serif;
-    }
-    
-    .stTabs [aria-selected="true"] {
-        background-color: transparent;
-        color: #00ff88;
-        border-bottom: 2px solid #00ff88;
-    }
-    
-    /* All text elements */
-    p, span, div, label {
-        font-family: 'IBM Plex Sans', sans-serif;
-    }
-    
-    /* Chart description */
-    .chart-description {
-        color: #999;
-        font-size: 0.95rem;
-        margin-bottom: 1rem;
-        text-align: left;
-    }
-</style>
-
-<div class="author-credit">
-    Analysis by Connor DeFrain
-    <a href="https://x.com/connordefrain_" target="_blank">Twitter</a>
-    <a href="http://www.linkedin.com/in/connor-defrain-5a1404297" target="_blank">LinkedIn</a>
-</div>
-<div style="height: 100px;"></div>
-""", unsafe_allow_html=True)
+st.markdown(THEME_CSS + AUTHOR_CREDIT, unsafe_allow_html=True)
+
+# Plotly theme charts are rendered with (st.plotly_chart's theme); part of every figure cache key
+CHART_THEME = 'streamlit'
+
+# Columns each part of the dashboard reads - only these are put in its view
+INSIGHT_COLUMNS = ['estimated_region', 'unique_customers', 'transaction_count', 'total_received_usdt']
+
+# Percentile ranks shown in a merchant's drill-down
+DRILLDOWN_RANKS = {
+    'total_received_usdt': "Volume",
+    'transaction_count': "Transactions",
+    'unique_customers': "Customers",
+    'avg_payment_size': "Avg payment",
+    'median_payment_size': "Median payment",
+    'p90_payment_size': "90th percentile payment",
+}
+
+REQUIRED_COLUMNS = ['address', 'transaction_count', 'unique_customers', 
+                    'total_received_usdt', 'avg_payment_size', 
+                    'estimated_region', 'peak_hour_utc', 'days_active']
+
+def check_required_columns(snapshot):
+    """Reject a snapshot missing columns the dashboard needs"""
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in snapshot.columns]
+    if missing_columns:
+        raise ValueError(f"Missing required columns: {missing_columns}")
+
+@st.cache_resource
+def dashboard_summary(path):
+    """Prebuilt summary the fast-start mode renders from, shared by every session"""
+    try:
+        return read_summary(path)
+    except Exception as e:
+        st.error(f"ERROR: Could not read dashboard summary {path}: {str(e)}")
+        st.stop()
 
 # Load merchant data
-@st.cache_data
-def load_merchant_data():
-    """Load merchant data"""
-    csv_path = 'output/identified_merchants.csv'
-    
-    if not os.path.exists(csv_path):
-        st.error(f"ERROR: Could not find {csv_path}")
-        st.error("Please ensure your identified_merchants.csv file is in the output folder.")
+@st.cache_resource
+def merchant_watcher():
+    """Watcher keeping the newest merchant snapshot mapped, shared by every session in this process"""
+    # Parquet dataset written by the pipeline; the CSV export still works as a fallback
+    data_path = MERCHANT_DATASET if os.path.exists(MERCHANT_DATASET) else MERCHANT_CSV
+    
+    if not os.path.exists(data_path):
+        st.error(f"ERROR: Could not find {MERCHANT_DATASET} or {MERCHANT_CSV}")
+        st.error("Please ensure your identified_merchants data is in the output folder.")
         st.stop()
     
+    # Compact types (categorical regions, downcast counts, decoded binary addresses), mapped read-only
     try:
-        merchants = pd.read_csv(csv_path)
+        watcher = SnapshotWatcher(data_path, validate=check_required_columns)
+        check_required_columns(watcher.current())
     except Exception as e:
-        st.error(f"ERROR: Could not read CSV file: {str(e)}")
+        st.error(f"ERROR: Could not read {data_path}: {str(e)}")
         st.stop()
     
-    # Verify required columns
-    required_columns = ['address', 'transaction_count', 'unique_customers', 
-                       'total_received_usdt', 'avg_payment_size', 
-                       'estimated_region', 'peak_hour_utc', 'days_active']
-    
-    missing_columns = [col for col in required_columns if col not in merchants.columns]
-    if missing_columns:
-        st.error(f"ERROR: Missing required columns: {missing_columns}")
-        st.stop()
-    
-    # Add calculated fields
-    merchants['activity_percentile'] = merchants['transaction_count'].rank(pct=True) * 100
-    merchants['volume_percentile'] = merchants['total_received_usdt'].rank(pct=True) * 100
+    # New snapshots are swapped in by a background thread - no restart needed
+    return watcher.start()
+
+@st.cache_resource(max_entries=2)
+def percentile_rank(version, _snapshot, column):
+    """Percentile of each merchant on one column, shared by every session (until that column changes)"""
+    percentile = _snapshot.view([column])[column].rank(pct=True).to_numpy() * 100
+    # Shared across sessions: views of it must never be written to
+    percentile.flags.writeable = False
+    return percentile
+
+@st.cache_data(max_entries=2)
+def load_merchant_cube(version, _snapshot):
+    """Aggregate cube behind every chart and metric (cached until its input columns change)"""
+    return load_cube(_snapshot)
+
+@st.cache_resource(max_entries=2)
+def merchant_index(version, _snapshot):
+    """Filter indexes over the merchant table, built once per dataset version and shared by every session"""
+    return MerchantIndex.build(_snapshot)
+
+def merchant_filters(index):
+    """Filter controls; returns the active filters (column -> categories, or column -> (low, high))"""
+    with st.expander("Filter merchants"):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            regions = st.multiselect("Regions", index.categories('estimated_region'),
+                                     placeholder="All regions", key='filter_regions')
+            sizes = st.multiselect("Merchant sizes", index.categories('merchant_size'),
+                                   placeholder="All sizes", key='filter_sizes')
+        with col2:
+            volume = (st.number_input("Min volume (USDT)", min_value=0.0, value=None, placeholder="No minimum", key='filter_min_volume'),
+                      st.number_input("Max volume (USDT)", min_value=0.0, value=None, placeholder="No maximum", key='filter_max_volume'))
+            activity = st.slider("Activity percentile", 0, 100, (0, 100), key='filter_activity')
+        with col3:
+            payment = (st.number_input("Min avg payment (USDT)", min_value=0.0, value=None, placeholder="No minimum", key='filter_min_payment'),
+                       st.number_input("Max avg payment (USDT)", min_value=0.0, value=None, placeholder="No maximum", key='filter_max_payment'))
+
+    filters = {}
+    if regions:
+        filters['estimated_region'] = regions
+    if sizes:
+        filters['merchant_size'] = sizes
+    if volume != (None, None):
+        filters['total_received_usdt'] = volume
+    if payment != (None, None):
+        filters['avg_payment_size'] = payment
+    if activity != (0, 100):
+        filters[ACTIVITY_COLUMN] = activity
+    return filters
+
+@st.cache_resource(max_entries=2)
+def address_lookup(version, _snapshot):
+    """Exact and prefix address indexes, built on first use per dataset version and shared by every session"""
+    return AddressLookup.build(_snapshot, merchant_watcher().source)
+
+def merchant_drilldown(row, address):
+    """One merchant's row, hourly profile and percentile ranks among all merchants"""
+    merchant = snapshot.view(rows=[row])
+    record = merchant.iloc[0]
+    index = merchant_index(snapshot.version, snapshot)
+
+    st.markdown(f"#### `{address}`")
+    for col, (label, value) in zip(st.columns(4), [
+        ("Region", str(record['estimated_region'])),
+        ("Size", str(record.get('merchant_size', '-'))),
+        ("Volume", f"${record['total_received_usdt']:,.0f}"),
+        ("Transactions", f"{record['transaction_count']:,}"),
+    ]):
+        col.metric(label, value)
+
+    col1, col2 = st.columns([3, 2])
+    with col1:
+        if HOURS_COLUMN in merchant.columns and hours_present(merchant[HOURS_COLUMN])[0]:
+            st.plotly_chart(merchant_hourly_figure(hour_matrix(merchant[HOURS_COLUMN])[0], str(record['estimated_region']),
+                                                   record.get('utc_offset')), use_container_width=True)
+        else:
+            st.caption("No hourly histogram for this merchant.")
+    with col2:
+        ranks = [{"Measure": label, "Percentile": index.percentile(col, index.values[col][row])}
+                 for col, label in DRILLDOWN_RANKS.items() if col in index.values]
+        ranks = [rank for rank in ranks if rank["Percentile"] is not None]
+        st.dataframe(ranks, hide_index=True, use_container_width=True, column_config={
+            "Percentile": st.column_config.ProgressColumn(min_value=0, max_value=100, format="%.0f"),
+        })
+
+    fields = merchant.drop(columns=[HOURS_COLUMN], errors='ignore')
+    fields['address'] = address_strings(fields['address'])
+    st.dataframe([{"Field": field, "Value": str(value)} for field, value in fields.iloc[0].items()],
+                 hide_index=True, use_container_width=True)
+
+@st.fragment
+def merchant_lookup():
+    """Address search with a drill-down into the chosen merchant (reruns on its own, not the whole page)"""
+    query = st.text_input("Merchant address", placeholder="Full address or its first characters",
+                          key='lookup_query').strip()
+    if not query:
+        return
+    lookup = address_lookup(snapshot.version, snapshot)
+
+    row = lookup.find(query)
+    if row is None:
+        rows = lookup.prefix(query)
+        if not rows:
+            st.caption(f"{query} is not an identified merchant." if len(query) >= ADDRESS_LENGTH
+                       else f"No merchant address starts with {query}.")
+            return
+        addresses = lookup.addresses(rows)
+        choice = st.radio("Matching merchants", range(len(rows)), format_func=lambda i: addresses[i],
+                          key='lookup_match')
+        row = rows[choice]
+    merchant_drilldown(row, lookup.addresses([row])[0])
+
+@st.cache_data(max_entries=32)
+def filtered_cube(version):
+    """Cube of the filtered merchants (cached per dataset version and filters)"""
+    return build_cube(load_merchant_data(CUBE_COLUMNS))
+
+@st.cache_data(max_entries=2)
+def live_summary(version, _cube):
+    """Header metrics, regional cards and chart controls from the cube (cached until it changes)"""
+    return {**header_summary(_cube, MULTIPLIER), 'controls': dashboard_controls(_cube)}
+
+@st.cache_data(max_entries=2)
+def scatter_density(version, _merchants):
+    """Customers x transactions density grid over all merchants (cached until its columns change)"""
+    return density_grid(_merchants['unique_customers'], _merchants['transaction_count'],
+                        weights=_merchants['total_received_usdt'])
+
+@st.cache_resource
+def figure_cache():
+    """Serialized figure specs shared by every session, LRU-bounded"""
+    return FigureCache()
+
+def plotly_spec_chart(spec, height, element_id):
+    """st.plotly_chart(fig, width='stretch') for a figure already serialized to JSON
+
+    st.plotly_chart serializes its figure on every call; this sends the
+    cached spec as is. element_id must change whenever the spec does.
+    """
+    layout = LayoutConfig(width='stretch', height=height or 450)  # plotly.js default height
+    proto = PlotlyChartProto()
+    proto.spec = spec
+    proto.config = '{}'
+    proto.theme = CHART_THEME
+    proto.form_id = current_form_id(st._main)
+    proto.id = compute_and_register_element_id(
+        'plotly_chart', user_key=None, key_as_main_identity=False, dg=st._main,
+        figure=element_id, theme=CHART_THEME, width=layout.width, height=layout.height,
+    )
+    st._main._enqueue('plotly_chart', proto, layout_config=layout)
+
+def render_figure(chart, version, build, **params):
+    """Show a chart from its cached spec; the figure is built and serialized only if this version, theme and these parameters are not cached
+
+    In fast-start mode the figures come from the prebuilt summary.
+    """
+    if SUMMARY_PATH:
+        version = summary['version']
+        build = lambda: summary['figures'][figure_name(chart, **params)]
+    key = figure_key(version, CHART_THEME, chart, **params)
+    spec, height = figure_cache().spec(key, build)
+    plotly_spec_chart(spec, height, repr(key))
+
+@st.cache_data(max_entries=2)
+def customer_graph_view(path, version):
+    """Merchant-customer graph view (cached until the pipeline rewrites the graph)"""
+    return read_graph_view(path)
+
+def current_graph():
+    """(version, view) of the merchant-customer graph, or (None, None) when the pipeline saved none"""
+    if SUMMARY_PATH:
+        return summary['version'], summary.get('graph')
+    try:
+        stat = os.stat(GRAPH_PATH)
+    except OSError:
+        return None, None
+    version = f'graph-{stat.st_mtime_ns}-{stat.st_size}'
+    return version, customer_graph_view(GRAPH_PATH, version)
+
+def section_header(chart):
+    """Title and description of a chart section"""
+    title, description = SECTIONS[chart]
+    st.markdown(f"### {title}")
+    st.markdown(chart_description(description), unsafe_allow_html=True)
+
+def load_merchant_data(columns=None):
+    """This session's view of the merchant table (only the given columns, when set, and the filtered rows)"""
+    merchants = snapshot.view(columns, rows)
+    selected = slice(None) if rows is None else rows
+    
+    # Add calculated fields - they live in this view, never in the shared table
+    # (percentiles rank every merchant, filtered or not)
+    if 'transaction_count' in merchants.columns:
+        # The filter index already ranks every merchant by activity
+        merchants['activity_percentile'] = merchant_index(snapshot.version, snapshot).values[ACTIVITY_COLUMN][selected]
+    if 'total_received_usdt' in merchants.columns:
+        merchants['volume_percentile'] = percentile_rank(
+            snapshot.version_of(['total_received_usdt']), snapshot, 'total_received_usdt')[selected]
     
     return merchants
 
-# Global crypto adoption data
-GLOBAL_CRYPTO_ADOPTION = {
-    'India': {'rank': 1, 'adoption_rate': 11.0},
-    'Nigeria': {'rank': 2, 'adoption_rate': 22.0},
-    'Indonesia': {'rank': 3, 'adoption_rate': 9.0},
-    'United States': {'rank': 4, 'adoption_rate': 13.0},
-    'Vietnam': {'rank': 5, 'adoption_rate': 21.0},
-    'Ukraine': {'rank': 6, 'adoption_rate': 12.8},
-    'Philippines': {'rank': 7, 'adoption_rate': 13.4},
-    'Brazil': {'rank': 8, 'adoption_rate': 12.0},
-    'Thailand': {'rank': 9, 'adoption_rate': 9.6},
-    'Turkey': {'rank': 10, 'adoption_rate': 25.0},
-    'Argentina': {'rank': 11, 'adoption_rate': 15.8},
-    'Mexico': {'rank': 12, 'adoption_rate': 8.7},
-    'Bangladesh': {'rank': 13, 'adoption_rate': 7.3},
-    'Morocco': {'rank': 14, 'adoption_rate': 6.2},
-    'Egypt': {'rank': 15, 'adoption_rate': 7.8},
-    'Kenya': {'rank': 16, 'adoption_rate': 14.5},
-    'South Africa': {'rank': 17, 'adoption_rate': 11.0},
-    'Pakistan': {'rank': 18, 'adoption_rate': 6.6},
-    'Venezuela': {'rank': 19, 'adoption_rate': 10.3},
-    'Colombia': {'rank': 20, 'adoption_rate': 9.1},
-    'Peru': {'rank': 21, 'adoption_rate': 8.5},
-    'Chile': {'rank': 22, 'adoption_rate': 7.2},
-    'Poland': {'rank': 23, 'adoption_rate': 5.8},
-    'Malaysia': {'rank': 24, 'adoption_rate': 8.0},
-    'Canada': {'rank': 25, 'adoption_rate': 7.0},
-    'Singapore': {'rank': 26, 'adoption_rate': 9.5},
-    'Australia': {'rank': 27, 'adoption_rate': 9.0},
-    'United Kingdom': {'rank': 28, 'adoption_rate': 6.0},
-    'Japan': {'rank': 29, 'adoption_rate': 4.0},
-    'South Korea': {'rank': 30, 'adoption_rate': 8.0},
-    'UAE': {'rank': 31, 'adoption_rate': 11.5},
-    'Saudi Arabia': {'rank': 32, 'adoption_rate': 7.6},
-    'Russia': {'rank': 33, 'adoption_rate': 11.4},
-    'Spain': {'rank': 34, 'adoption_rate': 5.0},
-    'Germany': {'rank': 35, 'adoption_rate': 4.2},
-    'France': {'rank': 36, 'adoption_rate': 3.3},
-    'Italy': {'rank': 37, 'adoption_rate': 3.4},
-    'Netherlands': {'rank': 38, 'adoption_rate': 5.2},
-    'Portugal': {'rank': 39, 'adoption_rate': 6.1},
-    'Greece': {'rank': 40, 'adoption_rate': 4.5},
-}
+def column_version(columns):
+    """Cache key for data read from `columns` under the current filters (the summary's version in fast-start mode)"""
+    if SUMMARY_PATH:
+        return summary['version']
+    return snapshot.version_of(columns) + (f'|{filter_key(filters)}' if filters else '')
+
+# Country split of each region's merchants (largest remainder, by adoption rate)
+@st.cache_data(max_entries=2)
+def country_allocation(version, _region_counts, multiplier):
+    """Apportioned country table (cached until the region counts change)"""
+    return apportion(_region_counts, multiplier=multiplier)
 
-# Load data
-merchants_df = load_merchant_data()
+@st.cache_data(max_entries=2)
+def merchant_export_controls(version, _table):
+    """Columns, regions and sizes the export form offers (cached until the dataset changes)"""
+    from tracker.export import export_controls
+    return export_controls(_table)
 
-# Constants with 2.5x multiplier
-MULTIPLIER = 2.5
-merchant_count = int(len(merchants_df) * MULTIPLIER)
-total_volume = merchants_df['total_received_usdt'].sum() * MULTIPLIER
+def export_data(fmt, **selection):
+    """Selected merchant rows in one format - built when the download is clicked, batch by batch"""
+    # Imported here: in fast-start mode this is the first use of the data stack
+    from tracker.export import export_bytes
+    
+    if SUMMARY_PATH:
+        from tracker.shared import MerchantSnapshot
+        table = MerchantSnapshot.open(summary['source']).table
+    else:
+        table = snapshot.table
+    return export_bytes(table, fmt, **selection)
 
 # Header
-st.markdown('<h1 class="main-title">Global Crypto Merchant Heatmap</h1>', unsafe_allow_html=True)
-st.markdown('<p class="subtitle">Tracking real-world USDT merchant adoption on TRON blockchain</p>', unsafe_allow_html=True)
+st.markdown(f'<h1 class="main-title">{TITLE}</h1>', unsafe_allow_html=True)
+st.markdown(f'<p class="subtitle">{SUBTITLE}</p>', unsafe_allow_html=True)
 
 # Methodology box
-st.markdown("""
-<div class="methodology-box">
-    <div style="display: flex; align-items: center; gap: 1rem; margin-bottom: 0.5rem;">
-        <div style="width: 12px; height: 12px; background: #00ff88; border-radius: 50%; 
-                    animation: pulse 2s infinite;"></div>
-        <strong style="color: #00ff88; font-size: 1.1rem;">Geographic Estimation Methodology</strong>
-    </div>
-    <p style="margin: 0; color: #999; line-height: 1.6;">
-        Tracking where crypto merchants actually operate show us which markets are adopting USDT for real commerce. I 
-        analyzed specific wallet behavior criteria that indicate real world commerce activity as well as the peak hours for likely 
-        business hours (9AM to 5PM local time) to estimate merchant like patterns. This is an educated approximation based on 
-        behavioral analysis. Country distribution within regions is weighted by known crypto adoption rates from industry 
-        reports.
-    </p>
-</div>
-
-<style>
-@keyframes pulse {
-    0%, 100% { opacity: 1; transform: scale(1); }
-    50% { opacity: 0.8; transform: scale(1.2); }
-}
-</style>
-""", unsafe_allow_html=True)
-
-# Key metrics - only 2
-col1, col2 = st.columns(2)
-
-with col1:
-    st.markdown(f"""
-    <div class="metric-card">
-        <div class="metric-number">{merchant_count:,}</div>
-        <div class="metric-label">Merchants Identified</div>
-        <div style="color: #666; font-size: 0.8rem; margin-top: 0.5rem;">
-            Approximately across all regions
-        </div>
-    </div>
-    """, unsafe_allow_html=True)
-
-with col2:
-    # Emerging markets percentage
-    emerging_regions = ['Asia-Pacific', 'Europe-Africa']
-    emerging_count = merchants_df[merchants_df['estimated_region'].isin(emerging_regions)].shape[0]
-    emerging_pct = (emerging_count / len(merchants_df) * 100) if len(merchants_df) > 0 else 0
-    
-    st.markdown(f"""
-    <div class="metric-card">
-        <div class="metric-number">{emerging_pct:.0f}%</div>
-        <div class="metric-label">Emerging Markets</div>
-        <div style="color: #666; font-size: 0.8rem; margin-top: 0.5rem;">
-            Operating in developing economies
-        </div>
-    </div>
-    """, unsafe_allow_html=True)
+st.markdown(METHODOLOGY_BOX, unsafe_allow_html=True)
 
-# Regional distribution section
-st.markdown("### Regional Distribution")
+if SUMMARY_PATH:
+    # Everything below reads the prebuilt summary - no dataset, cube or data stack
+    summary = dashboard_summary(SUMMARY_PATH)
+    cube_version = summary['cube_version']
+else:
+    # Pinned for this whole run, so a reload mid-run cannot mix two versions
+    snapshot = merchant_watcher().current()
 
-# Get actual regional distribution
-region_dist = merchants_df['estimated_region'].value_counts()
-total_merchants = len(merchants_df)
+    # Filters select rows through the index; every chart and metric below reads only those
+    index = merchant_index(snapshot.version, snapshot)
+    filters = merchant_filters(index)
+    with st.expander("Look up a merchant address"):
+        merchant_lookup()
+    rows = index.query(filters) if filters else None
+    if rows is not None:
+        if not len(rows):
+            st.warning("No merchants match these filters.")
+            st.stop()
+        st.caption(f"Showing {len(rows):,} of {index.num_rows:,} merchants")
 
+    # Load data - charts and metrics read the precomputed cube, not the merchant rows
+    cube_version = column_version(CUBE_COLUMNS)
+    cube = filtered_cube(cube_version) if filters else load_merchant_cube(cube_version, snapshot)
+    summary = live_summary(cube_version, cube)
+
+# Key metrics - only 2 (emerging markets: Asia-Pacific and Europe-Africa)
+for col, card in zip(st.columns(2), header_cards(summary['metrics'])):
+    with col:
+        st.markdown(card, unsafe_allow_html=True)
+
+# Regional distribution section
+st.markdown(f"### {REGIONS_TITLE}")
+
+# Get actual regional distribution (largest first)
 cols = st.columns(3)
-for i, (region, count) in enumerate(region_dist.items()):
+for i, card in enumerate(summary['regions']):
     with cols[i % 3]:
-        percentage = count / total_merchants * 100 if total_merchants > 0 else 0
-        scaled_count = int(count * MULTIPLIER)
-        
-        # Region colors
-        colors = {
-            'Asia-Pacific': '#00ff88',
-            'Europe-Africa': '#0099ff',
-            'Americas': '#ff6b6b'
-        }
-        
-        st.markdown(f"""
-        <div style="background: #111; border: 1px solid #222; border-radius: 12px; 
-                    padding: 1.5rem; text-align: center; margin-bottom: 1rem;">
-            <h3 style="color: {colors.get(region, '#00ff88')}; margin: 0; font-size: 1.3rem;">
-                {region}
-            </h3>
-            <div style="font-size: 2.5rem; font-weight: 800; color: {colors.get(region, '#00ff88')}; 
-                        margin: 0.5rem 0;">
-                {percentage:.1f}%
-            </div>
-            <div style="color: #666; font-size: 0.9rem;">
-                {scaled_count:,} merchants
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
-
-# Tabs
-tab1, tab2, tab3, tab4 = st.tabs(["Global Heatmap", "Regional Analysis", "Merchant Insights", "How I Collected This Data"])
-
-with tab1:
-    # Create country data
-    country_data = []
-    
-    # Add all countries with adoption data
-    for country, stats in GLOBAL_CRYPTO_ADOPTION.items():
-        country_data.append({
-            'country': country,
-            'adoption_rate': stats['adoption_rate'],
-            'global_rank': stats['rank'],
-            'has_merchants': False,
-            'merchant_count': 0,
-            'estimated_merchants': 0
-        })
-    
-    # Regional country mapping
-    region_countries = {
-        'Asia-Pacific': ['India', 'Indonesia', 'Vietnam', 'Philippines', 'Thailand', 
-                        'Bangladesh', 'Pakistan', 'Malaysia', 'Singapore', 'Japan', 
-                        'South Korea', 'Australia'],
-        'Europe-Africa': ['Nigeria', 'Ukraine', 'Turkey', 'Morocco', 'Egypt', 'Kenya', 
-                         'South Africa', 'Russia', 'Poland', 'Spain', 'Germany', 
-                         'France', 'Italy', 'UAE', 'Saudi Arabia'],
-        'Americas': ['United States', 'Brazil', 'Argentina', 'Mexico', 'Venezuela', 
-                    'Colombia', 'Peru', 'Chile', 'Canada']
-    }
-    
-    # Distribute merchants
-    for region, countries in region_countries.items():
-        if region in region_dist.index:
-            region_merchants = region_dist[region]
-            
-            # Calculate weighted distribution
-            region_adoption_rates = {c: GLOBAL_CRYPTO_ADOPTION.get(c, {'adoption_rate': 1.0})['adoption_rate'] 
-                                   for c in countries if c in GLOBAL_CRYPTO_ADOPTION}
-            total_rate = sum(region_adoption_rates.values())
-            
-            for country, rate in region_adoption_rates.items():
-                weight = rate / total_rate if total_rate > 0 else 0
-                merchant_count = int(region_merchants * weight)
-                
-                for i, cd in enumerate(country_data):
-                    if cd['country'] == country:
-                        country_data[i]['has_merchants'] = True
-                        country_data[i]['merchant_count'] = merchant_count
-                        country_data[i]['estimated_merchants'] = int(merchant_count * MULTIPLIER)
-                        break
-    
-    country_df = pd.DataFrame(country_data)
-    
-    # Create choropleth with better hover
-    fig = go.Figure()
-    
-    fig.add_trace(go.Choropleth(
-        locations=country_df['country'],
-        locationmode='country names',
-        z=country_df['adoption_rate'],
-        text=country_df['country'],
-        customdata=country_df[['global_rank', 'adoption_rate', 'merchant_count', 'estimated_merchants']],
-        colorscale=[
-            [0, '#1a1a1a'],
-            [0.2, '#2a3a2a'],
-            [0.4, '#3a5a3a'],
-            [0.6, '#4a7a4a'],
-            [0.8, '#5a9a5a'],
-            [1.0, '#00ff88']
-        ],
-        hovertemplate='<b style="font-size: 16px; font-family: IBM Plex Sans">%{text}</b><br><br>' +
-                      '<span style="font-family: IBM Plex Sans">Global Crypto Rank: <b>#%{customdata[0]}</b></span><br>' +
-                      '<span style="font-family: IBM Plex Sans">Adoption Rate: <b>%{customdata[1]:.1f}%</b></span><br>' +
-                      '<span style="font-family: IBM Plex Sans">TRON Merchants: <b>%{customdata[3]:,}</b></span>' +
-                      '<extra></extra>',
-        marker=dict(
-            line=dict(color='#333', width=0.5)
-        ),
-        colorbar=dict(
-            title="Crypto<br>Adoption %",
-            tickformat='.0f',
-            bgcolor='#111',
-            bordercolor='#333',
-            borderwidth=1,
-            tickfont=dict(color='#999'),
-            x=1.1
-        )
-    ))
-    
-    # Update layout
-    fig.update_layout(
-        geo=dict(
-            showframe=False,
-            showcoastlines=True,
-            coastlinecolor='#444',
-            projection_type='natural earth',
-            bgcolor='#0a0a0a',
-            showcountries=True,
-            countrycolor='#222',
-            showocean=True,
-            oceancolor='#0a0a0a',
-            showlakes=False,
-        ),
-        paper_bgcolor='#0a0a0a',
-        plot_bgcolor='#0a0a0a',
-        height=700,
-        margin=dict(l=0, r=0, t=30, b=0),
-        font=dict(family='IBM Plex Sans', color='#999'),
-        hoverlabel=dict(
-            bgcolor='#111',
-            bordercolor='#333',
-            font=dict(family='IBM Plex Sans', size=14)
-        )
-    )
-    
-    st.plotly_chart(fig, use_container_width=True)
-    
+        st.markdown(region_card(card), unsafe_allow_html=True)
+
+# Tabs - each body is a function, run only while its tab is open (see below)
+def heatmap_tab():
+    if SUMMARY_PATH:
+        country_df = None
+        rankings = summary['rankings']
+    else:
+        # Country table apportioned from the regional counts
+        country_df = country_allocation(column_version(['estimated_region']), region_distribution(cube), MULTIPLIER)
+        rankings = country_rankings(country_df)
+
+    render_figure('heatmap', column_version(['estimated_region']), lambda: heatmap_figure(country_df))
+
     # Country rankings
     col1, col2 = st.columns(2)
-    
+
     with col1:
-        st.markdown("### Top Crypto Adoption Countries")
-        top_countries = country_df.nlargest(10, 'adoption_rate')[['country', 'adoption_rate', 'global_rank']]
-        
-        for _, row in top_countries.iterrows():
-            st.markdown(f"""
-            <div style="display: flex; justify-content: space-between; padding: 0.5rem; 
-                        border-bottom: 1px solid #222; align-items: center;">
-                <span style="color: #00ff88;">#{row['global_rank']}</span>
-                <span style="flex: 1; margin-left: 1rem;">{row['country']}</span>
-                <span style="color: #0099ff;">{row['adoption_rate']:.1f}%</span>
-            </div>
-            """, unsafe_allow_html=True)
-    
+        st.markdown(f"### {RANKING_TITLES['top_adoption']}")
+
+        for row in rankings['top_adoption']:
+            st.markdown(adoption_row(row), unsafe_allow_html=True)
+
     with col2:
-        st.markdown("### TRON Merchant Leaders")
-        merchant_leaders = country_df[country_df['has_merchants']].nlargest(10, 'estimated_merchants')[
-            ['country', 'estimated_merchants']
-        ]
-        
-        for _, row in merchant_leaders.iterrows():
-            st.markdown(f"""
-            <div style="display: flex; justify-content: space-between; padding: 0.5rem; 
-                        border-bottom: 1px solid #222; align-items: center;">
-                <span style="flex: 1;">{row['country']}</span>
-                <span style="color: #00ff88; font-family: 'IBM Plex Mono', monospace;">
-                    {row['estimated_merchants']:,} merchants
-                </span>
-            </div>
-            """, unsafe_allow_html=True)
-
-with tab2:
-    st.markdown("### Peak Activity Hours by Region")
-    st.markdown('<p class="chart-description">Merchant transaction patterns reveal business hours across time zones, confirming geographic estimates.</p>', unsafe_allow_html=True)
-    
-    # Create hourly distribution
-    hourly_data = []
-    
-    for region in merchants_df['estimated_region'].unique():
-        region_merchants = merchants_df[merchants_df['estimated_region'] == region]
-        
-        for hour in range(24):
-            count = len(region_merchants[region_merchants['peak_hour_utc'] == hour])
-            percentage = count / len(region_merchants) * 100 if len(region_merchants) > 0 else 0
-            
-            hourly_data.append({
-                'Hour (UTC)': hour,
-                'Region': region,
-                'Percentage of Merchants': percentage,
-                'Merchant Count': count
-            })
-    
-    hourly_df = pd.DataFrame(hourly_data)
-    
-    # Create grouped bar chart with better formatting and thinner bars
-    fig = px.bar(
-        hourly_df,
-        x='Hour (UTC)',
-        y='Percentage of Merchants',
-        color='Region',
-        title='',
-        color_discrete_map={
-            'Asia-Pacific': '#00ff88',
-            'Europe-Africa': '#0099ff',
-            'Americas': '#ff6b6b'
-        }
-    )
-    
-    # Update traces for thinner bars
-    fig.update_traces(
-        width=0.6,  # Make bars thinner
-        hovertemplate='<b style="font-family: IBM Plex Sans">Hour %{x}:00 UTC</b><br>' +
-                      '<span style="font-family: IBM Plex Sans">Percentage: <b>%{y:.1f}%</b></span><br>' +
-                      '<extra></extra>'
-    )
-    
-    fig.update_layout(
-        paper_bgcolor='#0a0a0a',
-        plot_bgcolor='#111',
-        font=dict(color='#999', family='IBM Plex Sans'),
-        xaxis=dict(
-            gridcolor='#222',
-            tickmode='linear',
-            tick0=0,
-            dtick=2
-        ),
-        yaxis=dict(gridcolor='#222'),
-        legend=dict(
-            bgcolor='#111',
-            bordercolor='#333',
-            borderwidth=1
-        ),
-        height=500,
-        hoverlabel=dict(
-            bgcolor='#111',
-            bordercolor='#333',
-            font=dict(family='IBM Plex Sans', size=14)
-        ),
-        bargap=0.2  # Add gap between groups
-    )
-    
-    st.plotly_chart(fig, use_container_width=True)
-    
+        st.markdown(f"### {RANKING_TITLES['merchant_leaders']}")
+
+        for row in rankings['merchant_leaders']:
+            st.markdown(merchant_leader_row(row), unsafe_allow_html=True)
+
+def regional_tab():
+    section_header('hourly')
+
+    controls = summary['controls']
+    col1, col2 = st.columns(2)
+    with col1:
+        weighting = st.radio("Weight by", controls['hourly_weightings'], horizontal=True)
+    with col2:
+        time_basis = st.radio("Time basis", controls['time_bases'], horizontal=True)
+
+    render_figure('hourly', cube_version,
+                  lambda: hourly_figure(cube, weighting, time_basis, [card['region'] for card in summary['regions']]),
+                  weighting=weighting, time_basis=time_basis)
+
     # Payment size distribution
-    st.markdown("### Payment Size Distribution")
-    st.markdown('<p class="chart-description">Most transactions fall within retail ranges ($20-80), validating the merchant classification methodology.</p>', unsafe_allow_html=True)
-    
-    # Create bins for payment sizes
-    bins = list(range(0, 105, 5))  # 0-5, 5-10, 10-15, ..., 95-100
-    bin_labels = [f'${i}-${i+5}' for i in range(0, 100, 5)]
-    
-    merchants_df['payment_bin'] = pd.cut(merchants_df['avg_payment_size'], bins=bins, labels=bin_labels, include_lowest=True)
-    payment_dist = merchants_df['payment_bin'].value_counts().sort_index()
-    
-    fig = go.Figure(data=[go.Bar(
-        x=payment_dist.index,
-        y=payment_dist.values,
-        marker=dict(
-            color='#00ff88',
-            line=dict(width=0)  # Remove outline
-        ),
-        hovertemplate='<b style="font-family: IBM Plex Sans">%{x}</b><br>' +
-                      '<span style="font-family: IBM Plex Sans">Merchants: <b>%{y}</b></span>' +
-                      '<extra></extra>',
-        width=0.8  # Make bars thinner
-    )])
-    
-    fig.update_layout(
-        paper_bgcolor='#0a0a0a',
-        plot_bgcolor='#111',
-        font=dict(color='#999', family='IBM Plex Sans'),
-        xaxis=dict(
-            gridcolor='#222',
-            title='Average Payment Size (USDT)',
-            tickangle=45
-        ),
-        yaxis=dict(
-            gridcolor='#222',
-            title='Number of Merchants'
-        ),
-        height=400,
-        hoverlabel=dict(
-            bgcolor='#111',
-            bordercolor='#333',
-            font=dict(family='IBM Plex Sans', size=14)
-        ),
-        bargap=0.1  # Thinner bars
-    )
-    
-    st.plotly_chart(fig, use_container_width=True)
+    section_header('payment_sizes')
+
+    # Payment size statistic to bin (percentiles come from the pipeline's quantile sketches)
+    payment_stats = controls['payment_statistics']
+    payment_stat = st.radio("Payment statistic", list(payment_stats), horizontal=True,
+                            label_visibility="collapsed")
+    payment_col = payment_stats[payment_stat]
+
+    render_figure('payment_sizes', cube_version, lambda: payment_figure(cube, payment_col), statistic=payment_col)
+
+def insights_tab():
+    section_header('customers_transactions')
+
+    def build_scatter_figure():
+        insights_df = load_merchant_data(INSIGHT_COLUMNS)
+        return scatter_figure(insights_df, scatter_density(column_version(INSIGHT_COLUMNS), insights_df))
+
+    render_figure('customers_transactions', column_version(INSIGHT_COLUMNS), build_scatter_figure)
 
-with tab3:
-    st.markdown("### Customer Base vs Transaction Activity")
-    st.markdown('<p class="chart-description">The logarithmic relationship between customers and transactions demonstrates consistent merchant behavior across all regions.</p>', unsafe_allow_html=True)
-    
-    sample_size = min(1000, len(merchants_df))
-    scatter_sample = merchants_df.sample(sample_size)
-    
-    fig = px.scatter(
-        scatter_sample,
-        x='unique_customers',
-        y='transaction_count',
-        size='total_received_usdt',
-        color='estimated_region',
-        labels={
-            'unique_customers': 'Unique Customers',
-            'transaction_count': 'Total Transactions'
-        },
-        color_discrete_map={
-            'Asia-Pacific': '#00ff88',
-            'Europe-Africa': '#0099ff',
-            'Americas': '#ff6b6b'
-        },
-        size_max=30,
-        opacity=0.7
-    )
-    
-    # Update hover template to include region
-    fig.update_traces(
-        hovertemplate='<b style="font-family: IBM Plex Sans">%{fullData.name}</b><br><br>' +
-                      '<span style="font-family: IBM Plex Sans">Customers: <b>%{x:,}</b></span><br>' +
-                      '<span style="font-family: IBM Plex Sans">Transactions: <b>%{y:,}</b></span><br>' +
-                      '<span style="font-family: IBM Plex Sans">Volume: <b>$%{marker.size:,.0f}</b></span>' +
-                      '<extra></extra>'
-    )
-    
-    fig.update_layout(
-        paper_bgcolor='#0a0a0a',
-        plot_bgcolor='#111',
-        font=dict(color='#999', family='IBM Plex Sans'),
-        xaxis=dict(gridcolor='#222', type='log', title='Unique Customers (log scale)'),
-        yaxis=dict(gridcolor='#222', type='log', title='Total Transactions (log scale)'),
-        legend=dict(
-            bgcolor='#111',
-            bordercolor='#333',
-            borderwidth=1,
-            title='Region'
-        ),
-        height=600,
-        hoverlabel=dict(
-            bgcolor='#111',
-            bordercolor='#333',
-            font=dict(family='IBM Plex Sans', size=14)
-        )
-    )
-    
-    st.plotly_chart(fig, use_container_width=True)
-    
     # Activity level distribution - BIGGER
-    st.markdown("### Merchant Activity Distribution")
-    st.markdown('<p class="chart-description">Activity levels show a healthy distribution with most merchants maintaining regular operations.</p>', unsafe_allow_html=True)
-    
-    activity_bins = pd.cut(
-        merchants_df['activity_percentile'],
-        bins=[0, 25, 50, 75, 100],
-        labels=['Low', 'Medium', 'High', 'Very High']
-    )
-    
-    activity_dist = activity_bins.value_counts().reset_index()
-    activity_dist.columns = ['Activity Level', 'Count']
-    activity_dist['Percentage'] = (activity_dist['Count'] / activity_dist['Count'].sum() * 100).round(1)
-    
-    fig = px.pie(
-        activity_dist,
-        values='Count',
-        names='Activity Level',
-        title='',
-        color_discrete_sequence=['#333', '#666', '#00cc66', '#00ff88']
-    )
-    
-    fig.update_traces(
-        hovertemplate='<b style="font-family: IBM Plex Sans">%{label}</b><br>' +
-                      '<span style="font-family: IBM Plex Sans">Merchants: <b>%{value:,}</b></span><br>' +
-                      '<span style="font-family: IBM Plex Sans">Percentage: <b>%{percent}</b></span>' +
-                      '<extra></extra>',
-        textinfo='label+percent',
-        textfont=dict(family='IBM Plex Sans', size=14)
-    )
-    
-    fig.update_layout(
-        paper_bgcolor='#0a0a0a',
-        plot_bgcolor='#0a0a0a',
-        font=dict(color='#999', family='IBM Plex Sans'),
-        showlegend=True,
-        legend=dict(
-            bgcolor='#111',
-            bordercolor='#333',
-            borderwidth=1
-        ),
-        height=500,
-        margin=dict(t=50, b=50),
-        hoverlabel=dict(
-            bgcolor='#111',
-            bordercolor='#333',
-            font=dict(family='IBM Plex Sans', size=14)
-        )
-    )
-    
-    st.plotly_chart(fig, use_container_width=True)
-    
+    section_header('activity')
+
+    render_figure('activity', cube_version, lambda: activity_figure(cube))
+
+    # Merchant-customer graph - aggregators, P2P traders and shared-customer clusters
+    graph_version, graph = current_graph()
+    if graph:
+        section_header('customer_graph')
+
+        cols = st.columns(4)
+        for col, card in zip(cols, graph_cards(graph)):
+            with col:
+                st.markdown(card, unsafe_allow_html=True)
+
+        render_figure('customer_graph', graph_version, lambda: degree_figure(graph['degrees']))
+
+        if graph['top_clusters']:
+            st.dataframe(cluster_rows(graph), hide_index=True, use_container_width=True)
+
     # Download section
     st.markdown("---")
     st.markdown("### Export Data")
-    
-    # Create CSV download
-    @st.cache_data
-    def convert_df_to_csv(df):
-        """Convert dataframe to CSV for download"""
-        export_df = df[['address', 'estimated_region']].copy()
-        return export_df.to_csv(index=False).encode('utf-8')
-    
-    csv_data = convert_df_to_csv(merchants_df)
-    
+
+    if SUMMARY_PATH and not os.path.exists(summary['source']):
+        st.caption("The merchant dataset is not available on this server.")
+        return
+    controls = summary['export'] if SUMMARY_PATH else merchant_export_controls(snapshot.version, snapshot.table)
+
+    # Rows and columns to export - filtered as the table is read, never loaded whole
+    col1, col2 = st.columns(2)
+    with col1:
+        columns = st.multiselect("Columns", controls['columns'], default=controls['default_columns'])
+        regions = st.multiselect("Regions", controls['regions'], placeholder="All regions")
+        sizes = st.multiselect("Merchant sizes", controls['sizes'], placeholder="All sizes")
+    with col2:
+        min_volume = st.number_input("Min volume (USDT)", min_value=0.0, value=None, placeholder="No minimum")
+        max_volume = st.number_input("Max volume (USDT)", min_value=0.0, value=None, placeholder="No maximum")
+        fmt = st.radio("Format", list(controls['formats']), horizontal=True,
+                       format_func=lambda name: name.upper())
+    mime, extension = controls['formats'][fmt]
+
     col1, col2, col3 = st.columns([1, 2, 1])
     with col2:
         st.download_button(
-            label="Download Merchant Addresses (CSV)",
-            data=csv_data,
-            file_name=f"tron_merchant_addresses_{datetime.now().strftime('%Y%m%d')}.csv",
-            mime='text/csv',
-            help="Download all merchant wallet addresses with their regions"
+            label=f"Download Merchant Data ({fmt.upper()})",
+            # Built only when the button is clicked
+            data=lambda: export_data(fmt, columns=columns, regions=regions, sizes=sizes,
+                                     volume_range=(min_volume, max_volume)),
+            file_name=f"tron_merchants_{datetime.now().strftime('%Y%m%d')}{extension}",
+            mime=mime,
+            disabled=not columns,
+            help="Download the selected columns of the merchants matching these filters"
         )
 
-with tab4:
-    st.markdown("### Data Collection")
-    
-    st.markdown("""
-    #### Overview
-    Real merchants were identified by analyzing 1.1 million active receiving addresses from June 3-10, 2025. I applied behavioral filters based on patterns typical of actual businesses.
+def methodology_tab():
+    st.markdown(f"### {METHODOLOGY_TITLE}")
     
-    #### Merchant Identification Criteria
-    To qualify as a merchant, an address needed to meet ALL of the following criteria:
-    - Minimum 5 transactions - Excludes one-time or rarely used wallets
-    - Minimum 5 unique customers - Ensures actual business activity vs personal transfers
-    - $75+ in total volume - Filters out test transactions and micro-payments
-    - Average payment size between $1-100 - Typical retail transaction range
-    - Maximum 80% customer concentration - Excludes personal wallets receiving from single sources
-    
-    #### Geographic Estimation
-    I analyzed peak transaction hours for each wallet to estimate time zones:
-    1. Calculated hourly transaction distribution for each merchant
-    2. Identified peak activity hours (when most transactions occurred)
-    3. Assumed merchants operate during typical business hours (9 AM - 5 PM local time)
-    4. Mapped peak UTC hours to likely time zones and regions
-    5. Distributed merchants within regions based on crypto adoption rates from industry reports
-    
-    #### Network Scaling
-    With approximately 3 million daily active addresses on TRON as of June 2025, my analysis covered roughly one-third of all transactions. I applied a 2.5x multiplier to estimate total network activity:
-    - Analyzed: ~3,400 merchants from 1.1M addresses
-    - Estimated Total: ~8,500 USDT merchants on TRON globally
-    
-    #### Data Sources
-    - Blockchain Data: TRON mainnet via Bitquery API
-    - Transaction Period: June 3-10, 2025
-    - Crypto Adoption Rates: Chainanalysis Global Crypto Adoption Index 2024
-    - Analysis Date: June 2025
-    
-    #### Limitations
-    - Currency Scope: Analysis limited to USDT transactions only
-    - Geographic Accuracy: Time zone estimation may not reflect actual physical locations for all merchants
-    - Temporal Snapshot: Data represents one week in June 2025; adoption patterns evolve rapidly
-    - Exchange Exclusion: Methodology filters out centralized exchanges but may include some P2P traders
-    - Payment Processors: Some identified "merchants" may be payment aggregators serving multiple businesses
-    """)
+    st.markdown(METHODOLOGY_MARKDOWN)
+
+# Lazy tabs: switching tabs reruns the script and only the open tab's body
+# executes, so the first paint waits on the header metrics alone
+tabs = st.tabs(TAB_LABELS, key='dashboard_tab', on_change='rerun')
+for tab, render_tab in zip(tabs, [heatmap_tab, regional_tab, insights_tab, methodology_tab]):
+    if tab.open:
+        with tab:
+            render_tab()
 
 # Footer
 st.markdown("---")
-st.markdown(f"""
-<div style='text-align: center; color: #666; font-size: 0.9rem; margin-top: 2rem;'>
-    <p>Data represents TRON blockchain USDT merchant transactions</p>
-    <p style='font-size: 0.8rem;'>Geographic estimations are statistical inferences based on transaction patterns</p>
-</div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+st.markdown(FOOTER, unsafe_allow_html=True)
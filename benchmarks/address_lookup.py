@@ -0,0 +1,70 @@
+"""
+Address lookup benchmark: exact and type-ahead latency against a DataFrame scan
+
+Usage:
+    python -m benchmarks.address_lookup [--merchants 1000000] [--queries 2000]
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from tracker.addresses import ADDRESS_PREFIX, PAYLOAD_BYTES, encode_addresses
+from tracker.lookup import AddressLookup
+
+
+def synthetic_addresses(merchants, seed=0):
+    """Random valid TRON payloads and their address strings"""
+    rng = np.random.default_rng(seed)
+    payloads = rng.integers(0, 256, (merchants, PAYLOAD_BYTES), dtype='uint8')
+    payloads[:, 0] = ADDRESS_PREFIX
+    return payloads, encode_addresses(payloads)
+
+
+def percentiles_ms(seconds):
+    seconds = np.asarray(seconds) * 1000
+    return f"p50 {np.percentile(seconds, 50):7.3f}  p99 {np.percentile(seconds, 99):7.3f}  max {seconds.max():7.3f}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--merchants', type=int, default=1_000_000)
+    parser.add_argument('--queries', type=int, default=2_000)
+    args = parser.parse_args(argv)
+
+    payloads, addresses = synthetic_addresses(args.merchants)
+    start = time.perf_counter()
+    lookup = AddressLookup(payloads, pa.array(addresses, pa.string()))
+    print(f"{args.merchants:,} addresses, indexes built in {time.perf_counter() - start:.2f}s\n")
+
+    rng = np.random.default_rng(1)
+    rows = rng.integers(0, args.merchants, args.queries)
+    exact, typeahead = [], []
+    for row in rows:
+        start = time.perf_counter()
+        assert lookup.find(addresses[row]) == row
+        exact.append(time.perf_counter() - start)
+
+        prefix = addresses[row][:rng.integers(1, 12)]
+        start = time.perf_counter()
+        lookup.addresses(lookup.prefix(prefix))
+        typeahead.append(time.perf_counter() - start)
+
+    # The grep-the-export baseline: one vectorized pass over the address strings
+    column = pd.Series(addresses)
+    scans = []
+    for row in rows[:20]:
+        start = time.perf_counter()
+        column.str.startswith(addresses[row][:4]).to_numpy().nonzero()
+        scans.append(time.perf_counter() - start)
+
+    print(f"{'exact match (ms)':<28} {percentiles_ms(exact)}")
+    print(f"{'type-ahead, 10 names (ms)':<28} {percentiles_ms(typeahead)}")
+    print(f"{'prefix scan of strings (ms)':<28} {percentiles_ms(scans)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Customer graph benchmark: build and analyze a merchant-customer graph with tens of millions of edges
+
+Generates integer-encoded payments between Zipf-popular merchants and
+Pareto-active customers, then plants the structures the flags look for:
+clusters of merchants drawing on one customer pool, aggregators with huge
+customer bases, and trading desks whose customers are hubs. Reports build
+and analysis time and peak memory, and checks every planted structure is
+found.
+
+Usage:
+    python -m benchmarks.customer_graph [--edges 20000000] [--merchants 200000] [--customers 5000000]
+"""
+
+import argparse
+import resource
+import time
+
+import numpy as np
+
+from tracker.graph import GRAPH_CRITERIA, GRAPH_FLAGS, CustomerGraph, graph_view
+
+
+def synthetic_edges(args, seed=0):
+    """(merchant rows, customer columns, planted clusters, aggregators, desks) of a synthetic graph"""
+    rng = np.random.default_rng(seed)
+    popularity = np.cumsum(1 / np.arange(1, args.merchants + 1) ** 1.1)
+    activity = np.cumsum(rng.pareto(1.5, args.customers) + 1)
+    rows = np.searchsorted(popularity, rng.random(args.edges) * popularity[-1])
+    columns = np.searchsorted(activity, rng.random(args.edges) * activity[-1])
+
+    # Quiet merchants taken over by the planted structures
+    spare = rng.permutation(np.arange(args.merchants // 2, args.merchants))
+    clusters = [spare[i * 4:i * 4 + 2 + i % 3] for i in range(args.clusters)]
+    aggregators = spare[args.clusters * 4:args.clusters * 4 + 5]
+    desks = spare[args.clusters * 4 + 5:args.clusters * 4 + 15]
+
+    planted_rows, planted_columns = [], []
+    for members in clusters:
+        pool = rng.integers(0, args.customers, 200)
+        for member in members:
+            planted_rows.append(np.full(120, member))
+            planted_columns.append(rng.choice(pool, 120, replace=False))
+    for aggregator in aggregators:
+        planted_rows.append(np.full(args.edges // 200, aggregator))
+        planted_columns.append(rng.integers(0, args.customers, args.edges // 200))
+    # Hubs: customers paying hundreds of merchants, the desks' only customers
+    hubs = rng.integers(0, args.customers, 300)
+    for hub in hubs:
+        planted_rows.append(rng.integers(0, args.merchants, 200))
+        planted_columns.append(np.full(200, hub))
+    for desk in desks:
+        planted_rows.append(np.full(100, desk))
+        planted_columns.append(rng.choice(hubs, 100, replace=False))
+
+    rows = np.concatenate([rows] + planted_rows)
+    columns = np.concatenate([columns] + planted_columns)
+    return rows, columns, clusters, aggregators, desks
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--edges', type=int, default=20_000_000)
+    parser.add_argument('--merchants', type=int, default=200_000)
+    parser.add_argument('--customers', type=int, default=5_000_000)
+    parser.add_argument('--clusters', type=int, default=50)
+    args = parser.parse_args(argv)
+
+    rows, columns, clusters, aggregators, desks = synthetic_edges(args)
+    # Payment counts per distinct (merchant, customer)
+    keys, payments = np.unique(rows.astype('int64') * args.customers + columns, return_counts=True)
+    merchants = np.arange(args.merchants).astype('S')
+    customers = np.arange(args.customers).astype('S')
+
+    start = time.perf_counter()
+    graph = CustomerGraph.from_codes(merchants, customers, keys // args.customers, keys % args.customers, payments)
+    built = time.perf_counter() - start
+    graph.analyze()
+    analyzed = time.perf_counter() - start - built
+    view = graph_view(graph)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    print(f"{graph.num_edges:,} edges, {args.merchants:,} merchants, {args.customers:,} customers")
+    print(f"{'build CSR':<20} {built:8.2f}s")
+    print(f"{'overlap + flags':<20} {analyzed:8.2f}s")
+    print(f"{'peak memory':<20} {peak:8.0f} MB\n")
+    for flag, count in view['flags'].items():
+        print(f"  {flag:<18} {count:>10,}")
+    print(f"  {'clusters':<18} {view['clusters']:>10,}")
+
+    flags = graph.flag_labels()
+    assert (flags[aggregators] == 'aggregator').all()
+    assert (flags[desks] == 'p2p_trader').all()
+    for members in clusters:
+        labels = graph.clusters[members]
+        assert labels[0] >= 0 and (labels == labels[0]).all(), members
+    print(f"\nFound all {len(clusters)} planted clusters, {len(aggregators)} aggregators and {len(desks)} desks "
+          f"(criteria: {', '.join(f'{k}={v}' for k, v in GRAPH_CRITERIA.items() if k.startswith('cluster'))})")
+    assert set(GRAPH_FLAGS) == set(view['flags'])
+
+
+if __name__ == '__main__':
+    main()
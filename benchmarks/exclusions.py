@@ -0,0 +1,82 @@
+"""
+Exclusion benchmark: transfer-stream throughput and false positives of exact and Bloom denylists
+
+Writes a denylist of synthetic addresses, loads it as an exact set and as a
+Bloom filter, then filters chunks of transfers in which a known share of
+senders and receivers are listed. Checks every listed transfer is dropped
+and that the Bloom filter's false positives stay within its budget.
+
+Usage:
+    python -m benchmarks.exclusions [--listed 10000000] [--transfers 5000000] [--false-positive-rate 0.001]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.address_lookup import synthetic_addresses
+from tracker.exclusions import ExclusionList, exclude, exclusion_counters
+from tracker.identify import CHUNK_SIZE
+
+# Share of transfers sent by, and received by, listed addresses
+LISTED_SHARE = 0.01
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--listed', type=int, default=10_000_000)
+    parser.add_argument('--transfers', type=int, default=5_000_000)
+    parser.add_argument('--false-positive-rate', type=float, default=0.001)
+    args = parser.parse_args(argv)
+
+    _, addresses = synthetic_addresses(args.listed + 1_000_000)
+    listed, unlisted = addresses[:args.listed], addresses[args.listed:]
+
+    rng = np.random.default_rng(1)
+    senders = unlisted[rng.integers(0, len(unlisted), args.transfers)]
+    receivers = unlisted[rng.integers(0, len(unlisted), args.transfers)]
+    listed_senders = rng.random(args.transfers) < LISTED_SHARE
+    listed_receivers = rng.random(args.transfers) < LISTED_SHARE
+    senders[listed_senders] = listed[rng.integers(0, args.listed, int(listed_senders.sum()))]
+    receivers[listed_receivers] = listed[rng.integers(0, args.listed, int(listed_receivers.sum()))]
+    transfers = pd.DataFrame({'sender': senders, 'receiver': receivers, 'amount': 1.0})
+    chunks = [transfers[start:start + CHUNK_SIZE] for start in range(0, len(transfers), CHUNK_SIZE)]
+    truly_listed = int((listed_senders | listed_receivers).sum())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'denylist.txt')
+        with open(path, 'w') as f:
+            f.write('\n'.join(listed))
+
+        print(f"{args.listed:,} listed addresses, {args.transfers:,} transfers "
+              f"({truly_listed:,} involving a listed address)\n")
+        print(f"{'filter':<8} {'load':>8} {'memory':>10} {'transfers/s':>13} {'excluded':>11} {'false pos.':>11}")
+        for mode, exact_max in [('exact', args.listed), ('bloom', 0)]:
+            start = time.perf_counter()
+            exclusions = ExclusionList.load([path], {'exact_max_addresses': exact_max,
+                                                     'false_positive_rate': args.false_positive_rate})
+            loaded = time.perf_counter() - start
+            assert exclusions.mode == mode
+
+            counters = exclusion_counters()
+            start = time.perf_counter()
+            kept = sum(len(exclude(chunk, exclusions, counters)) for chunk in chunks)
+            elapsed = time.perf_counter() - start
+
+            # Nothing listed gets through; anything else dropped is a false positive
+            assert kept == args.transfers - counters['excluded_transfers']
+            assert counters['excluded_transfers'] >= truly_listed
+            false_positives = counters['excluded_transfers'] - truly_listed
+            # Each transfer tests two unlisted-or-listed addresses, so allow twice the per-address budget
+            rate = false_positives / (args.transfers - truly_listed)
+            assert rate <= 2 * args.false_positive_rate * 1.5, rate
+            print(f"{mode:<8} {loaded:7.1f}s {exclusions.memory_usage() / 2**20:8.1f}MB "
+                  f"{args.transfers / elapsed:13,.0f} {counters['excluded_transfers']:11,} {rate:11.2e}")
+
+
+if __name__ == '__main__':
+    main()
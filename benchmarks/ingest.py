@@ -0,0 +1,119 @@
+"""
+Ingest benchmark: throughput against the mock API, and a killed run resumed from its checkpoint
+
+Starts tracker.mockapi (with rate limiting and random 503s, so retries are
+exercised), ingests the period once straight through, then again in a
+subprocess that is killed with SIGKILL after its first checkpoints, resumes
+that run, and checks both runs produce the same merchant table.
+
+Usage:
+    python -m benchmarks.ingest [--hours 6] [--window 900] [--error-rate 0.02]
+"""
+
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from tracker.dataset import read_merchants
+from tracker.identify import print_report
+from tracker.ingest import ingest_transfers, iso_time, parse_time
+
+START = '2025-06-03'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port, args):
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'tracker.mockapi', '--port', str(port), '--rate-limit', str(args.server_rate),
+         '--error-rate', str(args.error_rate), '--transfers-per-minute', str(args.transfers_per_minute)],
+        stdout=subprocess.PIPE, text=True,
+    )
+    server.stdout.readline()   # "Serving ..." once it listens
+    return server
+
+
+def finished_windows(checkpoint_dir):
+    try:
+        with open(os.path.join(checkpoint_dir, 'progress.json')) as f:
+            return len(json.load(f)['finished'])
+    except (OSError, ValueError):
+        return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--hours', type=int, default=6)
+    parser.add_argument('--window', type=int, default=900)
+    parser.add_argument('--transfers-per-minute', type=int, default=2_000)
+    parser.add_argument('--server-rate', type=float, default=200, help="mock API requests per second")
+    parser.add_argument('--error-rate', type=float, default=0.02, help="fraction of mock API 503s")
+    args = parser.parse_args(argv)
+
+    start = parse_time(START)
+    end = start + args.hours * 3600
+    windows = -(-args.hours * 3600 // args.window)
+    port = free_port()
+    endpoint = f'http://127.0.0.1:{port}/graphql'
+    settings = {'requests_per_second': 0, 'checkpoint_windows': 4}
+    server = start_server(port, args)
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            def run(name, **options):
+                return ingest_transfers(start, end, endpoint, checkpoint_dir=os.path.join(tmp, name, 'checkpoint'),
+                                        state_dir=os.path.join(tmp, name, 'state'),
+                                        merchants_path=os.path.join(tmp, name, 'merchants.parquet'),
+                                        graph_path=os.path.join(tmp, name, 'customer_graph.npz'),
+                                        window_seconds=args.window, settings=settings, **options)
+
+            print(f"Straight run: {args.hours}h of transfers in {windows} windows\n")
+            merchants, straight = run('straight')
+            print_report(straight)
+
+            # Same run in a subprocess, killed once a third of the windows are checkpointed
+            checkpoint_dir = os.path.join(tmp, 'resumed', 'checkpoint')
+            killed = subprocess.Popen(
+                [sys.executable, '-m', 'tracker.ingest', iso_time(start), iso_time(end), '--endpoint', endpoint,
+                 '--checkpoint-dir', checkpoint_dir, '--state-dir', os.path.join(tmp, 'killed', 'state'),
+                 '-o', os.path.join(tmp, 'killed', 'merchants.parquet'), '--graph', '', '--window', str(args.window),
+                 '--rate', '0', '--checkpoint-windows', '4'],
+                stdout=subprocess.DEVNULL,
+            )
+            while finished_windows(checkpoint_dir) < windows // 3 and killed.poll() is None:
+                time.sleep(0.05)
+            killed.send_signal(signal.SIGKILL)
+            killed.wait()
+            print(f"\nKilled a second run after {finished_windows(checkpoint_dir)} checkpointed windows; resuming\n")
+
+            resumed, report = run('resumed')
+            print_report(report)
+
+            # Summation order differs between runs, so rounded floats may differ in the last place
+            pd.testing.assert_frame_equal(
+                read_merchants(os.path.join(tmp, 'straight', 'merchants.parquet')),
+                read_merchants(os.path.join(tmp, 'resumed', 'merchants.parquet')),
+                check_exact=False, atol=0.0101, rtol=0,
+            )
+            # Windows in flight at the kill were fetched again, but counted once
+            assert report['total_transfers'] == straight['total_transfers']
+            print(f"\nResumed run matches the straight run ({len(resumed):,} merchants)")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == '__main__':
+    main()
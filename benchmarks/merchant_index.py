@@ -0,0 +1,91 @@
+"""
+Merchant index benchmark: filter query latency against a full DataFrame scan
+
+Usage:
+    python -m benchmarks.merchant_index [--merchants 5000000]
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from tracker.index import ACTIVITY_COLUMN, MerchantIndex
+
+REGIONS = ['Americas', 'Asia-Pacific', 'Europe-Africa']
+SIZES = ['Large', 'Medium', 'Small']
+QUERIES = {
+    'one region': {'estimated_region': ['Americas']},
+    'region + size': {'estimated_region': ['Americas'], 'merchant_size': ['Large']},
+    'volume band': {'total_received_usdt': (10_000, 20_000)},
+    'retail payments, top activity': {'avg_payment_size': (20, 80), ACTIVITY_COLUMN: (90, None)},
+    'narrow payment + size': {'merchant_size': ['Small'], 'avg_payment_size': (20, 21)},
+    'everything': {'estimated_region': REGIONS[:2], 'merchant_size': SIZES[:2], 'total_received_usdt': (100, None),
+                   'avg_payment_size': (5, 500), ACTIVITY_COLUMN: (10, None)},
+}
+
+
+def synthetic_merchants(merchants, seed=0):
+    """Merchant table with the indexed columns in their compact types"""
+    rng = np.random.default_rng(seed)
+    return pa.table({
+        'estimated_region': pa.DictionaryArray.from_arrays(rng.integers(0, 3, merchants).astype('int8'), REGIONS),
+        'merchant_size': pa.DictionaryArray.from_arrays(rng.integers(0, 3, merchants).astype('int8'), SIZES),
+        'total_received_usdt': rng.lognormal(7, 2, merchants).astype('float32'),
+        'avg_payment_size': np.round(rng.lognormal(3, 1, merchants), 2).astype('float32'),
+        'transaction_count': rng.integers(50, 5_000, merchants).astype('uint32'),
+        'unique_customers': rng.integers(30, 3_000, merchants).astype('uint32'),
+    })
+
+
+def scan(merchants, percentile, filters):
+    """The same filters as boolean masks over the whole DataFrame"""
+    mask = np.ones(len(merchants), dtype=bool)
+    for column, selection in filters.items():
+        if column in ('estimated_region', 'merchant_size'):
+            mask &= merchants[column].isin(selection).to_numpy()
+            continue
+        values = pd.Series(percentile) if column == ACTIVITY_COLUMN else merchants[column]
+        low, high = selection
+        if low is not None:
+            mask &= (values >= low).to_numpy()
+        if high is not None:
+            mask &= (values <= high).to_numpy()
+    return np.flatnonzero(mask)
+
+
+def best_of(function, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return result, min(times)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--merchants', type=int, default=5_000_000)
+    args = parser.parse_args(argv)
+
+    table = synthetic_merchants(args.merchants)
+    start = time.perf_counter()
+    index = MerchantIndex(table)
+    build_seconds = time.perf_counter() - start
+    merchants = table.to_pandas()
+    percentile = merchants['transaction_count'].rank(pct=True).to_numpy() * 100
+
+    print(f"{args.merchants:,} merchants, index built in {build_seconds:.2f}s\n")
+    print(f"{'query':<32} {'rows':>10} {'index ms':>9} {'scan ms':>8} {'speedup':>8}")
+    for name, filters in QUERIES.items():
+        rows, index_seconds = best_of(lambda: index.query(filters))
+        expected, scan_seconds = best_of(lambda: scan(merchants, percentile, filters))
+        assert np.array_equal(rows, expected), name
+        print(f"{name:<32} {len(rows):>10,} {index_seconds * 1000:>9.1f} {scan_seconds * 1000:>8.1f} "
+              f"{scan_seconds / index_seconds:>7.0f}x")
+
+
+if __name__ == '__main__':
+    main()
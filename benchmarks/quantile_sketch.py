@@ -0,0 +1,64 @@
+"""
+Quantile sketch benchmark: accuracy vs memory against exact pandas quantiles
+
+Usage:
+    python -m benchmarks.quantile_sketch [--merchants 20000] [--payments 2000000]
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from tracker.sketches import QuantileSketch
+
+QUANTILES = [0.5, 0.9, 0.99]
+ACCURACIES = [0.05, 0.02, 0.01, 0.005, 0.001]
+
+
+def synthetic_payments(merchants, payments, seed=0):
+    """Heavy-tailed merchant sizes with lognormal payment amounts"""
+    rng = np.random.default_rng(seed)
+    weights = 1 / np.arange(1, merchants + 1) ** 1.1
+    keys = rng.choice(merchants, size=payments, p=weights / weights.sum())
+    scale = rng.lognormal(3, 0.7, merchants)
+    amounts = np.round(scale[keys] * rng.lognormal(0, 0.8, payments), 2).clip(0.01)
+    return pd.Series(keys, name='receiver'), pd.Series(amounts, name='amount')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--merchants', type=int, default=20_000)
+    parser.add_argument('--payments', type=int, default=2_000_000)
+    args = parser.parse_args(argv)
+
+    keys, amounts = synthetic_payments(args.merchants, args.payments)
+    raw_bytes = int(keys.memory_usage(index=False) + amounts.memory_usage(index=False))
+
+    start = time.perf_counter()
+    exact = amounts.groupby(keys).quantile(QUANTILES).unstack()
+    exact_seconds = time.perf_counter() - start
+
+    print(f"{args.payments:,} payments across {keys.nunique():,} merchants")
+    print(f"exact pandas quantiles: {exact_seconds:.2f}s, raw payments {raw_bytes / 2**20:.1f} MiB\n")
+    print(f"{'accuracy':>9} {'memory MiB':>11} {'vs raw':>7} {'build s':>8} {'query s':>8} "
+          + ' '.join(f'{f"p{int(q * 100)} max err":>12}' for q in QUANTILES))
+
+    for accuracy in ACCURACIES:
+        start = time.perf_counter()
+        sketch = QuantileSketch.from_values(keys, amounts, relative_accuracy=accuracy)
+        build_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        approx = sketch.quantiles(QUANTILES)
+        query_seconds = time.perf_counter() - start
+
+        errors = ((approx - exact.loc[approx.index]) / exact.loc[approx.index]).abs().max()
+        memory = sketch.memory_usage()
+        print(f"{accuracy:>9} {memory / 2**20:>11.2f} {memory / raw_bytes:>6.1%} {build_seconds:>8.2f} "
+              f"{query_seconds:>8.2f} " + ' '.join(f'{errors[q]:>12.4%}' for q in QUANTILES))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tracker.countries import COUNTRY_TABLE, REGION_COUNTRIES, apportion, country_table
+
+
+@pytest.mark.parametrize('multiplier', [1.0, 2.5, 37.3])
+def test_country_counts_add_up_to_region_counts(multiplier):
+    rng = np.random.default_rng(0)
+    for counts in [[0, 1, 2], [7, 13, 29], *rng.integers(0, 100_000, (20, 3)).tolist()]:
+        region_counts = pd.Series(counts, index=list(REGION_COUNTRIES))
+        allocation = apportion(region_counts, multiplier=multiplier)
+
+        by_region = allocation.groupby('region')
+        pd.testing.assert_series_equal(by_region['merchant_count'].sum(), region_counts.sort_index(),
+                                       check_names=False, check_dtype=False)
+        scaled = (region_counts * multiplier).astype('int64').sort_index()
+        pd.testing.assert_series_equal(by_region['estimated_merchants'].sum(), scaled,
+                                       check_names=False, check_dtype=False)
+        # Each country gets its quota rounded down or up
+        quotas = allocation['region'].map(region_counts).fillna(0) * allocation['weight']
+        assert ((allocation['merchant_count'] - quotas).abs() < 1).all()
+        assert (allocation.loc[allocation['region'].isna(), ['merchant_count', 'estimated_merchants']] == 0).all().all()
+
+
+def test_regions_without_merchants_get_none():
+    allocation = apportion(pd.Series({'Americas': 10}))
+    assert allocation.loc[allocation['region'] == 'Americas', 'merchant_count'].sum() == 10
+    assert (allocation.loc[allocation['region'] != 'Americas', 'merchant_count'] == 0).all()
+    assert allocation['has_merchants'].sum() == len(REGION_COUNTRIES['Americas'])
+
+
+def test_ties_go_to_the_higher_ranked_country_whatever_the_row_order():
+    adoption = {country: {'rank': rank, 'adoption_rate': 5.0}
+                for rank, country in enumerate(['C', 'A', 'D', 'B'], start=1)}
+    table = country_table(adoption, {'Region': ['A', 'B', 'C', 'D']}, {country: country for country in adoption})
+    for count, winners in [(1, ['C']), (2, ['C', 'A']), (3, ['C', 'A', 'D']), (5, ['C'])]:
+        for order in [[0, 1, 2, 3], [3, 2, 1, 0], [1, 3, 0, 2]]:
+            shuffled = table.iloc[order].reset_index(drop=True)
+            allocation = apportion(pd.Series({'Region': count}), shuffled).set_index('country')['merchant_count']
+            expected = pd.Series(count // 4, index=list('ABCD')) + pd.Series(1, index=winners).reindex(list('ABCD'), fill_value=0)
+            pd.testing.assert_series_equal(allocation.sort_index(), expected, check_names=False, check_dtype=False)
+
+
+def test_default_table_weights_sum_to_one_per_region():
+    weights = COUNTRY_TABLE.groupby('region')['weight'].sum()
+    np.testing.assert_allclose(weights.to_numpy(), 1.0)
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from tracker.addresses import ADDRESS_PREFIX, PAYLOAD_BYTES, encode_addresses
+from tracker.exclusions import ExclusionList, address_hashes, exclude, exclusion_counters
+
+
+def tron_addresses(rows, seed):
+    rng = np.random.default_rng(seed)
+    payloads = rng.integers(0, 256, (rows, PAYLOAD_BYTES), dtype='uint8')
+    payloads[:, 0] = ADDRESS_PREFIX
+    return list(encode_addresses(payloads))
+
+
+def write_lists(directory, listed):
+    """A .txt list with comments and blank lines, a .csv list with an address column, and a file to ignore"""
+    lines = ['# Exchange hot wallets', '', f'  {listed[0]}  ', f'{listed[1]}  # deposit address', '   ']
+    lines += listed[2:50] + ['# end']
+    (directory / 'exchanges.txt').write_text('\n'.join(lines) + '\n')
+    pd.DataFrame({'label': 'bridge', 'address': listed[50:]}).to_csv(directory / 'bridges.csv', index=False)
+    (directory / 'notes.md').write_text(tron_addresses(1, seed=9)[0] + '\n')
+
+
+def test_mixed_length_hashes_match_one_by_one():
+    # Lengths around every word boundary, plus non-ASCII text and an empty string
+    texts = [''.join(chr(65 + (i * 7 + j) % 26) for j in range(length)) for i, length in enumerate(range(41))]
+    texts += ['Tälle', '€' * 5, tron_addresses(1, seed=0)[0]]
+    hashes = address_hashes(pa.array(texts))
+    assert len(set(hashes.tolist())) == len(texts)
+    np.testing.assert_array_equal(hashes, [address_hashes([text])[0] for text in texts])
+
+    # Slices and chunks of an array, and Series, hash as their rows do on their own
+    np.testing.assert_array_equal(address_hashes(pa.array(texts).slice(5, 20)), hashes[5:25])
+    np.testing.assert_array_equal(address_hashes(pa.chunked_array([texts[:10], texts[10:]])), hashes)
+    np.testing.assert_array_equal(address_hashes(pd.Series(texts, dtype=str)), hashes)
+
+
+def test_fixed_width_hashes_match_mixed_length():
+    addresses = tron_addresses(200, seed=0)
+    mixed = address_hashes(pa.array(addresses + ['T']))[:-1]
+    np.testing.assert_array_equal(address_hashes(pa.array(addresses)), mixed)
+
+
+@pytest.mark.parametrize('mode', ['exact', 'bloom'])
+def test_lists_match_listed_addresses_only(tmp_path, mode):
+    listed = tron_addresses(200, seed=1)
+    write_lists(tmp_path, listed)
+    settings = {} if mode == 'exact' else {'exact_max_addresses': 0}
+    exclusions = ExclusionList.load([str(tmp_path)], settings)
+
+    assert exclusions.mode == mode
+    assert exclusions.size == len(listed)
+    assert [path.rsplit('/', 1)[-1] for path in exclusions.sources] == ['bridges.csv', 'exchanges.txt']
+    # A listed address is never missed
+    assert exclusions.contains(pd.Series(listed, dtype=str)).all()
+
+    unlisted = tron_addresses(20_000, seed=2) + ['', '# Exchange hot wallets', 'bridge', listed[0].lower()]
+    found = exclusions.contains(pd.Series(unlisted, dtype=str))
+    if mode == 'exact':
+        assert not found.any()
+    else:
+        assert found.mean() <= 5 * exclusions.settings['false_positive_rate']
+
+
+def test_exclude_counts_both_sides(tmp_path):
+    listed = tron_addresses(60, seed=1)
+    write_lists(tmp_path, listed)
+    exclusions = ExclusionList.load([str(tmp_path)])
+    shop, customer = tron_addresses(2, seed=3)
+    transfers = pd.DataFrame({
+        'sender': [customer, listed[0], customer, listed[1], listed[55]],
+        'receiver': [shop, shop, listed[2], listed[3], shop],
+        'amount': [10.0, 20.0, 30.0, 40.0, 50.0],
+    })
+
+    counters = exclusion_counters()
+    kept = exclude(transfers, exclusions, counters)
+    assert kept['amount'].tolist() == [10.0]
+    # A transfer between two listed addresses is excluded once and counted on both sides
+    assert counters == {'excluded_transfers': 4, 'sent_by_excluded': 3, 'received_by_excluded': 2}
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+from tracker.dataset import read_dataset, write_dataset
+from tracker.graph import GRAPH_CRITERIA, CustomerGraph, merchant_graph, reanalyze
+
+FILLERS = [f'M{i:02d}' for i in range(15)]
+
+
+def merchants_and_pairs():
+    """Shops with their own customers, plus:
+
+    AGG     an aggregator paid by 1,500 customers, only 800 of them in the
+            pairs (approximate customer state keeps part of a large base);
+    P2P     a trader 10 of whose 25 customers are merchants themselves;
+    SHOP_A  and SHOP_B, sharing 10 of their 12 customers each.
+    """
+    payments = {merchant: [f'{merchant}-c{i}' for i in range(5)] for merchant in FILLERS}
+    payments['AGG'] = [f'agg-c{i}' for i in range(800)]
+    payments['P2P'] = FILLERS[:10] + [f'p2p-c{i}' for i in range(15)]
+    shared = [f'shared-c{i}' for i in range(10)]
+    payments['SHOP_A'] = shared + ['a-c0', 'a-c1']
+    payments['SHOP_B'] = shared + ['b-c0', 'b-c1']
+
+    pairs = pd.Series(
+        [1 + i % 3 for customers in payments.values() for i in range(len(customers))],
+        index=pd.MultiIndex.from_tuples([(merchant, customer) for merchant, customers in payments.items()
+                                         for customer in customers], names=['receiver', 'sender']),
+        dtype='uint32',
+    ).sort_index()
+    merchants = pd.DataFrame({
+        'address': list(payments),
+        'unique_customers': [1500 if merchant == 'AGG' else len(customers) for merchant, customers in payments.items()],
+    })
+    return merchants, pairs
+
+
+EXPECTED_FLAGS = {'AGG': 'aggregator', 'P2P': 'p2p_trader', 'SHOP_A': 'shared_customers', 'SHOP_B': 'shared_customers'}
+
+
+def test_flags_and_clusters():
+    merchants, pairs = merchants_and_pairs()
+    merchants, graph = merchant_graph(merchants, pairs)
+
+    flags = merchants.set_index('address')['graph_flag']
+    assert flags.dropna().to_dict() == EXPECTED_FLAGS
+    clusters = pd.Series(graph.clusters, index=merchants['address'])
+    assert clusters[['SHOP_A', 'SHOP_B']].tolist() == [0, 0]
+    assert (clusters.drop(['SHOP_A', 'SHOP_B']) == -1).all()
+    assert graph.num_edges == len(pairs)
+
+
+def test_reanalyze_reproduces_and_persists_flags(tmp_path):
+    merchants, pairs = merchants_and_pairs()
+    merchants, graph = merchant_graph(merchants, pairs)
+    graph_path, dataset = str(tmp_path / 'customer_graph.npz'), str(tmp_path / 'merchants.parquet')
+    graph.save(graph_path)
+    # Rows in another order than the graph's, and flags to be filled back in
+    write_dataset(merchants.iloc[::-1].assign(graph_flag=None), dataset)
+
+    reanalyze(graph_path, dataset)
+    stored = read_dataset(dataset).set_index('address')['graph_flag']
+    pd.testing.assert_series_equal(stored.reindex(merchants['address']).astype(object),
+                                   merchants.set_index('address')['graph_flag'].astype(object), check_names=False)
+    saved = CustomerGraph.load(graph_path)
+    np.testing.assert_array_equal(saved.flags, graph.flags)
+    np.testing.assert_array_equal(saved.clusters, graph.clusters)
+
+    # New criteria reach both files
+    reanalyze(graph_path, dataset, dict(GRAPH_CRITERIA, aggregator_min_customers=5_000))
+    expected = {address: flag for address, flag in EXPECTED_FLAGS.items() if flag != 'aggregator'}
+    assert read_dataset(dataset).set_index('address')['graph_flag'].dropna().to_dict() == expected
+    assert (CustomerGraph.load(graph_path).flags == 0).sum() == 0
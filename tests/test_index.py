@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+import tracker.index
+from tracker.index import ACTIVITY_COLUMN, MerchantIndex
+
+REGIONS = ['Asia-Pacific', 'Europe', 'Latin America', 'North America']
+SIZES = ['Small', 'Medium', 'Large']
+
+
+def merchant_table(rows=3001, seed=0):
+    """Merchants with repeated values, missing values and a row count that is not a multiple of eight"""
+    rng = np.random.default_rng(seed)
+    volume = np.round(rng.lognormal(7, 2, rows), 2)
+    volume[rng.random(rows) < 0.05] = np.nan
+    regions = np.array(REGIONS, dtype=object)[rng.integers(0, len(REGIONS), rows)]
+    regions[rng.random(rows) < 0.02] = None
+    return pd.DataFrame({
+        'estimated_region': regions,
+        'merchant_size': np.array(SIZES, dtype=object)[rng.integers(0, len(SIZES), rows)],
+        'total_received_usdt': volume,
+        'avg_payment_size': np.round(rng.uniform(1, 500, rows), 2),
+        'transaction_count': rng.integers(10, 200, rows).astype('int64'),
+        'unique_customers': rng.integers(1, 50, rows).astype('int32'),
+    })
+
+
+def pandas_query(merchants, filters):
+    """Row ids matching the filters, by a mask over every row"""
+    mask = np.ones(len(merchants), dtype=bool)
+    for column, selection in filters.items():
+        if column == ACTIVITY_COLUMN:
+            values = merchants['transaction_count'].rank(pct=True) * 100
+        else:
+            values = merchants[column]
+        if isinstance(selection, list):
+            mask &= values.isin(selection).to_numpy()
+        else:
+            low, high = selection
+            # NaN compares false: missing values never match a range
+            mask &= ((values >= (-np.inf if low is None else low))
+                     & (values <= (np.inf if high is None else high))).to_numpy()
+    return np.flatnonzero(mask)
+
+
+QUERIES = [
+    # Selective: a narrow range, answered from its candidates
+    {'transaction_count': (100.5, 102.5)},
+    {'transaction_count': (100, 104), 'estimated_region': ['Europe'], 'total_received_usdt': (500.005, None)},
+    {'avg_payment_size': (250.004, 260.996), 'merchant_size': ['Large', 'Medium']},
+    # Broad: several large filters, answered from bitmaps
+    {'estimated_region': ['Asia-Pacific', 'Europe', 'North America']},
+    {'estimated_region': ['Europe', 'Latin America'], 'total_received_usdt': (100.001, None)},
+    {'total_received_usdt': (None, 5000.5), 'unique_customers': (4.5, 40.5), 'merchant_size': ['Small']},
+    {ACTIVITY_COLUMN: (25, 75), 'avg_payment_size': (None, 400)},
+    # Bounds outside the values, empty ranges and unknown categories
+    {'total_received_usdt': (-1.0, 1e12)},
+    {'unique_customers': (60, None)},
+    {'transaction_count': (150, 120)},
+    {'estimated_region': ['Antarctica']},
+    {},
+]
+
+
+@pytest.mark.parametrize('filters', QUERIES)
+def test_query_matches_pandas(filters):
+    merchants = merchant_table()
+    index = MerchantIndex(pa.Table.from_pandas(merchants, preserve_index=False))
+    np.testing.assert_array_equal(index.query(filters), pandas_query(merchants, filters))
+
+
+@pytest.mark.parametrize('path', ['sparse', 'dense'])
+@pytest.mark.parametrize('filters', QUERIES)
+def test_query_paths_agree(monkeypatch, filters, path):
+    merchants = merchant_table()
+    index = MerchantIndex(pa.Table.from_pandas(merchants, preserve_index=False))
+    # Every query takes one path: all candidates are tested, or all filters are ANDed as bitmaps
+    monkeypatch.setattr(tracker.index, 'SPARSE_FRACTION', 1 if path == 'sparse' else len(merchants) + 1)
+    np.testing.assert_array_equal(index.query(filters), pandas_query(merchants, filters))
@@ -0,0 +1,75 @@
+import numpy as np
+import pyarrow as pa
+import pytest
+
+from tracker.addresses import ADDRESS_PREFIX, PAYLOAD_BYTES, encode_addresses
+from tracker.lookup import PREFIX_CHARS, AddressLookup
+
+
+def payload_addresses(rows=3000, seed=0):
+    """Payloads of TRON addresses, in groups sharing their first bytes (and so their first characters)"""
+    rng = np.random.default_rng(seed)
+    payloads = rng.integers(0, 256, (rows, PAYLOAD_BYTES), dtype='uint8')
+    payloads[:, 0] = ADDRESS_PREFIX
+    # About a third of the rows share their first eight bytes with 99 others: their texts agree well past PREFIX_CHARS
+    groups = rows // 300
+    payloads[:groups * 100, 1:8] = rng.integers(0, 256, (groups, 7), dtype='uint8').repeat(100, axis=0)
+    return payloads
+
+
+def text_lookup(addresses):
+    """Lookup over a legacy table storing address text"""
+    stored = np.array([address.encode() for address in addresses], dtype='S40')
+    return AddressLookup(stored.view('uint8').reshape(len(stored), 40), pa.array(addresses, pa.string()))
+
+
+def expected_prefix(addresses, prefix, limit):
+    """Rows starting with prefix (any case), ordered as the prefix index orders them"""
+    wanted = prefix.strip().lower()
+    rows = [row for row, address in enumerate(addresses) if address.lower().startswith(wanted)]
+    return sorted(rows, key=lambda row: (addresses[row].lower()[:PREFIX_CHARS], row))[:limit]
+
+
+@pytest.fixture(scope='module')
+def lookup():
+    payloads = payload_addresses()
+    addresses = list(encode_addresses(payloads))
+    return AddressLookup(payloads, pa.array(addresses, pa.string())), addresses
+
+
+def test_find_matches_dict(lookup):
+    lookup, addresses = lookup
+    rows = {address: row for row, address in enumerate(addresses)}
+    for address, row in rows.items():
+        assert lookup.find(address) == row
+    assert lookup.find(f'  {addresses[7]}\n') == 7
+
+    # Valid addresses that are not in the table, and strings that are no address at all
+    others = encode_addresses(payload_addresses(500, seed=1))
+    assert [lookup.find(address) for address in others] == [rows.get(address) for address in others]
+    for text in ['', 'T', addresses[0][:-1], addresses[0] + '1', addresses[0].lower(), 'x' * 34]:
+        assert lookup.find(text) is None
+
+
+def test_find_legacy_text_addresses():
+    addresses = [f'legacy-{i}' for i in range(1000)] + ['', 'L' * 40]
+    lookup = text_lookup(addresses)
+    for row, address in enumerate(addresses[:-2]):
+        assert lookup.find(address) == row
+    assert lookup.find('legacy-1000') is None
+    assert lookup.find('L' * 41) is None
+
+
+@pytest.mark.parametrize('limit', [1, 3, 10, 1000])
+def test_prefix_matches_startswith_scan(lookup, limit):
+    lookup, addresses = lookup
+    shared = addresses[0]
+    prefixes = [
+        'T', 't', 'TX', shared[:PREFIX_CHARS - 1], shared[:PREFIX_CHARS], shared[:PREFIX_CHARS].upper(),
+        shared[:PREFIX_CHARS + 1], shared[:PREFIX_CHARS + 3].lower(), shared, addresses[-1][:PREFIX_CHARS + 2],
+        shared[:PREFIX_CHARS] + '~', 'Tzzzzzzzzz', 'A',
+    ]
+    for prefix in prefixes:
+        assert lookup.prefix(prefix, limit) == expected_prefix(addresses, prefix, limit), prefix
+    assert lookup.prefix('   ', limit) == []
+    assert lookup.addresses(lookup.prefix(shared, limit)) == [shared]
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+from tracker.sketches import HeavyHitters
+from tracker.state import CUSTOMER_SKETCH, build_state
+
+
+def transfers_with_one_time_senders(seed=0):
+    """Addresses with far more customers than a summary holds, plus a shop with a few repeat customers
+
+    ONE_TIME is paid once by each sender, so every merge evicts all of its counters.
+    """
+    rng = np.random.default_rng(seed)
+    capacity = HeavyHitters.capacity_for_error(CUSTOMER_SKETCH['share_error'])
+    one_time = 30 * capacity
+    senders = [f'O{i:06d}' for i in range(one_time)] + [f'S{i:06d}' for i in range(one_time)]
+    receivers = ['ONE_TIME'] * one_time + ['PROCESSOR'] * one_time
+    # Returning customers of the processor, and a shop below the summary's capacity
+    for i in rng.integers(0, one_time, 500):
+        senders.append(f'S{i:06d}')
+        receivers.append('PROCESSOR')
+    for i in rng.integers(0, capacity // 2, 2000):
+        senders.append(f'C{i:06d}')
+        receivers.append('SHOP')
+
+    n = len(senders)
+    order = rng.permutation(n)
+    return pd.DataFrame({
+        'timestamp': rng.integers(1_750_000_000, 1_750_600_000, n).astype('int64'),
+        'sender': pd.Series(senders, dtype=str).to_numpy()[order],
+        'receiver': pd.Series(receivers, dtype=str).to_numpy()[order],
+        'amount': rng.uniform(10, 500, n),
+    })
+
+
+def test_approximate_stats_survive_fully_evicted_summaries():
+    transfers = transfers_with_one_time_senders()
+    chunks = [transfers.iloc[start:start + 1000] for start in range(0, len(transfers), 1000)]
+
+    exact = build_state(chunks).stats()
+    state = build_state(chunks, approximate={})
+    approximate = state.stats()
+
+    # Truncation left ONE_TIME with no counters at all
+    assert 'ONE_TIME' in state.customers.top.error.index
+    assert 'ONE_TIME' not in state.customers.top.counts.index.get_level_values(0)
+    assert list(approximate.index) == list(exact.index)
+
+    unique = approximate['unique_customers'] / exact['unique_customers']
+    assert (abs(unique[['ONE_TIME', 'PROCESSOR']] - 1) < 3 * CUSTOMER_SKETCH['distinct_error']).all()
+    assert approximate.loc['ONE_TIME', 'returning_customers'] == 0
+    returning = approximate.loc['PROCESSOR', 'returning_customers'] / exact.loc['PROCESSOR', 'returning_customers']
+    assert abs(returning - 1) < 0.25
+
+    # max_customer_payments is an upper bound within share_error of the transaction count
+    share = approximate['max_customer_payments'] / approximate['transaction_count']
+    true_share = exact['max_customer_payments'] / exact['transaction_count']
+    assert (share >= true_share).all()
+    assert (share - true_share <= CUSTOMER_SKETCH['share_error']).all()
+
+    # Addresses that never overflow are tracked exactly
+    columns = ['unique_customers', 'returning_customers', 'max_customer_payments']
+    pd.testing.assert_series_equal(approximate.loc['SHOP', columns], exact.loc['SHOP', columns])
@@ -0,0 +1,3 @@
+"""
+TRON Merchant Analytics - data pipeline and dashboard helpers
+"""
@@ -0,0 +1,193 @@
+"""
+TRON Address Encoding
+Vectorized Base58Check decoding, validation and encoding
+
+A TRON address such as TDyJcGtapGG7... is the Base58 form of 25 bytes:
+a 21-byte payload (0x41 followed by the 20-byte account hash) and a 4-byte
+checksum (first 4 bytes of SHA-256(SHA-256(payload))). Base58 is case
+sensitive, so lowercased addresses fail validation.
+
+Whole columns are decoded at once: the Base58 arithmetic runs on 32-bit
+limbs in NumPy, one pass per character position, instead of a Python
+big-integer loop per address. Payloads are what the dashboard keeps in
+memory (21 bytes per address); address_keys() turns them into uint64 join
+keys.
+"""
+
+import hashlib
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+ALPHABET = b'123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+
+ADDRESS_LENGTH = 34
+PAYLOAD_BYTES = 21
+CHECKSUM_BYTES = 4
+ADDRESS_PREFIX = 0x41
+
+# 25 decoded bytes fit in 7 big-endian 32-bit limbs (28 bytes)
+_LIMBS = 7
+_LIMB_MASK = np.uint64(0xFFFFFFFF)
+_DIGITS = np.full(256, 255, dtype='uint8')
+_DIGITS[np.frombuffer(ALPHABET, dtype='uint8')] = np.arange(58, dtype='uint8')
+_ALPHABET_ARRAY = np.frombuffer(ALPHABET, dtype='uint8')
+
+
+def _checksums(payloads):
+    """First 4 bytes of double SHA-256 for each payload row"""
+    data = np.ascontiguousarray(payloads).tobytes()
+    width = payloads.shape[1]
+    digests = b''.join(
+        hashlib.sha256(hashlib.sha256(data[i:i + width]).digest()).digest()[:CHECKSUM_BYTES]
+        for i in range(0, len(data), width)
+    )
+    return np.frombuffer(digests, dtype='uint8').reshape(-1, CHECKSUM_BYTES)
+
+
+def _limbs_to_bytes(limbs):
+    return limbs.astype('>u4').view('uint8').reshape(len(limbs), _LIMBS * 4)
+
+
+def _bytes_to_limbs(raw):
+    padded = np.zeros((len(raw), _LIMBS * 4), dtype='uint8')
+    padded[:, -raw.shape[1]:] = raw
+    return padded.view('>u4').reshape(len(raw), _LIMBS).astype('uint64')
+
+
+def decode_addresses(addresses):
+    """Decode Base58Check addresses
+
+    Returns (payloads, valid): an (N, 21) uint8 array and a boolean mask of
+    rows with a well-formed TRON address and a matching checksum. Payload
+    rows for invalid addresses are zero.
+    """
+    addresses = pd.Series(addresses, dtype=object).fillna('').astype(str)
+    payloads = np.zeros((len(addresses), PAYLOAD_BYTES), dtype='uint8')
+    valid = (addresses.str.len() == ADDRESS_LENGTH).to_numpy() & addresses.map(str.isascii).to_numpy()
+    if not valid.any():
+        return payloads, valid
+
+    rows = np.flatnonzero(valid)
+    chars = np.frombuffer(''.join(addresses.iloc[rows]).encode('ascii'), dtype='uint8')
+    digits = _DIGITS[chars].reshape(len(rows), ADDRESS_LENGTH)
+    ok = (digits != 255).all(axis=1)
+
+    # limbs = limbs * 58 + digit, for each character position
+    limbs = np.zeros((len(rows), _LIMBS), dtype='uint64')
+    overflow = np.zeros(len(rows), dtype='uint64')
+    for position in range(ADDRESS_LENGTH):
+        carry = np.where(ok, digits[:, position], 0).astype('uint64')
+        for limb in range(_LIMBS - 1, -1, -1):
+            value = limbs[:, limb] * np.uint64(58) + carry
+            limbs[:, limb] = value & _LIMB_MASK
+            carry = value >> np.uint64(32)
+        overflow |= carry
+
+    raw = _limbs_to_bytes(limbs)
+    # Only the last 25 of the 28 limb bytes may be used
+    ok &= (overflow == 0) & (raw[:, :3] == 0).all(axis=1)
+    decoded = raw[:, 3:]
+    payload = decoded[:, :PAYLOAD_BYTES]
+    ok &= payload[:, 0] == ADDRESS_PREFIX
+    if ok.any():
+        checked = np.flatnonzero(ok)
+        ok[checked] &= (_checksums(payload[checked]) == decoded[checked, PAYLOAD_BYTES:]).all(axis=1)
+
+    valid[rows] = ok
+    payloads[rows[ok]] = payload[ok]
+    return payloads, valid
+
+
+def decode_address(address):
+    """Payload of a single address (a 21-byte uint8 array), or None if it does not validate
+
+    A Python big-integer decode: for one address (a lookup) it is much
+    cheaper than setting up decode_addresses().
+    """
+    if len(address) != ADDRESS_LENGTH or not address.isascii():
+        return None
+    value = 0
+    for char in address.encode('ascii'):
+        digit = int(_DIGITS[char])
+        if digit == 255:
+            return None
+        value = value * 58 + digit
+    if value >> (8 * (PAYLOAD_BYTES + CHECKSUM_BYTES)):
+        return None
+    raw = value.to_bytes(PAYLOAD_BYTES + CHECKSUM_BYTES, 'big')
+    payload = raw[:PAYLOAD_BYTES]
+    if payload[0] != ADDRESS_PREFIX or \
+            hashlib.sha256(hashlib.sha256(payload).digest()).digest()[:CHECKSUM_BYTES] != raw[PAYLOAD_BYTES:]:
+        return None
+    return np.frombuffer(payload, dtype='uint8')
+
+
+def encode_addresses(payloads):
+    """Base58Check-encode (N, 21) payloads back to address strings"""
+    payloads = np.asarray(payloads, dtype='uint8').reshape(-1, PAYLOAD_BYTES)
+    if not len(payloads):
+        return np.array([], dtype=str)
+
+    raw = np.concatenate([payloads, _checksums(payloads)], axis=1)
+    limbs = _bytes_to_limbs(raw)
+
+    # Repeated division by 58; remainders are digits, least significant first.
+    # A 0x41-prefixed 25-byte value always has exactly 34 Base58 digits.
+    digits = np.empty((len(payloads), ADDRESS_LENGTH), dtype='uint8')
+    for position in range(ADDRESS_LENGTH - 1, -1, -1):
+        remainder = np.zeros(len(payloads), dtype='uint64')
+        for limb in range(_LIMBS):
+            current = (remainder << np.uint64(32)) | limbs[:, limb]
+            limbs[:, limb] = current // np.uint64(58)
+            remainder = current % np.uint64(58)
+        digits[:, position] = remainder
+
+    chars = _ALPHABET_ARRAY[digits]
+    return chars.view(f'S{ADDRESS_LENGTH}').ravel().astype(str)
+
+
+def encode_address(payload):
+    """Address string of a single 21-byte payload (the scalar counterpart of encode_addresses)"""
+    payload = bytes(np.asarray(payload, dtype='uint8'))
+    value = int.from_bytes(payload + hashlib.sha256(hashlib.sha256(payload).digest()).digest()[:CHECKSUM_BYTES], 'big')
+    chars = bytearray(ADDRESS_LENGTH)
+    for position in range(ADDRESS_LENGTH - 1, -1, -1):
+        value, digit = divmod(value, 58)
+        chars[position] = ALPHABET[digit]
+    return chars.decode('ascii')
+
+
+def is_valid_address(addresses):
+    """Boolean mask of valid TRON Base58Check addresses"""
+    return decode_addresses(addresses)[1]
+
+
+def valid_address_mask(addresses):
+    """Validity per row, decoding each distinct address only once"""
+    codes, uniques = pd.factorize(pd.Series(addresses))
+    return is_valid_address(pd.Series(uniques))[codes]
+
+
+def address_keys(payloads):
+    """uint64 join key per payload (bytes 1-8 of the 20-byte account hash)"""
+    payloads = np.ascontiguousarray(payloads, dtype='uint8')
+    return payloads[:, 1:9].copy().view('>u8').ravel().astype('uint64')
+
+
+def pack_payloads(payloads, index=None, name='address'):
+    """(N, 21) payloads as a fixed-width binary pandas column"""
+    payloads = np.ascontiguousarray(payloads, dtype='uint8')
+    array = pa.FixedSizeBinaryArray.from_buffers(
+        pa.binary(PAYLOAD_BYTES), len(payloads), [None, pa.py_buffer(payloads.tobytes())])
+    return pd.Series(pd.arrays.ArrowExtensionArray(array), index=index, name=name)
+
+
+def unpack_payloads(column):
+    """(N, 21) uint8 array from a column built by pack_payloads"""
+    array = column.array._pa_array.combine_chunks()
+    buffer = array.buffers()[1]
+    data = np.frombuffer(buffer, dtype='uint8')
+    start = array.offset * PAYLOAD_BYTES
+    return data[start:start + len(array) * PAYLOAD_BYTES].reshape(len(array), PAYLOAD_BYTES)
@@ -0,0 +1,519 @@
+"""
+Dashboard Charts
+Figure builders and header values for the dashboard, independent of Streamlit
+
+Every chart the dashboard shows is built here from the merchant cube, the
+apportioned country table or (for the customer/transaction chart) the
+merchant rows, so the live app, the summary builder (tracker.summary) and
+static exports all draw exactly the same figures.
+
+dashboard_figures() lists every figure the dashboard can show for a
+dataset - one per chart and choice of its controls - with the name it is
+stored under (tracker.summary.figure_name).
+"""
+
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+
+from tracker.countries import apportion
+from tracker.cube import ACTIVITY_BIN_LABELS, HOUR_STATISTICS, PAYMENT_BIN_LABELS, rollup
+from tracker.density import SCATTER_POINT_LIMIT, decade_ticks, density_grid
+from tracker.page import REGION_COLORS
+from tracker.profiles import hourly_profile
+
+# Merchants found cover about a third of TRON's daily active addresses
+MULTIPLIER = 2.5
+
+EMERGING_REGIONS = ['Asia-Pacific', 'Europe-Africa']
+
+# Hourly chart weightings (cube measures)
+HOURLY_WEIGHTS = {
+    'Merchants': 'merchants',
+    'Volume': 'total_received_usdt',
+    'Transactions': 'transaction_count',
+}
+TIME_BASES = list(HOUR_STATISTICS)
+
+# Payment size statistic to bin (percentiles come from the pipeline's quantile sketches)
+PAYMENT_STATISTIC_LABELS = {
+    'Average': 'avg_payment_size',
+    'Median': 'median_payment_size',
+    '90th Percentile': 'p90_payment_size',
+}
+
+# Merchant columns the customer/transaction chart reads
+SCATTER_COLUMNS = ['estimated_region', 'unique_customers', 'transaction_count', 'total_received_usdt']
+
+
+def region_distribution(cube):
+    """Merchants per region, largest first"""
+    return rollup(cube, ['estimated_region'])['merchants'].sort_values(ascending=False, kind='stable')
+
+
+def header_summary(cube, multiplier=MULTIPLIER):
+    """Header metrics and regional cards as plain values"""
+    totals = rollup(cube, [])
+    region_dist = region_distribution(cube)
+    total_merchants = int(totals['merchants'])
+    emerging_count = int(region_dist.reindex(EMERGING_REGIONS, fill_value=0).sum())
+
+    return {
+        'metrics': {
+            'total_merchants': total_merchants,
+            'merchant_count': int(total_merchants * multiplier),
+            'total_volume': float(totals['total_received_usdt'] * multiplier),
+            'emerging_pct': emerging_count / total_merchants * 100 if total_merchants > 0 else 0,
+            'multiplier': multiplier,
+        },
+        'regions': [
+            {
+                'region': str(region),
+                'merchants': int(count),
+                'percentage': count / total_merchants * 100 if total_merchants > 0 else 0,
+                'estimated_merchants': int(count * multiplier),
+            }
+            for region, count in region_dist.items()
+        ],
+    }
+
+
+def country_rankings(country_df, limit=10):
+    """Top countries by adoption rate, and by estimated merchants among those with any"""
+    top_countries = country_df.nlargest(limit, 'adoption_rate')[['country', 'adoption_rate', 'global_rank']]
+    merchant_leaders = country_df[country_df['has_merchants']].nlargest(limit, 'estimated_merchants')[
+        ['country', 'estimated_merchants']
+    ]
+    return {
+        'top_adoption': top_countries.to_dict('records'),
+        'merchant_leaders': merchant_leaders.to_dict('records'),
+    }
+
+
+def payment_statistics(cube):
+    """Payment statistics with binned values in this cube, label -> column"""
+    payment_bin_counts = cube.groupby(['statistic', 'payment_bin'])['merchants'].sum()
+    return {label: col for label, col in PAYMENT_STATISTIC_LABELS.items()
+            if col in payment_bin_counts.index.get_level_values(0)
+            and (payment_bin_counts[col].index >= 0).any()}
+
+
+def dashboard_controls(cube):
+    """Options of the dashboard's chart controls, as plain values"""
+    return {
+        'hourly_weightings': list(HOURLY_WEIGHTS),
+        'time_bases': list(TIME_BASES),
+        'payment_statistics': payment_statistics(cube),
+    }
+
+
+def heatmap_figure(country_df):
+    # Create choropleth with better hover
+    fig = go.Figure()
+
+    fig.add_trace(go.Choropleth(
+        locations=country_df['iso_alpha3'],
+        locationmode='ISO-3',
+        z=country_df['adoption_rate'],
+        text=country_df['country'],
+        customdata=country_df[['global_rank', 'adoption_rate', 'merchant_count', 'estimated_merchants']],
+        colorscale=[
+            [0, '#1a1a1a'],
+            [0.2, '#2a3a2a'],
+            [0.4, '#3a5a3a'],
+            [0.6, '#4a7a4a'],
+            [0.8, '#5a9a5a'],
+            [1.0, '#00ff88']
+        ],
+        hovertemplate='<b style="font-size: 16px; font-family: IBM Plex Sans">%{text}</b><br><br>' +
+                      '<span style="font-family: IBM Plex Sans">Global Crypto Rank: <b>#%{customdata[0]}</b></span><br>' +
+                      '<span style="font-family: IBM Plex Sans">Adoption Rate: <b>%{customdata[1]:.1f}%</b></span><br>' +
+                      '<span style="font-family: IBM Plex Sans">TRON Merchants: <b>%{customdata[3]:,}</b></span>' +
+                      '<extra></extra>',
+        marker=dict(
+            line=dict(color='#333', width=0.5)
+        ),
+        colorbar=dict(
+            title="Crypto<br>Adoption %",
+            tickformat='.0f',
+            bgcolor='#111',
+            bordercolor='#333',
+            borderwidth=1,
+            tickfont=dict(color='#999'),
+            x=1.1
+        )
+    ))
+
+    # Update layout
+    fig.update_layout(
+        geo=dict(
+            showframe=False,
+            showcoastlines=True,
+            coastlinecolor='#444',
+            projection_type='natural earth',
+            bgcolor='#0a0a0a',
+            showcountries=True,
+            countrycolor='#222',
+            showocean=True,
+            oceancolor='#0a0a0a',
+            showlakes=False,
+        ),
+        paper_bgcolor='#0a0a0a',
+        plot_bgcolor='#0a0a0a',
+        height=700,
+        margin=dict(l=0, r=0, t=30, b=0),
+        font=dict(family='IBM Plex Sans', color='#999'),
+        hoverlabel=dict(
+            bgcolor='#111',
+            bordercolor='#333',
+            font=dict(family='IBM Plex Sans', size=14)
+        )
+    )
+    return fig
+
+
+def hourly_figure(cube, weighting='Merchants', time_basis='UTC', region_order=None):
+    # Hourly profile per region in one bincount pass over the cube's hour cells
+    # (merchants at their peak hour; transactions and volume over each merchant's histogram)
+    cells = rollup(cube, ['estimated_region', 'hour'], statistic=HOUR_STATISTICS[time_basis]).reset_index()
+    profile = hourly_profile(cells['estimated_region'].astype(str), cells['hour'].astype('int64') * 3600,
+                             weights=cells[HOURLY_WEIGHTS[weighting]], normalize=True)
+
+    if region_order is None:
+        region_order = region_distribution(cube).index
+    hour_label = f'Hour ({time_basis})'
+    value_label = f'Percentage of {weighting}'
+    hourly_df = (profile.reindex([region for region in region_order if region in profile.index])
+                 .rename_axis('Region').rename_axis(hour_label, axis=1)
+                 .stack().rename(value_label).reset_index())
+
+    # Create grouped bar chart with better formatting and thinner bars
+    fig = px.bar(
+        hourly_df,
+        x=hour_label,
+        y=value_label,
+        color='Region',
+        title='',
+        color_discrete_map=REGION_COLORS
+    )
+
+    # Update traces for thinner bars
+    fig.update_traces(
+        width=0.6,  # Make bars thinner
+        hovertemplate=f'<b style="font-family: IBM Plex Sans">Hour %{{x}}:00 {time_basis}</b><br>' +
+                      '<span style="font-family: IBM Plex Sans">Percentage: <b>%{y:.1f}%</b></span><br>' +
+                      '<extra></extra>'
+    )
+
+    fig.update_layout(
+        paper_bgcolor='#0a0a0a',
+        plot_bgcolor='#111',
+        font=dict(color='#999', family='IBM Plex Sans'),
+        xaxis=dict(
+            gridcolor='#222',
+            tickmode='linear',
+            tick0=0,
+            dtick=2
+        ),
+        yaxis=dict(gridcolor='#222'),
+        legend=dict(
+            bgcolor='#111',
+            bordercolor='#333',
+            borderwidth=1
+        ),
+        height=500,
+        hoverlabel=dict(
+            bgcolor='#111',
+            bordercolor='#333',
+            font=dict(family='IBM Plex Sans', size=14)
+        ),
+        bargap=0.2  # Add gap between groups
+    )
+    return fig
+
+
+def payment_figure(cube, statistic='avg_payment_size'):
+    # Payment sizes in $5 bins: 0-5, 5-10, 10-15, ..., 95-100
+    labels = {col: label for label, col in PAYMENT_STATISTIC_LABELS.items()}
+    payment_bin_counts = cube.groupby(['statistic', 'payment_bin'])['merchants'].sum()
+    payment_dist = payment_bin_counts[statistic].reindex(range(len(PAYMENT_BIN_LABELS)), fill_value=0)
+    payment_dist.index = PAYMENT_BIN_LABELS
+
+    fig = go.Figure(data=[go.Bar(
+        x=payment_dist.index,
+        y=payment_dist.values,
+        marker=dict(
+            color='#00ff88',
+            line=dict(width=0)  # Remove outline
+        ),
+        hovertemplate='<b style="font-family: IBM Plex Sans">%{x}</b><br>' +
+                      '<span style="font-family: IBM Plex Sans">Merchants: <b>%{y}</b></span>' +
+                      '<extra></extra>',
+        width=0.8  # Make bars thinner
+    )])
+
+    fig.update_layout(
+        paper_bgcolor='#0a0a0a',
+        plot_bgcolor='#111',
+        font=dict(color='#999', family='IBM Plex Sans'),
+        xaxis=dict(
+            gridcolor='#222',
+            title=f'{labels[statistic]} Payment Size (USDT)',
+            tickangle=45
+        ),
+        yaxis=dict(
+            gridcolor='#222',
+            title='Number of Merchants'
+        ),
+        height=400,
+        hoverlabel=dict(
+            bgcolor='#111',
+            bordercolor='#333',
+            font=dict(family='IBM Plex Sans', size=14)
+        ),
+        bargap=0.1  # Thinner bars
+    )
+    return fig
+
+
+def scatter_figure(merchants, density=None):
+    """Customers vs transactions: one point per merchant, or a density grid of all of them
+
+    density is a precomputed density_grid() of the merchants, if any.
+    """
+    if len(merchants) <= SCATTER_POINT_LIMIT:
+        # Every merchant as a WebGL point - no sampling, so each rerun shows the same chart
+        fig = px.scatter(
+            merchants,
+            x='unique_customers',
+            y='transaction_count',
+            size='total_received_usdt',
+            color='estimated_region',
+            labels={
+                'unique_customers': 'Unique Customers',
+                'transaction_count': 'Total Transactions'
+            },
+            color_discrete_map=REGION_COLORS,
+            size_max=30,
+            opacity=0.7,
+            render_mode='webgl'
+        )
+
+        # Update hover template to include region
+        fig.update_traces(
+            hovertemplate='<b style="font-family: IBM Plex Sans">%{fullData.name}</b><br><br>' +
+                          '<span style="font-family: IBM Plex Sans">Customers: <b>%{x:,}</b></span><br>' +
+                          '<span style="font-family: IBM Plex Sans">Transactions: <b>%{y:,}</b></span><br>' +
+                          '<span style="font-family: IBM Plex Sans">Volume: <b>$%{marker.size:,.0f}</b></span>' +
+                          '<extra></extra>'
+        )
+        xaxis = dict(gridcolor='#222', type='log', title='Unique Customers (log scale)')
+        yaxis = dict(gridcolor='#222', type='log', title='Total Transactions (log scale)')
+    else:
+        # Too many merchants to send as points: all of them binned on a log-log grid
+        if density is None:
+            density = density_grid(merchants['unique_customers'], merchants['transaction_count'],
+                                   weights=merchants['total_received_usdt'])
+        counts, volume, x_edges, y_edges = density
+        filled = counts > 0
+        cell_ranges = np.stack(np.broadcast_arrays(
+            10 ** x_edges[None, :-1], 10 ** x_edges[None, 1:],
+            10 ** y_edges[:-1, None], 10 ** y_edges[1:, None], counts, volume,
+        ), axis=-1).round().astype('int64')
+
+        fig = go.Figure(go.Heatmap(
+            x=(x_edges[:-1] + x_edges[1:]) / 2,
+            y=(y_edges[:-1] + y_edges[1:]) / 2,
+            z=np.where(filled, np.log10(np.where(filled, counts, 1)), np.nan).round(3),
+            customdata=cell_ranges,
+            colorscale=[[0, '#1a3a2a'], [0.5, '#00cc66'], [1.0, '#00ff88']],
+            colorbar=dict(
+                title='Merchants',
+                tickvals=decade_ticks([0, np.log10(max(counts.max(), 10))])[0],
+                ticktext=decade_ticks([0, np.log10(max(counts.max(), 10))])[1],
+                bgcolor='#111',
+                bordercolor='#333',
+                borderwidth=1,
+                tickfont=dict(color='#999')
+            ),
+            hovertemplate='<span style="font-family: IBM Plex Sans">Customers: <b>%{customdata[0]:,.0f}-%{customdata[1]:,.0f}</b></span><br>' +
+                          '<span style="font-family: IBM Plex Sans">Transactions: <b>%{customdata[2]:,.0f}-%{customdata[3]:,.0f}</b></span><br>' +
+                          '<span style="font-family: IBM Plex Sans">Merchants: <b>%{customdata[4]:,}</b></span><br>' +
+                          '<span style="font-family: IBM Plex Sans">Volume: <b>$%{customdata[5]:,.0f}</b></span>' +
+                          '<extra></extra>'
+        ))
+        x_ticks, y_ticks = decade_ticks(x_edges), decade_ticks(y_edges)
+        xaxis = dict(gridcolor='#222', title='Unique Customers (log scale)', tickvals=x_ticks[0], ticktext=x_ticks[1])
+        yaxis = dict(gridcolor='#222', title='Total Transactions (log scale)', tickvals=y_ticks[0], ticktext=y_ticks[1])
+
+    fig.update_layout(
+        paper_bgcolor='#0a0a0a',
+        plot_bgcolor='#111',
+        font=dict(color='#999', family='IBM Plex Sans'),
+        xaxis=xaxis,
+        yaxis=yaxis,
+        legend=dict(
+            bgcolor='#111',
+            bordercolor='#333',
+            borderwidth=1,
+            title='Region'
+        ),
+        height=600,
+        hoverlabel=dict(
+            bgcolor='#111',
+            bordercolor='#333',
+            font=dict(family='IBM Plex Sans', size=14)
+        )
+    )
+    return fig
+
+
+def activity_figure(cube):
+    activity_counts = rollup(cube, ['activity_bin'])['merchants']
+    activity_counts.index = [ACTIVITY_BIN_LABELS[i] for i in activity_counts.index]
+
+    activity_dist = activity_counts.sort_values(ascending=False, kind='stable').reset_index()
+    activity_dist.columns = ['Activity Level', 'Count']
+    activity_dist['Percentage'] = (activity_dist['Count'] / activity_dist['Count'].sum() * 100).round(1)
+
+    fig = px.pie(
+        activity_dist,
+        values='Count',
+        names='Activity Level',
+        title='',
+        color_discrete_sequence=['#333', '#666', '#00cc66', '#00ff88']
+    )
+
+    fig.update_traces(
+        hovertemplate='<b style="font-family: IBM Plex Sans">%{label}</b><br>' +
+                      '<span style="font-family: IBM Plex Sans">Merchants: <b>%{value:,}</b></span><br>' +
+                      '<span style="font-family: IBM Plex Sans">Percentage: <b>%{percent}</b></span>' +
+                      '<extra></extra>',
+        textinfo='label+percent',
+        textfont=dict(family='IBM Plex Sans', size=14)
+    )
+
+    fig.update_layout(
+        paper_bgcolor='#0a0a0a',
+        plot_bgcolor='#0a0a0a',
+        font=dict(color='#999', family='IBM Plex Sans'),
+        showlegend=True,
+        legend=dict(
+            bgcolor='#111',
+            bordercolor='#333',
+            borderwidth=1
+        ),
+        height=500,
+        margin=dict(t=50, b=50),
+        hoverlabel=dict(
+            bgcolor='#111',
+            bordercolor='#333',
+            font=dict(family='IBM Plex Sans', size=14)
+        )
+    )
+    return fig
+
+
+def merchant_hourly_figure(hours, region=None, utc_offset=None):
+    """One merchant's transactions per UTC hour, with its inferred local time in the hover"""
+    try:
+        utc_offset = int(utc_offset)
+    except (TypeError, ValueError):
+        # Missing offset (None, NaN or NA): UTC only
+        utc_offset = None
+    hours = np.asarray(hours, dtype='int64')
+    shares = hours / hours.sum() * 100 if hours.sum() else np.zeros(24)
+    utc_hours = np.arange(24)
+    local = [f'{(hour + utc_offset) % 24:02d}:00 local' if utc_offset is not None else '' for hour in utc_hours]
+
+    fig = go.Figure(go.Bar(
+        x=utc_hours,
+        y=hours,
+        customdata=np.column_stack([shares, local]),
+        marker_color=REGION_COLORS.get(region, '#00ff88'),
+        width=0.6,
+        hovertemplate='<b style="font-family: IBM Plex Sans">Hour %{x}:00 UTC</b> %{customdata[1]}<br>' +
+                      '<span style="font-family: IBM Plex Sans">Transactions: <b>%{y:,}</b> (%{customdata[0]:.1f}%)</span>' +
+                      '<extra></extra>'
+    ))
+
+    fig.update_layout(
+        paper_bgcolor='#0a0a0a',
+        plot_bgcolor='#111',
+        font=dict(color='#999', family='IBM Plex Sans'),
+        xaxis=dict(
+            title='Hour (UTC)',
+            gridcolor='#222',
+            tickmode='linear',
+            tick0=0,
+            dtick=2
+        ),
+        yaxis=dict(title='Transactions', gridcolor='#222'),
+        height=350,
+        margin=dict(t=20, b=50),
+        hoverlabel=dict(
+            bgcolor='#111',
+            bordercolor='#333',
+            font=dict(family='IBM Plex Sans', size=14)
+        )
+    )
+    return fig
+
+
+def degree_figure(degrees):
+    """Log-binned degree distributions of the merchant-customer graph (tracker.graph.graph_view)"""
+    fig = go.Figure()
+    for side, label, color in [('merchants', 'Customers per merchant', '#00ff88'),
+                               ('customers', 'Merchants per customer', '#666')]:
+        bins = degrees[side]['bins']
+        fig.add_trace(go.Bar(
+            x=[f'{low:,}' if low < 2 else f'{low:,}-{2 * low - 1:,}' for low in bins],
+            y=degrees[side]['counts'],
+            name=label,
+            marker=dict(color=color, line=dict(width=0)),
+            hovertemplate='<b style="font-family: IBM Plex Sans">%{x}</b><br>' +
+                          f'<span style="font-family: IBM Plex Sans">{label}: ' + '<b>%{y:,}</b></span>' +
+                          '<extra></extra>'
+        ))
+
+    fig.update_layout(
+        paper_bgcolor='#0a0a0a',
+        plot_bgcolor='#111',
+        font=dict(color='#999', family='IBM Plex Sans'),
+        barmode='group',
+        xaxis=dict(gridcolor='#222', title='Links (merchants or customers)', type='category'),
+        yaxis=dict(gridcolor='#222', title='Addresses', type='log'),
+        legend=dict(bgcolor='#111', bordercolor='#333', borderwidth=1),
+        height=400,
+        margin=dict(t=50, b=50),
+        hoverlabel=dict(
+            bgcolor='#111',
+            bordercolor='#333',
+            font=dict(family='IBM Plex Sans', size=14)
+        ),
+        bargap=0.1
+    )
+    return fig
+
+
+def dashboard_figures(snapshot, cube, multiplier=MULTIPLIER, graph=None):
+    """(chart, params, build) for every figure the dashboard can show
+
+    Parameters are those the dashboard keys each chart by; build() makes
+    the figure. Merchant rows are read only for the customer/transaction chart.
+    graph is the merchant-customer graph view (tracker.graph.graph_view), if any.
+    """
+    region_dist = region_distribution(cube)
+    country_df = apportion(region_dist, multiplier=multiplier)
+
+    yield 'heatmap', {}, lambda: heatmap_figure(country_df)
+    for weighting in HOURLY_WEIGHTS:
+        for time_basis in TIME_BASES:
+            yield ('hourly', {'weighting': weighting, 'time_basis': time_basis},
+                   lambda w=weighting, t=time_basis: hourly_figure(cube, w, t, region_dist.index))
+    for statistic in payment_statistics(cube).values():
+        yield 'payment_sizes', {'statistic': statistic}, lambda s=statistic: payment_figure(cube, s)
+    yield 'customers_transactions', {}, lambda: scatter_figure(snapshot.view(SCATTER_COLUMNS))
+    yield 'activity', {}, lambda: activity_figure(cube)
+    if graph is not None:
+        yield 'customer_graph', {}, lambda: degree_figure(graph['degrees'])
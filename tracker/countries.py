@@ -0,0 +1,146 @@
+"""
+Country Apportionment
+Splits each region's merchant count across its countries
+
+Merchants are only located to a region (see identify.estimate_region). The
+heatmap spreads each region's count over the region's countries in
+proportion to their crypto adoption rate, using the largest remainder
+method: every country gets the whole part of its quota, and the merchants
+left over go to the countries with the largest fractional parts. Country
+counts are whole numbers and always add up to the region count.
+
+COUNTRY_TABLE is built once from GLOBAL_CRYPTO_ADOPTION and
+REGION_COUNTRIES; apportion() is one join plus a few vectorized steps,
+whatever the number of countries.
+"""
+
+import numpy as np
+import pandas as pd
+
+GLOBAL_CRYPTO_ADOPTION = {
+    'India': {'rank': 1, 'adoption_rate': 11.0},
+    'Nigeria': {'rank': 2, 'adoption_rate': 22.0},
+    'Indonesia': {'rank': 3, 'adoption_rate': 9.0},
+    'United States': {'rank': 4, 'adoption_rate': 13.0},
+    'Vietnam': {'rank': 5, 'adoption_rate': 21.0},
+    'Ukraine': {'rank': 6, 'adoption_rate': 12.8},
+    'Philippines': {'rank': 7, 'adoption_rate': 13.4},
+    'Brazil': {'rank': 8, 'adoption_rate': 12.0},
+    'Thailand': {'rank': 9, 'adoption_rate': 9.6},
+    'Turkey': {'rank': 10, 'adoption_rate': 25.0},
+    'Argentina': {'rank': 11, 'adoption_rate': 15.8},
+    'Mexico': {'rank': 12, 'adoption_rate': 8.7},
+    'Bangladesh': {'rank': 13, 'adoption_rate': 7.3},
+    'Morocco': {'rank': 14, 'adoption_rate': 6.2},
+    'Egypt': {'rank': 15, 'adoption_rate': 7.8},
+    'Kenya': {'rank': 16, 'adoption_rate': 14.5},
+    'South Africa': {'rank': 17, 'adoption_rate': 11.0},
+    'Pakistan': {'rank': 18, 'adoption_rate': 6.6},
+    'Venezuela': {'rank': 19, 'adoption_rate': 10.3},
+    'Colombia': {'rank': 20, 'adoption_rate': 9.1},
+    'Peru': {'rank': 21, 'adoption_rate': 8.5},
+    'Chile': {'rank': 22, 'adoption_rate': 7.2},
+    'Poland': {'rank': 23, 'adoption_rate': 5.8},
+    'Malaysia': {'rank': 24, 'adoption_rate': 8.0},
+    'Canada': {'rank': 25, 'adoption_rate': 7.0},
+    'Singapore': {'rank': 26, 'adoption_rate': 9.5},
+    'Australia': {'rank': 27, 'adoption_rate': 9.0},
+    'United Kingdom': {'rank': 28, 'adoption_rate': 6.0},
+    'Japan': {'rank': 29, 'adoption_rate': 4.0},
+    'South Korea': {'rank': 30, 'adoption_rate': 8.0},
+    'UAE': {'rank': 31, 'adoption_rate': 11.5},
+    'Saudi Arabia': {'rank': 32, 'adoption_rate': 7.6},
+    'Russia': {'rank': 33, 'adoption_rate': 11.4},
+    'Spain': {'rank': 34, 'adoption_rate': 5.0},
+    'Germany': {'rank': 35, 'adoption_rate': 4.2},
+    'France': {'rank': 36, 'adoption_rate': 3.3},
+    'Italy': {'rank': 37, 'adoption_rate': 3.4},
+    'Netherlands': {'rank': 38, 'adoption_rate': 5.2},
+    'Portugal': {'rank': 39, 'adoption_rate': 6.1},
+    'Greece': {'rank': 40, 'adoption_rate': 4.5},
+}
+
+REGION_COUNTRIES = {
+    'Asia-Pacific': ['India', 'Indonesia', 'Vietnam', 'Philippines', 'Thailand',
+                     'Bangladesh', 'Pakistan', 'Malaysia', 'Singapore', 'Japan',
+                     'South Korea', 'Australia'],
+    'Europe-Africa': ['Nigeria', 'Ukraine', 'Turkey', 'Morocco', 'Egypt', 'Kenya',
+                      'South Africa', 'Russia', 'Poland', 'Spain', 'Germany',
+                      'France', 'Italy', 'UAE', 'Saudi Arabia'],
+    'Americas': ['United States', 'Brazil', 'Argentina', 'Mexico', 'Venezuela',
+                 'Colombia', 'Peru', 'Chile', 'Canada'],
+}
+
+# ISO 3166-1 alpha-3, used as choropleth locations
+COUNTRY_ISO3 = {
+    'India': 'IND', 'Nigeria': 'NGA', 'Indonesia': 'IDN', 'United States': 'USA',
+    'Vietnam': 'VNM', 'Ukraine': 'UKR', 'Philippines': 'PHL', 'Brazil': 'BRA',
+    'Thailand': 'THA', 'Turkey': 'TUR', 'Argentina': 'ARG', 'Mexico': 'MEX',
+    'Bangladesh': 'BGD', 'Morocco': 'MAR', 'Egypt': 'EGY', 'Kenya': 'KEN',
+    'South Africa': 'ZAF', 'Pakistan': 'PAK', 'Venezuela': 'VEN', 'Colombia': 'COL',
+    'Peru': 'PER', 'Chile': 'CHL', 'Poland': 'POL', 'Malaysia': 'MYS',
+    'Canada': 'CAN', 'Singapore': 'SGP', 'Australia': 'AUS', 'United Kingdom': 'GBR',
+    'Japan': 'JPN', 'South Korea': 'KOR', 'UAE': 'ARE', 'Saudi Arabia': 'SAU',
+    'Russia': 'RUS', 'Spain': 'ESP', 'Germany': 'DEU', 'France': 'FRA',
+    'Italy': 'ITA', 'Netherlands': 'NLD', 'Portugal': 'PRT', 'Greece': 'GRC',
+}
+
+
+def country_table(adoption=GLOBAL_CRYPTO_ADOPTION, region_countries=REGION_COUNTRIES, iso3=COUNTRY_ISO3):
+    """One row per country: ISO code, rank, adoption rate, region and share of its region
+
+    Countries outside every region keep a null region and a zero weight.
+    """
+    table = pd.DataFrame.from_dict(adoption, orient='index').rename(columns={'rank': 'global_rank'})
+    table = table.rename_axis('country').reset_index()
+    table.insert(1, 'iso_alpha3', table['country'].map(iso3))
+
+    regions = {country: region for region, countries in region_countries.items() for country in countries}
+    table['region'] = table['country'].map(regions)
+    region_rate = table.groupby('region')['adoption_rate'].transform('sum')
+    table['weight'] = (table['adoption_rate'] / region_rate).fillna(0.0)
+    return table
+
+
+COUNTRY_TABLE = country_table()
+
+
+def largest_remainder(totals, weights, groups, tiebreak):
+    """Whole-number split of each group's total by weight (largest remainder method)
+
+    totals is indexed by group; weights, groups and tiebreak are aligned
+    per-row arrays. Ties between equal remainders go to the lower tiebreak.
+    """
+    quotas = totals.reindex(groups).fillna(0).to_numpy() * weights
+    seats = np.floor(quotas).astype('int64')
+    remainder = quotas - seats
+
+    left = (totals - pd.Series(seats).groupby(np.asarray(groups)).sum()).reindex(groups).fillna(0).to_numpy()
+    order = np.lexsort((tiebreak, -remainder, pd.factorize(groups)[0]))
+    position = pd.Series(order).groupby(np.asarray(groups)[order]).cumcount().to_numpy()
+    extra = np.zeros(len(seats), dtype='int64')
+    extra[order] = (position < left[order]).astype('int64')
+    return seats + extra
+
+
+def apportion(region_counts, table=COUNTRY_TABLE, multiplier=1.0):
+    """Country table with merchant_count (and estimated_merchants, scaled) apportioned per region
+
+    Scaled estimates are apportioned from each region's scaled whole count,
+    so they also add up exactly to what the region cards show.
+    """
+    allocation = table.copy()
+    in_region = allocation['region'].notna().to_numpy()
+    regions = allocation['region'].where(in_region, '')
+    region_counts = region_counts.astype('int64')
+    scaled_counts = (region_counts * multiplier).astype('int64')
+
+    allocation['has_merchants'] = regions.isin(region_counts.index).to_numpy()
+    for column, totals in [('merchant_count', region_counts), ('estimated_merchants', scaled_counts)]:
+        allocation[column] = np.where(
+            in_region,
+            largest_remainder(totals, allocation['weight'].to_numpy(), regions.to_numpy(),
+                              allocation['global_rank'].to_numpy()),
+            0,
+        )
+    return allocation
@@ -0,0 +1,230 @@
+"""
+Merchant Aggregate Cube
+Precomputed counts and sums behind every dashboard chart and metric
+
+The cube holds one row per non-empty cell of
+
+    statistic x estimated_region x hour x payment_bin x activity_bin x merchant_size
+
+with the number of merchants and the summed volume, transactions and
+customers in that cell. statistic names how the cell was split: by a
+payment-size column (avg, median or p90 - binned into payment_bin, hour -1),
+or by hour of day (hour_utc, hour_local - payment_bin -1). Every merchant
+appears once per statistic, so totals over the other dimensions are read
+from a single statistic.
+
+In the hour statistics each merchant's transactions are spread over its
+24-bin histogram (hourly_transactions) and its volume in proportion to
+them, while the merchant and its customers count at its peak hour.
+hour_local rolls every histogram by the merchant's own inferred utc_offset,
+falling back to its region's representative offset where none was inferred.
+Rows without a histogram (tables converted from older exports) count
+entirely at peak_hour_utc.
+
+It is built once per dataset version from the shared table and stored as
+Parquet next to it, so charts aggregate a few thousand cells instead of
+scanning the merchant rows - their cost stays flat as merchants grow.
+
+Usage:
+    python -m tracker.cube                    # build the cube for the current dataset
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from tracker.dataset import HOURS_COLUMN, MERCHANT_DATASET, hour_matrix, hours_present
+from tracker.profiles import region_offsets
+from tracker.shared import MerchantSnapshot
+
+# Payment sizes binned in $5 steps up to $100 (bin 20 holds larger values, -1 missing ones)
+PAYMENT_BIN_EDGES = list(range(0, 105, 5))
+PAYMENT_BIN_LABELS = [f'${i}-${i+5}' for i in range(0, 100, 5)]
+PAYMENT_STATISTICS = ['avg_payment_size', 'median_payment_size', 'p90_payment_size']
+
+# Quartiles of transaction_count percentile rank
+ACTIVITY_BIN_EDGES = [0, 25, 50, 75, 100]
+ACTIVITY_BIN_LABELS = ['Low', 'Medium', 'High', 'Very High']
+
+# Time basis -> statistic holding the hour-of-day split
+HOUR_STATISTICS = {'UTC': 'hour_utc', 'Local': 'hour_local'}
+
+DIMENSIONS = ['statistic', 'estimated_region', 'hour', 'payment_bin', 'activity_bin', 'merchant_size']
+MEASURES = ['merchants', 'total_received_usdt', 'transaction_count', 'unique_customers']
+CUBE_COLUMNS = ['estimated_region', 'peak_hour_utc', 'merchant_size', 'total_received_usdt',
+                'transaction_count', 'unique_customers', 'utc_offset', HOURS_COLUMN] + PAYMENT_STATISTICS
+
+
+def payment_bins(values):
+    """Bin index per payment size: 0-19 in range, 20 above it, -1 missing"""
+    values = np.asarray(values, dtype='float64')
+    bins = np.searchsorted(PAYMENT_BIN_EDGES, values, side='left') - 1
+    # Bins are right-inclusive, with $0 itself falling in the first one
+    bins = np.where(values == 0, 0, bins)
+    bins = np.where(values > PAYMENT_BIN_EDGES[-1], len(PAYMENT_BIN_LABELS), bins)
+    return np.where(np.isnan(values) | (values < 0), -1, bins).astype('int8')
+
+
+def activity_bins(transaction_count, percentile=None):
+    """Activity quartile (0-3) per merchant, from its transaction_count percentile
+    (ranked among these merchants unless given)"""
+    if percentile is None:
+        percentile = pd.Series(transaction_count).rank(pct=True).to_numpy() * 100
+    percentile = np.asarray(percentile, dtype='float64')
+    return (np.searchsorted(ACTIVITY_BIN_EDGES, percentile, side='left') - 1).clip(0).astype('int8')
+
+
+def local_hour_shifts(merchants):
+    """Whole hours to add to each merchant's UTC hours for its local time"""
+    fallback = region_offsets(merchants['estimated_region'].astype(object)) // 60
+    if 'utc_offset' not in merchants.columns:
+        return fallback
+    offsets = pd.to_numeric(merchants['utc_offset'], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    return np.where(np.isnan(offsets), fallback, offsets).astype('int64')
+
+
+def hour_cells(base, merchants):
+    """Cells of both hour statistics, with each merchant spread over its hour histogram
+
+    Histograms are first summed per (region, activity, size, local shift)
+    group, then each group's 24 hours are rolled into UTC and local cells.
+    """
+    groups = ['estimated_region', 'activity_bin', 'merchant_size']
+    # Rows with a missing dimension are left out, as groupby leaves them out of the other statistics
+    keep = base[groups].notna().all(axis=1).to_numpy()
+    if not keep.all():
+        base, merchants = base[keep], merchants[keep]
+
+    # Combined code per distinct (region, activity, size), from each column's codes
+    codes = np.zeros(len(base), dtype='int64')
+    levels = []
+    for col in groups:
+        column_codes, uniques = pd.factorize(base[col])
+        codes = codes * len(uniques) + column_codes
+        levels.append(uniques)
+    combined, codes = np.unique(codes, return_inverse=True)
+    positions = np.unravel_index(combined, [len(level) for level in levels])
+    keys = pd.DataFrame({col: level[position] for col, level, position in zip(groups, levels, positions)})
+
+    shifts = local_hour_shifts(merchants) % 24
+    shifted, members = np.unique(codes * 24 + shifts, return_inverse=True)
+    group_codes, group_shifts = shifted // 24, shifted % 24
+
+    # Rows without a histogram put everything on their peak hour
+    peak = merchants['peak_hour_utc'].to_numpy(dtype='int64')
+    counts = base['transaction_count'].to_numpy()
+    if HOURS_COLUMN in merchants.columns:
+        column = merchants[HOURS_COLUMN]
+        hours = hour_matrix(column)
+        missing = ~hours_present(column)
+    else:
+        hours = np.zeros((len(merchants), 24), dtype='uint32')
+        missing = np.ones(len(merchants), dtype=bool)
+    totals = np.where(missing, counts, hours.sum(axis=1, dtype='int64'))
+    volume_share = base['total_received_usdt'].to_numpy() / np.where(totals > 0, totals, 1)
+
+    # Group x UTC hour sums, one bincount per hour
+    n_groups = len(shifted)
+    transactions = np.zeros((n_groups, 24))
+    volume = np.zeros((n_groups, 24))
+    by_hour = np.ascontiguousarray(hours.T)
+    for hour in range(24):
+        weights = by_hour[hour].astype('float64')
+        if missing.any():
+            weights[missing] = np.where(peak[missing] == hour, counts[missing], 0)
+        transactions[:, hour] = np.bincount(members, weights, minlength=n_groups)
+        volume[:, hour] = np.bincount(members, weights * volume_share, minlength=n_groups)
+    at_peak = members * 24 + peak
+    peak_merchants = np.bincount(at_peak, minlength=n_groups * 24).reshape(n_groups, 24)
+    peak_customers = np.bincount(at_peak, base['unique_customers'].to_numpy(),
+                                 minlength=n_groups * 24).reshape(n_groups, 24)
+
+    size = len(keys) * 24
+    cells = {}
+    for statistic, group_shift in [(HOUR_STATISTICS['UTC'], np.zeros(n_groups, dtype='int64')),
+                                   (HOUR_STATISTICS['Local'], group_shifts)]:
+        cell = (group_codes[:, None] * 24 + (np.arange(24)[None, :] + group_shift[:, None]) % 24).ravel()
+        measures = pd.DataFrame({
+            'merchants': np.bincount(cell, peak_merchants.ravel(), minlength=size).round().astype('int64'),
+            'total_received_usdt': np.bincount(cell, volume.ravel(), minlength=size),
+            'transaction_count': np.bincount(cell, transactions.ravel(), minlength=size).round().astype('int64'),
+            'unique_customers': np.bincount(cell, peak_customers.ravel(), minlength=size).round().astype('int64'),
+        })
+        measures[groups] = keys.loc[np.repeat(np.arange(len(keys)), 24)].to_numpy()
+        measures['hour'] = np.tile(np.arange(24), len(keys))
+        for col in groups:
+            measures[col] = measures[col].astype(base[col].dtype)
+        cells[statistic] = measures[(measures[MEASURES] != 0).any(axis=1)]
+    return cells
+
+
+def build_cube(merchants):
+    """Cube rows (dimensions + measures) for a merchant table
+
+    A merchant subset carrying activity_percentile keeps the activity
+    quartiles of the whole table instead of being ranked among itself.
+    """
+    base = pd.DataFrame({
+        'estimated_region': merchants['estimated_region'],
+        'activity_bin': activity_bins(merchants['transaction_count'], merchants.get('activity_percentile')),
+        'merchant_size': merchants['merchant_size'],
+        'merchants': np.ones(len(merchants), dtype='int64'),
+        'total_received_usdt': merchants['total_received_usdt'].astype('float64'),
+        'transaction_count': merchants['transaction_count'].astype('int64'),
+        'unique_customers': merchants['unique_customers'].astype('int64'),
+    })
+
+    parts = []
+    for statistic in PAYMENT_STATISTICS:
+        values = merchants[statistic] if statistic in merchants.columns else np.full(len(merchants), np.nan)
+        part = base.assign(statistic=statistic, hour=-1, payment_bin=payment_bins(values))
+        parts.append(part.groupby(DIMENSIONS[1:] + ['statistic'], observed=True)[MEASURES].sum().reset_index())
+    for statistic, cells in hour_cells(base, merchants).items():
+        parts.append(cells.assign(statistic=statistic, payment_bin=-1))
+    cube = pd.concat(parts, ignore_index=True)
+    cube['hour'] = cube['hour'].astype('int8')
+    cube['payment_bin'] = cube['payment_bin'].astype('int8')
+    return cube[DIMENSIONS + MEASURES]
+
+
+def cube_path(snapshot):
+    """Location of the cube for a snapshot's version (next to its shared table)"""
+    return os.path.splitext(snapshot.path)[0] + '.cube.parquet'
+
+
+def load_cube(snapshot):
+    """Cube for a snapshot, built and persisted on first use"""
+    path = cube_path(snapshot)
+    # Cubes written before a layout change are rebuilt
+    if not os.path.exists(path) or pq.read_schema(path).names[:len(DIMENSIONS)] != DIMENSIONS:
+        cube = build_cube(snapshot.view(CUBE_COLUMNS))
+        partial = f'{path}.{os.getpid()}.tmp'
+        pq.write_table(pa.Table.from_pandas(cube, preserve_index=False), partial, compression='zstd')
+        os.replace(partial, path)
+    return pq.read_table(path).to_pandas()
+
+
+def rollup(cube, by, statistic=PAYMENT_STATISTICS[0], measures=MEASURES):
+    """Measures summed over every dimension not in `by`, for one statistic"""
+    cells = cube[cube['statistic'] == statistic]
+    if not by:
+        return cells[measures].sum()
+    return cells.groupby(by, observed=True)[measures].sum()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the aggregate cube for the merchant dataset")
+    parser.add_argument('source', nargs='?', default=MERCHANT_DATASET)
+    args = parser.parse_args(argv)
+
+    snapshot = MerchantSnapshot.open(args.source)
+    cube = load_cube(snapshot)
+    print(f"{len(cube):,} cells for {rollup(cube, [])['merchants']:,} merchants in {cube_path(snapshot)}")
+
+
+if __name__ == '__main__':
+    main()
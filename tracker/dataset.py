@@ -0,0 +1,393 @@
+"""
+Merchant Dataset
+Columnar (Parquet) storage for the identified merchant table
+
+The pipeline writes output/identified_merchants.parquet with a fixed schema,
+so readers get typed columns (real UTC timestamps, no dtype inference) and
+can load only the columns they need. CSV stays available as an export.
+
+compact() converts a loaded table to small in-memory types (categorical
+regions and sizes, downcast counts, float32 where the stored precision
+survives, fixed-width binary addresses) for dashboards holding millions of
+merchant rows.
+
+Next to the address string the dataset stores its decoded 21-byte
+Base58Check payload (address_payload, null when the address does not
+validate). read_compact() keeps only the payload for the address column
+when every address validated, so hashing, joins and dedup work on small
+fixed-width values; address_strings() re-encodes for display and export.
+
+hourly_transactions holds each merchant's 24-bin UTC hour histogram as a
+fixed-size uint32 list, null for rows converted from tables that had none;
+hour_matrix() views it as an (N, 24) matrix. The CSV export spells it out
+as h00..h23 columns (blank where null).
+
+Usage:
+    python -m tracker.dataset convert output/identified_merchants.csv
+    python -m tracker.dataset memory        # per-column memory report
+"""
+
+import argparse
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from tracker.addresses import PAYLOAD_BYTES, decode_addresses, encode_addresses, pack_payloads, unpack_payloads
+
+MERCHANT_DATASET = 'output/identified_merchants.parquet'
+MERCHANT_CSV = 'output/identified_merchants.csv'
+
+MERCHANT_SCHEMA = pa.schema([
+    ('address', pa.string()),
+    ('transaction_count', pa.int64()),
+    ('unique_customers', pa.int64()),
+    ('total_received_usdt', pa.float64()),
+    ('avg_payment_size', pa.float64()),
+    ('median_payment_size', pa.float64()),
+    ('p90_payment_size', pa.float64()),
+    ('max_customer_share', pa.float64()),
+    ('transaction_span_days', pa.int64()),
+    ('days_active', pa.int64()),
+    ('hours_active', pa.int64()),
+    ('peak_hour_utc', pa.int64()),
+    ('estimated_region', pa.string()),
+    ('customer_return_rate', pa.float64()),
+    ('returning_customers', pa.int64()),
+    ('first_seen', pa.timestamp('ms', tz='UTC')),
+    ('last_seen', pa.timestamp('ms', tz='UTC')),
+    ('merchant_size', pa.string()),
+    ('utc_offset', pa.int8()),
+    ('region_confidence', pa.float64()),
+    ('graph_flag', pa.string()),
+    ('hourly_transactions', pa.list_(pa.uint32(), 24)),
+])
+
+# Storage-only column: decoded address payload, never part of the merchant rows
+PAYLOAD_COLUMN = 'address_payload'
+STORED_SCHEMA = MERCHANT_SCHEMA.append(pa.field(PAYLOAD_COLUMN, pa.binary(PAYLOAD_BYTES)))
+
+TIMESTAMP_COLUMNS = ['first_seen', 'last_seen']
+
+# hourly_transactions, one column per UTC hour in CSV exports
+HOURS_COLUMN = 'hourly_transactions'
+HOUR_COLUMNS = [f'h{hour:02d}' for hour in range(24)]
+
+# TRON Base58Check addresses are always 34 characters
+ADDRESS_WIDTH = 34
+
+CATEGORY_COLUMNS = ['estimated_region', 'merchant_size', 'graph_flag']
+COUNT_COLUMNS = ['transaction_count', 'unique_customers', 'transaction_span_days',
+                 'days_active', 'hours_active', 'returning_customers']
+
+# Decimal places the pipeline rounds each float to; float32 is used when it keeps them
+FLOAT_DECIMALS = {
+    'total_received_usdt': 2,
+    'avg_payment_size': 2,
+    'median_payment_size': 2,
+    'p90_payment_size': 2,
+    'max_customer_share': 3,
+    'customer_return_rate': 3,
+    'region_confidence': 3,
+}
+
+
+def pack_hours(matrix, index=None, name=HOURS_COLUMN, valid=None):
+    """(N, 24) hour histogram matrix as a fixed-size uint32 list column (null where not valid)"""
+    matrix = np.ascontiguousarray(matrix, dtype='uint32')
+    mask = pa.array(~np.asarray(valid, dtype=bool)) if valid is not None else None
+    array = pa.FixedSizeListArray.from_arrays(pa.array(matrix.ravel()), 24, mask=mask)
+    return pd.Series(pd.arrays.ArrowExtensionArray(array), index=index, name=name)
+
+
+def hour_matrix(column):
+    """(N, 24) uint32 matrix from an hourly_transactions column (zeros where null)"""
+    if isinstance(column.dtype, pd.ArrowDtype):
+        array = column.array._pa_array.cast(pa.list_(pa.uint32(), 24))
+    else:
+        array = pa.array(column, pa.list_(pa.uint32(), 24))
+    if isinstance(array, pa.ChunkedArray):
+        array = array.combine_chunks()
+    values = array.values.slice(array.offset * 24, len(array) * 24)
+    matrix = values.to_numpy(zero_copy_only=False).reshape(len(array), 24)
+    if array.null_count:
+        matrix = np.where(array.is_valid().to_numpy(zero_copy_only=False)[:, None], matrix, 0).astype('uint32')
+    return matrix
+
+
+def hours_present(column):
+    """Boolean array: True where a row has an hour histogram"""
+    return ~np.asarray(column.isna(), dtype=bool)
+
+
+def arrow_types(arrow_type):
+    """types_mapper keeping fixed-width binary and list columns Arrow-backed"""
+    if pa.types.is_fixed_size_binary(arrow_type) or pa.types.is_fixed_size_list(arrow_type):
+        return pd.ArrowDtype(arrow_type)
+    return None
+
+
+def conform(merchants):
+    """Merchant rows with every schema column, in schema order and types"""
+    merchants = merchants.copy()
+    if HOURS_COLUMN not in merchants.columns:
+        # Spelled-out CSV hours (blank rows had none), or null for tables without histograms
+        if set(HOUR_COLUMNS) <= set(merchants.columns):
+            hours = merchants[HOUR_COLUMNS]
+            valid = hours.notna().all(axis=1).to_numpy()
+            hours = hours.fillna(0).to_numpy()
+        else:
+            hours = np.zeros((len(merchants), 24), dtype='uint32')
+            valid = np.zeros(len(merchants), dtype=bool)
+        merchants[HOURS_COLUMN] = pack_hours(hours, index=merchants.index, valid=valid)
+    for field in MERCHANT_SCHEMA:
+        if field.name not in merchants.columns:
+            merchants[field.name] = None
+    for col in TIMESTAMP_COLUMNS:
+        merchants[col] = pd.to_datetime(merchants[col], utc=True)
+    return merchants[MERCHANT_SCHEMA.names]
+
+
+def address_payloads(addresses):
+    """Decoded payload per address as an Arrow column, null where invalid"""
+    payloads, valid = decode_addresses(addresses)
+    return pa.FixedSizeBinaryArray.from_buffers(
+        pa.binary(PAYLOAD_BYTES), len(payloads),
+        [pa.array(valid).buffers()[1] if not valid.all() else None, pa.py_buffer(payloads.tobytes())])
+
+
+def to_table(merchants):
+    """Arrow table with the fixed merchant schema plus the address payload"""
+    table = pa.Table.from_pandas(conform(merchants), schema=MERCHANT_SCHEMA, preserve_index=False)
+    # pandas metadata is dropped: it cannot describe fixed-size list dtypes
+    table = table.replace_schema_metadata(None)
+    addresses = table.column('address').to_pandas()
+    return table.append_column(STORED_SCHEMA.field(PAYLOAD_COLUMN), address_payloads(addresses))
+
+
+def _partial_path(path):
+    # Written next to the target, then renamed over it: readers never see a partial file
+    out_dir = os.path.dirname(path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    return f'{path}.{os.getpid()}.tmp'
+
+
+def parquet_hours(column):
+    """hourly_transactions as stored in Parquet files: a variable-size list
+
+    pyarrow writes a null fixed-size list as an empty list and then cannot
+    read it back; read_dataset() casts the column back to the schema type.
+    """
+    return column.cast(pa.list_(pa.uint32()))
+
+
+def write_dataset(merchants, path=MERCHANT_DATASET):
+    """Write merchant rows as Parquet"""
+    partial = _partial_path(path)
+    table = to_table(merchants)
+    hours = table.schema.get_field_index(HOURS_COLUMN)
+    table = table.set_column(hours, HOURS_COLUMN, parquet_hours(table.column(hours)))
+    pq.write_table(table, partial, compression='zstd')
+    os.replace(partial, path)
+
+
+def write_csv(merchants, path=MERCHANT_CSV):
+    """Write merchant rows in the identified_merchants.csv export layout"""
+    partial = _partial_path(path)
+    merchants = conform(merchants)
+    column = merchants.pop(HOURS_COLUMN)
+    hours = pd.DataFrame(hour_matrix(column), index=merchants.index, columns=HOUR_COLUMNS).astype('UInt32')
+    hours[~hours_present(column)] = pd.NA
+    pd.concat([merchants, hours], axis=1).to_csv(partial, index=False)
+    os.replace(partial, path)
+
+
+def dataset_version(path=MERCHANT_DATASET):
+    """Content hash identifying one snapshot of a dataset file"""
+    digest = hashlib.blake2b(digest_size=8)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def dataset_columns(path=MERCHANT_DATASET):
+    """Column names stored in a dataset, read from the file footer only"""
+    return pq.read_schema(path).names
+
+
+def read_dataset(path=MERCHANT_DATASET, columns=None):
+    """Read merchant rows, loading only `columns` when given"""
+    if columns is None:
+        columns = [col for col in dataset_columns(path) if col != PAYLOAD_COLUMN]
+    table = pq.read_table(path, columns=columns)
+    # Parquet renames list items ('element'); cast back to the schema's exact types
+    table = table.cast(pa.schema([STORED_SCHEMA.field(name) if name in STORED_SCHEMA.names else field
+                                  for name, field in zip(table.column_names, table.schema)]))
+    return table.to_pandas(types_mapper=arrow_types)
+
+
+def read_csv(path=MERCHANT_CSV, columns=None):
+    """Read a CSV export into the same column types as the dataset"""
+    available = set(pd.read_csv(path, nrows=0).columns)
+    if set(HOUR_COLUMNS) <= available:
+        available.add(HOURS_COLUMN)
+    selected = [col for col in (columns or MERCHANT_SCHEMA.names) if col in available]
+    usecols = [col for col in selected if col != HOURS_COLUMN]
+    if HOURS_COLUMN in selected:
+        usecols += HOUR_COLUMNS
+    merchants = pd.read_csv(path, usecols=usecols)
+    return to_table(merchants).select(selected).to_pandas(types_mapper=arrow_types)
+
+
+def read_merchants(path, columns=None):
+    """Read merchant rows from a Parquet dataset or CSV export"""
+    if path.endswith('.csv'):
+        return read_csv(path, columns)
+    return read_dataset(path, columns)
+
+
+def write_merchants(merchants, path):
+    """Write merchant rows as Parquet or CSV, by file extension"""
+    if path.endswith('.csv'):
+        write_csv(merchants, path)
+    else:
+        write_dataset(merchants, path)
+
+
+def pack_addresses(addresses):
+    """Address strings as a fixed-width binary column (one 34-byte value per row)"""
+    binary = pc.cast(pa.array(addresses, pa.string()), pa.binary())
+    packed = pc.cast(binary, pa.binary(ADDRESS_WIDTH))
+    return pd.Series(pd.arrays.ArrowExtensionArray(packed), index=addresses.index, name=addresses.name)
+
+
+def is_payload_column(addresses):
+    """True for an address column holding decoded 21-byte payloads"""
+    return (isinstance(addresses.dtype, pd.ArrowDtype)
+            and addresses.dtype.pyarrow_dtype == pa.binary(PAYLOAD_BYTES))
+
+
+def address_strings(addresses):
+    """Address column back as strings (for display and export)"""
+    if is_payload_column(addresses):
+        strings = encode_addresses(unpack_payloads(addresses))
+        return pd.Series(strings, index=addresses.index, name=addresses.name, dtype=str)
+    if isinstance(addresses.dtype, pd.ArrowDtype) and pa.types.is_fixed_size_binary(addresses.dtype.pyarrow_dtype):
+        strings = pc.cast(pc.cast(addresses.array._pa_array, pa.binary()), pa.string())
+        return pd.Series(strings.to_pylist(), index=addresses.index, name=addresses.name, dtype=str)
+    return addresses
+
+
+def compact(merchants):
+    """Merchant rows converted to compact in-memory types"""
+    merchants = merchants.copy()
+
+    if 'address' in merchants.columns and len(merchants) and not is_payload_column(merchants['address']):
+        payloads, valid = decode_addresses(merchants['address'])
+        if valid.all():
+            merchants['address'] = pack_payloads(payloads, index=merchants.index)
+        else:
+            # Legacy (e.g. lowercased) addresses keep their text, packed to 34 bytes
+            lengths = merchants['address'].str.len()
+            if (lengths == ADDRESS_WIDTH).all() and merchants['address'].str.isascii().all():
+                merchants['address'] = pack_addresses(merchants['address'])
+
+    for col in CATEGORY_COLUMNS:
+        if col in merchants.columns:
+            merchants[col] = merchants[col].astype('category')
+
+    for col in COUNT_COLUMNS:
+        if col in merchants.columns:
+            merchants[col] = pd.to_numeric(merchants[col], downcast='unsigned')
+    if 'peak_hour_utc' in merchants.columns:
+        merchants['peak_hour_utc'] = merchants['peak_hour_utc'].astype('uint8')
+
+    for col, decimals in FLOAT_DECIMALS.items():
+        if col in merchants.columns:
+            values = merchants[col].to_numpy(dtype='float64')
+            narrow = values.astype('float32')
+            if np.array_equal(narrow.astype('float64').round(decimals), values, equal_nan=True):
+                merchants[col] = narrow
+
+    return merchants
+
+
+def read_compact(path, columns=None):
+    """Read merchant rows straight into compact types
+
+    The address column is built from the stored payloads when they are all
+    present, so the address strings are never loaded.
+    """
+    columns = list(columns) if columns is not None else None
+    if path.endswith('.csv') or (columns is not None and 'address' not in columns) \
+            or PAYLOAD_COLUMN not in dataset_columns(path):
+        return compact(read_merchants(path, columns))
+
+    payloads = pq.read_table(path, columns=[PAYLOAD_COLUMN]).column(PAYLOAD_COLUMN)
+    if payloads.null_count:
+        return compact(read_merchants(path, columns))
+
+    columns = columns or [col for col in dataset_columns(path) if col != PAYLOAD_COLUMN]
+    others = [col for col in columns if col != 'address']
+    merchants = compact(read_dataset(path, others)) if others else pd.DataFrame(index=pd.RangeIndex(len(payloads)))
+    merchants['address'] = pd.arrays.ArrowExtensionArray(payloads.combine_chunks())
+    return merchants[columns]
+
+
+def memory_report(merchants, baseline=None):
+    """Per-column dtype and memory, optionally next to a baseline table"""
+    report = pd.DataFrame({
+        'dtype': merchants.dtypes.astype(str),
+        'bytes': merchants.memory_usage(index=False, deep=True),
+    })
+    report['bytes_per_row'] = report['bytes'] / max(len(merchants), 1)
+    if baseline is not None:
+        report.insert(0, 'baseline_dtype', baseline.dtypes.astype(str))
+        report['baseline_bytes'] = baseline.memory_usage(index=False, deep=True)
+        report['saving'] = 1 - report['bytes'] / report['baseline_bytes']
+
+    total = report[[col for col in report.columns if 'bytes' in col]].sum()
+    report.loc['total', total.index] = total
+    if baseline is not None:
+        report.loc['total', 'saving'] = 1 - total['bytes'] / total['baseline_bytes']
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merchant dataset tools")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    convert = subparsers.add_parser('convert', help="Convert a merchant CSV into the Parquet dataset")
+    convert.add_argument('csv', nargs='?', default=MERCHANT_CSV)
+    convert.add_argument('-o', '--output', default=MERCHANT_DATASET)
+
+    export = subparsers.add_parser('export-csv', help="Export the Parquet dataset as CSV")
+    export.add_argument('dataset', nargs='?', default=MERCHANT_DATASET)
+    export.add_argument('-o', '--output', default=MERCHANT_CSV)
+
+    memory = subparsers.add_parser('memory', help="Per-column memory of the loaded vs compact table")
+    memory.add_argument('dataset', nargs='?', default=MERCHANT_DATASET)
+
+    args = parser.parse_args(argv)
+    if args.command == 'memory':
+        merchants = read_merchants(args.dataset)
+        with pd.option_context('display.width', 200, 'display.max_columns', 10):
+            print(memory_report(compact(merchants), baseline=merchants))
+        return
+    if args.command == 'convert':
+        merchants = read_csv(args.csv)
+        write_dataset(merchants, args.output)
+    else:
+        merchants = read_dataset(args.dataset)
+        write_csv(merchants, args.output)
+    print(f"Wrote {len(merchants):,} merchants to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Density Grids
+Log-log binning of merchant scatter data for server-side rendering
+
+Drawing one marker per merchant stops scaling long before the merchant
+table does, and sampling loses the tail and changes on every rerun. For
+large tables the dashboard instead bins every merchant on a fixed log-log
+grid with np.histogram2d and sends the grid: the payload is bounded by the
+number of cells, not merchants, and the same data always gives the same
+picture. Small tables are still drawn point by point (WebGL).
+"""
+
+import numpy as np
+
+# Up to this many merchants are drawn as individual points
+SCATTER_POINT_LIMIT = 5_000
+# Cells per axis of the density grid
+DENSITY_BINS = 60
+
+
+def log_edges(values, bins=DENSITY_BINS):
+    """bins + 1 evenly spaced log10 edges covering the positive values (whole decades)"""
+    positive = values[values > 0]
+    if not len(positive):
+        return np.linspace(0, 1, bins + 1)
+    low = np.floor(np.log10(positive.min()))
+    high = max(np.ceil(np.log10(positive.max())), low + 1)
+    return np.linspace(low, high, bins + 1)
+
+
+def density_grid(x, y, weights=None, bins=DENSITY_BINS):
+    """Merchant counts (and summed weights) on a log-log grid
+
+    Returns (counts, sums, x_edges, y_edges): (bins, bins) arrays indexed
+    [y, x] as heatmaps expect, and the log10 cell edges of each axis.
+    Points with a non-positive coordinate have no place on a log axis and
+    are left out. sums is None without weights.
+    """
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    keep = (x > 0) & (y > 0)
+    x_edges, y_edges = log_edges(x, bins), log_edges(y, bins)
+    lx, ly = np.log10(x[keep]), np.log10(y[keep])
+
+    counts, _, _ = np.histogram2d(ly, lx, bins=[y_edges, x_edges])
+    sums = None
+    if weights is not None:
+        weights = np.asarray(weights, dtype='float64')[keep]
+        sums, _, _ = np.histogram2d(ly, lx, bins=[y_edges, x_edges], weights=weights)
+    return counts.astype('int64'), sums, x_edges, y_edges
+
+
+def decade_ticks(edges):
+    """Tick positions and labels (1, 10, 100, ...) for a log10 axis"""
+    powers = np.arange(np.ceil(edges[0]), np.floor(edges[-1]) + 1)
+    return powers, [f'{10 ** power:,.0f}' for power in powers]
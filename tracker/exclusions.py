@@ -0,0 +1,294 @@
+"""
+Address Exclusion Lists
+Denylists of exchanges, bridges, P2P desks and other known non-merchant addresses
+
+Exchange hot wallets and deposit addresses, bridges and OTC desks receive
+many small payments from many senders and pass the volume criteria, but
+they are not merchants, and their withdrawals are not customer payments.
+An ExclusionList drops every transfer whose sender or receiver is listed,
+before any aggregation - in both passes of tracker.identify, in the map
+phase of tracker.parallel, when tracker.state folds a batch in and as
+tracker.ingest normalizes each page.
+
+Lists are plain text files, one address per line ('#' starts a comment),
+or CSV files with an `address` column; a directory stands for every .txt
+and .csv file in it. Every list is hashed into a Bloom filter
+(tracker.sketches), which rejects almost every unlisted address after one
+or two bit probes. Lists of up to exact_max_addresses addresses also keep
+the exact set, and the filter's hits are confirmed against it. Larger lists
+rely on the filter alone, sized for the false-positive budget: an unlisted
+address is wrongly excluded with probability at most false_positive_rate,
+and a listed one is never missed. Addresses are matched exactly as they
+appear (Base58 is case sensitive).
+
+Addresses are hashed straight from their bytes in the Arrow string buffers
+(address_hashes), several times faster than hashing the strings one by
+one, so testing both sides of every transfer costs less than parsing the
+transfer log.
+
+The run report counts excluded transfers, split by which side was listed
+(a transfer between two listed addresses counts on both sides).
+
+Usage:
+    python -m tracker.identify transfers.csv --exclude lists/exchanges.txt --exclude lists/bridges.csv
+    python -m tracker.exclusions lists/                  # list sizes, filter type and memory
+    python -m tracker.exclusions lists/ --check transfers.csv
+"""
+
+import argparse
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from tracker.sketches import BloomFilter
+
+EXCLUSION_SETTINGS = {
+    'false_positive_rate': 0.001,      # unlisted addresses wrongly excluded, at most (filter-only lists)
+    'exact_max_addresses': 1_000_000,  # larger lists are kept as a Bloom filter only
+    'prefilter_error_rate': 0.01,      # Bloom filter in front of an exact set
+}
+
+# Listed addresses read (and added to the filter) at once
+LIST_CHUNK_SIZE = 1_000_000
+
+LIST_EXTENSIONS = ('.txt', '.csv')
+
+# 64-bit mixing constants (splitmix64)
+_MIX = (np.uint64(0x9E3779B97F4A7C15), np.uint64(0xBF58476D1CE4E5B9), np.uint64(0x94D049BB133111EB))
+
+
+def _mix(h):
+    h = (h ^ (h >> np.uint64(30))) * _MIX[1]
+    h = (h ^ (h >> np.uint64(27))) * _MIX[2]
+    return h ^ (h >> np.uint64(31))
+
+
+def address_words(addresses):
+    """Each address's UTF-8 bytes as uint64 words (zero-padded), one array per word, and each byte length
+
+    Read straight from the Arrow string buffers, without a Python object per
+    address. Mixed lengths gather word i of every row as the 8-byte window at
+    the row's offset + 8i, with the bytes past the row's end masked off.
+    """
+    values = pa.array(addresses) if not isinstance(addresses, (pa.Array, pa.ChunkedArray)) else addresses
+    if isinstance(values, pa.ChunkedArray):
+        values = values.combine_chunks()
+    values = pc.fill_null(values, '').cast(pa.large_binary())
+    _, offsets, data = values.buffers()
+    offsets = np.frombuffer(offsets, dtype='int64')[values.offset:values.offset + len(values) + 1]
+    data = np.frombuffer(data, dtype='uint8') if data is not None else np.zeros(0, dtype='uint8')
+    lengths = np.diff(offsets)
+
+    content = data[offsets[0]:offsets[-1]]
+    width = max(8, -(-int(lengths.max()) // 8) * 8)
+    if (lengths == lengths[0]).all():
+        # Fixed-width addresses (the usual case): the bytes already form a matrix
+        matrix = np.zeros((len(lengths), width), dtype='uint8')
+        matrix[:, :lengths[0]] = content.reshape(len(lengths), lengths[0])
+        words = matrix.view('uint64')
+        return [words[:, i] for i in range(words.shape[1])], lengths
+
+    padded = np.concatenate([content, np.zeros(8, dtype='uint8')])
+    windows = np.lib.stride_tricks.as_strided(padded, shape=(len(padded) - 7, 8), strides=(1, 1), writeable=False)
+    starts = offsets[:-1] - offsets[0]
+    words = []
+    for i in range(width // 8):
+        word = windows[np.minimum(starts + 8 * i, len(padded) - 8)].view('uint64').ravel()
+        remaining = np.clip(lengths - 8 * i, 0, 8).astype('uint64')
+        # Little-endian: a row's remaining bytes are the word's low bits
+        keep = np.where(remaining == 8, ~np.uint64(0), (np.uint64(1) << (remaining * np.uint64(8))) - np.uint64(1))
+        words.append(word & keep)
+    return words, lengths
+
+
+def address_hashes(addresses):
+    """Stable 64-bit hash of each address, computed from its bytes 8 at a time
+
+    A row's hash depends only on its own bytes (padding words are skipped),
+    so a denylist and a transfer chunk hash alike.
+    """
+    if not len(addresses):
+        return np.zeros(0, dtype='uint64')
+    words, lengths = address_words(addresses)
+    # Words inside the shortest address hold text in every row; later ones may be padding
+    full = int(lengths.min()) // 8
+    hashes = np.full(len(lengths), _MIX[0])
+    with np.errstate(over='ignore'):
+        for i, word in enumerate(words):
+            mixed = (hashes ^ word) * _MIX[1]
+            mixed ^= mixed >> np.uint64(29)
+            hashes = mixed if i < full else np.where(lengths > i * 8, mixed, hashes)
+        return _mix(hashes ^ lengths.astype('uint64'))
+
+
+def list_files(paths):
+    """Denylist files named by `paths` (files, or directories of .txt/.csv files), sorted"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                         if name.endswith(LIST_EXTENSIONS))
+        elif os.path.exists(path):
+            files.append(path)
+        else:
+            raise FileNotFoundError(f"Exclusion list {path} does not exist")
+    return files
+
+
+def read_list(path, chunksize=LIST_CHUNK_SIZE):
+    """Chunks (string Series) of the addresses in one denylist"""
+    if path.endswith('.csv'):
+        reader = pd.read_csv(path, usecols=['address'], dtype={'address': str}, chunksize=chunksize)
+    else:
+        reader = pd.read_csv(path, header=None, names=['address'], dtype={'address': str}, comment='#',
+                             skip_blank_lines=True, chunksize=chunksize)
+    for chunk in reader:
+        addresses = chunk['address'].dropna().str.strip()
+        yield addresses[addresses != '']
+
+
+def count_lines(path):
+    """Upper bound on the addresses in a denylist, without parsing it"""
+    lines = 0
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            lines += block.count(b'\n')
+    return lines + 1
+
+
+class ExclusionList:
+    """Listed addresses: a Bloom filter, plus the exact set for lists small enough to keep"""
+
+    def __init__(self, bloom, addresses=None, size=0, sources=(), settings=None):
+        self.bloom = bloom            # BloomFilter of address_hashes
+        self.addresses = addresses    # pd.Index confirming the filter's hits, or None
+        self.size = size              # addresses added
+        self.sources = list(sources)
+        self.settings = dict(EXCLUSION_SETTINGS, **(settings or {}))
+
+    @property
+    def mode(self):
+        return 'bloom' if self.addresses is None else 'exact'
+
+    @classmethod
+    def load(cls, paths, settings=None):
+        """Exclusion list of every address in the denylists at `paths`"""
+        settings = dict(EXCLUSION_SETTINGS, **(settings or {}))
+        files = list_files(paths)
+        capacity = sum(count_lines(path) for path in files)
+
+        if capacity <= settings['exact_max_addresses']:
+            chunks = [chunk for path in files for chunk in read_list(path)]
+            addresses = pd.Index(pd.concat(chunks, ignore_index=True) if chunks else [], dtype=str).unique()
+            bloom = BloomFilter.for_capacity(len(addresses), settings['prefilter_error_rate'])
+            bloom.add(address_hashes(addresses))
+            return cls(bloom, addresses, len(addresses), files, settings)
+
+        # Streamed in chunks, so a list of tens of millions is never held as strings
+        bloom = BloomFilter.for_capacity(capacity, settings['false_positive_rate'])
+        size = 0
+        for path in files:
+            for chunk in read_list(path):
+                bloom.add(address_hashes(chunk))
+                size += len(chunk)
+        return cls(bloom, None, size, files, settings)
+
+    def contains(self, addresses):
+        """Boolean array: True where the address is listed (or, filter only, a false positive)"""
+        addresses = addresses if isinstance(addresses, pd.Series) else pd.Series(addresses, dtype=str)
+        found = self.bloom.contains(address_hashes(addresses))
+        if self.addresses is not None and found.any():
+            hits = np.flatnonzero(found)
+            found[hits] = self.addresses.get_indexer(addresses.iloc[hits].astype(str)) >= 0
+        return found
+
+    def false_positive_rate(self):
+        """Expected share of unlisted addresses excluded (0 for an exact set)"""
+        if self.addresses is not None:
+            return 0.0
+        return self.bloom.fill_ratio() ** self.bloom.hash_count
+
+    def memory_usage(self):
+        exact = int(self.addresses.memory_usage(deep=True)) if self.addresses is not None else 0
+        return exact + self.bloom.memory_usage()
+
+    def fingerprint(self):
+        """Short hash of the list's contents, naming it in checkpoints"""
+        digest = hashlib.blake2b(digest_size=8)
+        if self.addresses is not None:
+            digest.update(np.sort(address_hashes(self.addresses)).tobytes())
+        else:
+            digest.update(self.bloom.bits.tobytes())
+            digest.update(str(self.bloom.hash_count).encode())
+        return digest.hexdigest()
+
+    def report(self):
+        """Run-report lines describing the list"""
+        return {
+            'exclusion_list_addresses': self.size,
+            'exclusion_filter': self.mode,
+            'exclusion_false_positive_rate': f"{self.false_positive_rate():.2g}",
+        }
+
+
+def exclusion_counters():
+    return {'excluded_transfers': 0, 'sent_by_excluded': 0, 'received_by_excluded': 0}
+
+
+def exclude(transfers, exclusions, counters=None):
+    """Transfers whose sender and receiver are both unlisted; adds what was dropped to counters"""
+    if exclusions is None or not len(transfers):
+        return transfers
+    senders = exclusions.contains(transfers['sender'])
+    receivers = exclusions.contains(transfers['receiver'])
+    dropped = senders | receivers
+    if counters is not None:
+        counters['excluded_transfers'] += int(dropped.sum())
+        counters['sent_by_excluded'] += int(senders.sum())
+        counters['received_by_excluded'] += int(receivers.sum())
+    return transfers[~dropped] if dropped.any() else transfers
+
+
+def exclude_chunks(chunks, exclusions, counters=None):
+    """exclude() over a stream of normalized transfer chunks"""
+    for chunk in chunks:
+        yield exclude(chunk, exclusions, counters)
+
+
+def exclusion_report(exclusions, counters):
+    """Run-report lines: the list, and the transfers it excluded"""
+    if exclusions is None:
+        return {}
+    return {**counters, **exclusions.report()}
+
+
+def main(argv=None):
+    from tracker.identify import CHUNK_SIZE, read_transfers
+
+    parser = argparse.ArgumentParser(description="Inspect address exclusion lists")
+    parser.add_argument('lists', nargs='+', help="Denylist files, or directories of .txt/.csv lists")
+    parser.add_argument('--check', help="Transfer log CSV to count excluded transfers in")
+    parser.add_argument('--false-positive-rate', type=float, default=EXCLUSION_SETTINGS['false_positive_rate'])
+    args = parser.parse_args(argv)
+
+    exclusions = ExclusionList.load(args.lists, {'false_positive_rate': args.false_positive_rate})
+    print(f"{exclusions.size:,} addresses from {len(exclusions.sources)} lists: {exclusions.mode} filter, "
+          f"{exclusions.memory_usage() / 2**20:,.1f} MiB, false-positive rate {exclusions.false_positive_rate():.2g}")
+
+    if args.check:
+        counters = exclusion_counters()
+        transfers = 0
+        for chunk in read_transfers(args.check, CHUNK_SIZE):
+            transfers += len(chunk)
+            exclude(chunk, exclusions, counters)
+        print(f"{counters['excluded_transfers']:,} of {transfers:,} transfers excluded "
+              f"({counters['sent_by_excluded']:,} sent by, {counters['received_by_excluded']:,} received by "
+              f"listed addresses)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+"""
+Merchant Export
+Filtered, column-selected exports of the merchant table, written batch by batch
+
+An export is a selection of columns and rows (regions, merchant sizes and a
+volume range) of the shared merchant table (see tracker.shared), written as
+CSV, Parquet or NDJSON. The table is read in record batches of
+EXPORT_CHUNK_ROWS: each batch is filtered, its addresses are encoded back to
+strings and it is written out before the next is read. Peak memory is the
+output plus one batch - the table is never copied into a DataFrame and the
+output is never built as one string.
+
+export_chunks() yields the output as a stream of byte chunks (for a
+download or an HTTP response); write_export() streams it to a file.
+
+Usage:
+    python -m tracker.export -o merchants.csv
+    python -m tracker.export --columns address estimated_region total_received_usdt \\
+        --region Asia-Pacific --size Large --min-volume 1000 -o large_ap.parquet
+"""
+
+import argparse
+import io
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pcsv
+import pyarrow.parquet as pq
+
+from tracker.dataset import (
+    FLOAT_DECIMALS, HOUR_COLUMNS, HOURS_COLUMN, MERCHANT_DATASET, PAYLOAD_COLUMN, address_strings, hour_matrix,
+    hours_present, parquet_hours,
+)
+from tracker.shared import MerchantSnapshot
+
+# Format -> (MIME type, file extension)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', '.csv'),
+    'parquet': ('application/vnd.apache.parquet', '.parquet'),
+    'ndjson': ('application/x-ndjson', '.ndjson'),
+}
+EXPORT_CHUNK_ROWS = 65_536
+DEFAULT_EXPORT_COLUMNS = ['address', 'estimated_region']
+
+
+def export_columns(table):
+    """Columns of the merchant table that can be exported"""
+    return [col for col in table.column_names if col != PAYLOAD_COLUMN]
+
+
+def _categories(table, column):
+    if column not in table.column_names:
+        return []
+    values = pc.unique(table.column(column))
+    if pa.types.is_dictionary(values.type):
+        values = values.dictionary_decode()
+    return sorted(value for value in values.to_pylist() if value is not None)
+
+
+def export_controls(table):
+    """Options offered by an export form, as plain values"""
+    return {
+        'formats': {fmt: list(spec) for fmt, spec in EXPORT_FORMATS.items()},
+        'columns': export_columns(table),
+        'default_columns': [col for col in DEFAULT_EXPORT_COLUMNS if col in table.column_names],
+        'regions': _categories(table, 'estimated_region'),
+        'sizes': _categories(table, 'merchant_size'),
+    }
+
+
+def row_filter(regions=None, sizes=None, volume_range=None):
+    """Filter expression for the selected rows, or None to keep every row
+
+    volume_range is (low, high) in USDT, inclusive; either end may be None.
+    """
+    conditions = []
+    if regions:
+        conditions.append(pc.field('estimated_region').isin(list(regions)))
+    if sizes:
+        conditions.append(pc.field('merchant_size').isin(list(sizes)))
+    low, high = volume_range or (None, None)
+    if low is not None:
+        conditions.append(pc.field('total_received_usdt') >= low)
+    if high is not None:
+        conditions.append(pc.field('total_received_usdt') <= high)
+
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def _plain_batch(batch, fmt):
+    """Batch with output types: address strings, stored decimals and (for CSV) hours as h00..h23"""
+    columns, names = [], []
+    for name, column in zip(batch.schema.names, batch.columns):
+        if name == 'address':
+            addresses = address_strings(pd.Series(pd.arrays.ArrowExtensionArray(column)))
+            column = pa.array(addresses.to_numpy(), pa.string())
+        elif name in FLOAT_DECIMALS and pa.types.is_floating(column.type):
+            # Compact float32 values read back at their stored precision
+            column = pc.round(column.cast(pa.float64()), FLOAT_DECIMALS[name])
+        elif name == HOURS_COLUMN and fmt == 'csv':
+            hours = pd.Series(pd.arrays.ArrowExtensionArray(column))
+            matrix, missing = hour_matrix(hours), ~hours_present(hours)
+            columns.extend(pa.array(matrix[:, hour], mask=missing) for hour in range(24))
+            names.extend(HOUR_COLUMNS)
+            continue
+        elif name == HOURS_COLUMN and fmt == 'parquet':
+            column = parquet_hours(column)
+        columns.append(column)
+        names.append(name)
+    return pa.RecordBatch.from_arrays(columns, names=names)
+
+
+def export_batches(table, fmt='csv', columns=None, regions=None, sizes=None, volume_range=None,
+                   chunk_rows=EXPORT_CHUNK_ROWS):
+    """Selected rows and columns, converted for output, one record batch at a time
+
+    The first batch is always empty and only carries the output schema.
+    Filter columns are read alongside the selection, so rows can be
+    filtered on columns that are not exported.
+    """
+    columns = [col for col in (columns or export_columns(table)) if col in export_columns(table)]
+    expression = row_filter(regions, sizes, volume_range)
+    filter_columns = [col for col in ['estimated_region', 'merchant_size', 'total_received_usdt']
+                      if col in table.column_names and col not in columns]
+    source = table.select(columns + filter_columns)
+
+    # An empty batch first, giving the output schema even when no row matches
+    schema = source.select(columns).schema
+    yield _plain_batch(pa.RecordBatch.from_arrays([pa.array([], field.type) for field in schema], schema=schema), fmt)
+    for batch in source.to_batches(max_chunksize=chunk_rows):
+        if expression is not None:
+            batch = batch.filter(expression)
+        if batch.num_rows:
+            yield _plain_batch(batch.select(columns), fmt)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only stream collecting what writers emit until it is drained"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _writer(fmt, sink, schema):
+    if fmt == 'csv':
+        return pcsv.CSVWriter(sink, schema)
+    if fmt == 'parquet':
+        return pq.ParquetWriter(sink, schema, compression='zstd')
+    raise ValueError(f"Unknown export format: {fmt}")
+
+
+def _ndjson(batch):
+    return batch.to_pandas().to_json(orient='records', lines=True, date_format='iso').encode('utf-8')
+
+
+def export_chunks(table, fmt='csv', **selection):
+    """Export output as a stream of byte chunks, about one per record batch
+
+    selection: columns, regions, sizes, volume_range, chunk_rows (see export_batches).
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    batches = export_batches(table, fmt, **selection)
+    empty = next(batches)
+
+    if fmt == 'ndjson':
+        for batch in batches:
+            yield _ndjson(batch)
+        return
+
+    sink = _ChunkSink()
+    writer = _writer(fmt, pa.PythonFile(sink, mode='w'), empty.schema)
+    for batch in batches:
+        writer.write_batch(batch)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def export_bytes(table, fmt='csv', **selection):
+    """Whole export in one buffer (for download buttons that need the full contents)"""
+    output = io.BytesIO()
+    for chunk in export_chunks(table, fmt, **selection):
+        output.write(chunk)
+    return output.getvalue()
+
+
+def write_export(table, path, fmt=None, **selection):
+    """Stream an export to a file (format from the extension unless given); returns its path"""
+    fmt = fmt or next((name for name, (_, ext) in EXPORT_FORMATS.items() if path.endswith(ext)), 'csv')
+    out_dir = os.path.dirname(path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+
+    partial = f'{path}.{os.getpid()}.tmp'
+    with open(partial, 'wb') as f:
+        for chunk in export_chunks(table, fmt, **selection):
+            f.write(chunk)
+    os.replace(partial, path)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export selected merchant rows and columns")
+    parser.add_argument('source', nargs='?', default=MERCHANT_DATASET)
+    parser.add_argument('-o', '--output', required=True, help="output file (.csv, .parquet or .ndjson)")
+    parser.add_argument('--format', choices=list(EXPORT_FORMATS), help="output format (default: from the extension)")
+    parser.add_argument('--columns', nargs='+', help="columns to export (default: all)")
+    parser.add_argument('--region', action='append', help="keep only these regions (repeatable)")
+    parser.add_argument('--size', action='append', help="keep only these merchant sizes (repeatable)")
+    parser.add_argument('--min-volume', type=float)
+    parser.add_argument('--max-volume', type=float)
+    parser.add_argument('--chunk-rows', type=int, default=EXPORT_CHUNK_ROWS)
+    args = parser.parse_args(argv)
+
+    table = MerchantSnapshot.open(args.source).table
+    write_export(table, args.output, args.format, columns=args.columns, regions=args.region, sizes=args.size,
+                 volume_range=(args.min_volume, args.max_volume), chunk_rows=args.chunk_rows)
+    print(f"Wrote {args.output} ({os.path.getsize(args.output) / 2**20:,.1f} MiB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Figure Cache
+Bounded, shared LRU cache of serialized Plotly figure specs
+
+Building a Plotly figure (especially through plotly.express) and serializing
+it to JSON cost far more than sending a spec that already exists.
+FigureCache keeps each figure's JSON spec under a key of (dataset version,
+theme, chart, parameters). On a hit the dashboard sends the stored spec as
+is: the figure is neither rebuilt nor re-serialized, so an unchanged chart
+costs a dictionary lookup per rerun instead of a build and a to_json.
+
+The cache is bounded by entry count and by the total size of the stored
+specs; the least recently used specs are evicted first.
+"""
+
+import json
+import threading
+from collections import OrderedDict
+
+FIGURE_CACHE_ENTRIES = 128
+FIGURE_CACHE_BYTES = 64 * 2**20
+
+
+def figure_key(version, theme, chart, **params):
+    """Hashable cache key for one chart of one dataset version, rendered with a theme, with given parameters"""
+    return version, theme, chart, tuple(sorted(params.items()))
+
+
+def figure_spec(figure):
+    """JSON spec of a figure and its layout height (None when the layout leaves it to the renderer)
+
+    Takes a Plotly figure or a figure dict of plain JSON values (as stored in
+    a prebuilt summary); only the former needs plotly.
+    """
+    layout = figure['layout']
+    height = layout['height'] if 'height' in layout else None
+    if isinstance(figure, dict):
+        return json.dumps(figure, separators=(',', ':')), height
+    import plotly.io as pio
+    return pio.to_json(figure, validate=False), height
+
+
+class FigureCache:
+    """Thread-safe LRU of (spec, height) pairs"""
+
+    def __init__(self, max_entries=FIGURE_CACHE_ENTRIES, max_bytes=FIGURE_CACHE_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Cached (spec, height) for key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, figure):
+        """Serialize and store a figure; returns its (spec, height)"""
+        entry = figure_spec(figure)
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= len(self._entries.pop(key)[0])
+            self._entries[key] = entry
+            self.bytes += len(entry[0])
+            while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self.bytes > self.max_bytes):
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self.bytes -= len(evicted)
+        return entry
+
+    def spec(self, key, build):
+        """Cached (spec, height) for key, calling build() to make the figure on a miss"""
+        entry = self.get(key)
+        if entry is not None:
+            return entry
+        return self.put(key, build())
@@ -0,0 +1,394 @@
+"""
+Merchant-Customer Graph
+Sparse bipartite payment graph behind the aggregator and shared-customer flags
+
+CustomerGraph holds payments per (merchant, customer) as a CSR matrix: row
+i is row i of the merchant table, column j is customer j of a sorted array
+of customer addresses, and indptr / indices / payments are the usual CSR
+arrays (int64 row offsets, int32 customer ids, uint32 payment counts).
+Every analysis is a vectorized pass over those arrays:
+
+- degrees: customers per merchant (the row lengths) and merchants per
+  customer (a bincount of the column ids), with log2-binned distributions;
+- overlap: customers shared by each pair of merchants. Each customer paying
+  d merchants adds one to each of its d(d-1)/2 merchant pairs; customers are
+  grouped by d so a whole group's pairs come from one index matrix.
+  Customers paying more than overlap_max_customer_degree merchants (hot
+  wallets, exchanges) are left out - they say nothing about who a merchant
+  serves and would add most of the pairs;
+- clusters: connected components of merchants whose customer bases overlap
+  (Jaccard similarity and shared customers above the GRAPH_CRITERIA bounds).
+
+analyze() turns these into one graph_flag per merchant:
+
+    aggregator        customer base far larger than almost every merchant's
+                      (payment processors collecting for many businesses)
+    p2p_trader        a large share of its customers are merchants themselves,
+                      or hubs paying more merchants than any shopper would
+                      (trading desks and the OTC traders they deal with)
+    shared_customers  in a cluster of merchants with overlapping customer
+                      bases (one operator's addresses, or a processor's)
+
+The pipeline saves the graph next to the merchant table (GRAPH_PATH) as one
+.npz file, with the merchant and customer addresses as fixed-width bytes.
+
+Usage:
+    python -m tracker.graph                   # summarize output/customer_graph.npz
+    python -m tracker.graph --reanalyze       # after changing GRAPH_CRITERIA: saves the
+                                              # graph and rewrites graph_flag in the dataset
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from tracker.dataset import MERCHANT_DATASET, read_merchants, write_merchants
+
+GRAPH_PATH = 'output/customer_graph.npz'
+
+# Merchant flags, in order of precedence
+GRAPH_FLAGS = ['aggregator', 'p2p_trader', 'shared_customers']
+
+GRAPH_CRITERIA = {
+    'overlap_max_customer_degree': 100,   # customers paying more merchants are left out of overlaps
+    'cluster_min_shared': 5,              # customers two clustered merchants share at least
+    'cluster_min_jaccard': 0.2,           # and at least this share of their combined customers
+    'aggregator_min_customers': 1_000,
+    'aggregator_percentile': 99.5,        # and more customers than this percentile of merchants
+    'p2p_min_customers': 20,
+    'p2p_merchant_customer_share': 0.25,  # share of customers that are merchants themselves
+    'p2p_hub_customer_share': 0.5,        # or that pay more than overlap_max_customer_degree merchants
+}
+
+# Merchant pairs generated per batch while counting overlaps
+OVERLAP_BATCH = 20_000_000
+# Largest clusters listed in the dashboard view, and addresses shown per cluster
+CLUSTER_LIMIT = 20
+CLUSTER_ADDRESSES = 5
+
+
+def customer_pairs(transfers, addresses):
+    """Payments per (receiver, sender) for the transfers received by `addresses`"""
+    received = transfers[transfers['receiver'].isin(addresses)]
+    return received.groupby(['receiver', 'sender']).size().astype('uint32')
+
+
+def _count_keys(keys, counts=None):
+    """Distinct keys and their (summed) counts"""
+    keys, inverse = np.unique(keys, return_inverse=True)
+    return keys, np.bincount(inverse, weights=counts, minlength=len(keys)).astype('int64')
+
+
+def _row_sums(indptr, values):
+    """Sum of `values` over each CSR row (empty rows sum to 0)"""
+    totals = np.concatenate([[0], np.cumsum(values, dtype='float64')])
+    return totals[indptr[1:]] - totals[indptr[:-1]]
+
+
+def components(n, a, b):
+    """Connected component label (its smallest node) of each of n nodes, given edges a-b
+
+    Min-label propagation with pointer jumping: each round every edge pulls
+    both ends down to the smaller label, then labels follow their own label.
+    """
+    labels = np.arange(n)
+    while len(a):
+        low = np.minimum(labels[a], labels[b])
+        updated = labels.copy()
+        np.minimum.at(updated, a, low)
+        np.minimum.at(updated, b, low)
+        updated = updated[updated]
+        if np.array_equal(updated, labels):
+            break
+        labels = updated
+    return labels
+
+
+def degree_distribution(degrees):
+    """Log2-binned degree counts: (lower bounds 1, 2, 4, ..., count per bin)"""
+    degrees = degrees[degrees > 0]
+    if not len(degrees):
+        return [], []
+    bins = np.floor(np.log2(degrees)).astype('int64')
+    counts = np.bincount(bins)
+    return [int(2 ** i) for i in range(len(counts))], counts.tolist()
+
+
+class CustomerGraph:
+    """Merchant x customer payment counts (CSR), plus the analyses' per-merchant results"""
+
+    def __init__(self, merchants, customers, indptr, indices, payments, clusters=None, flags=None):
+        self.merchants = merchants      # merchant address per row (bytes)
+        self.customers = customers      # customer address per column id (bytes, sorted)
+        self.indptr = indptr
+        self.indices = indices
+        self.payments = payments
+        self.clusters = clusters        # cluster id per merchant, -1 for none
+        self.flags = flags              # index into GRAPH_FLAGS per merchant, -1 for none
+
+    @classmethod
+    def from_pairs(cls, merchants, pairs):
+        """Graph of the merchant rows from payments per (receiver, sender)
+
+        merchants: merchant addresses in table order. Pairs whose receiver is
+        not a merchant are dropped.
+        """
+        merchants = pd.Index(merchants)
+        rows = merchants.get_indexer(pairs.index.get_level_values(0))
+        kept = rows >= 0
+        codes, customers = pd.factorize(pairs.index.get_level_values(1)[kept], sort=True)
+        return cls.from_codes(np.asarray(merchants.astype(str), dtype='S'), np.asarray(customers.astype(str), dtype='S'),
+                              rows[kept], codes, pairs.to_numpy()[kept])
+
+    @classmethod
+    def from_codes(cls, merchants, customers, rows, columns, payments):
+        """Graph from integer-encoded edges: merchant row, customer column and payments per edge"""
+        order = np.lexsort((columns, rows))
+        indptr = np.zeros(len(merchants) + 1, dtype='int64')
+        np.cumsum(np.bincount(rows, minlength=len(merchants)), out=indptr[1:])
+        index_type = 'int32' if len(customers) < 2**31 else 'int64'
+        return cls(merchants, customers, indptr, np.asarray(columns)[order].astype(index_type),
+                   np.asarray(payments)[order].astype('uint32'))
+
+    @property
+    def num_edges(self):
+        return len(self.indices)
+
+    def merchant_degrees(self):
+        """Customers of each merchant"""
+        return np.diff(self.indptr)
+
+    def customer_degrees(self):
+        """Merchants each customer pays"""
+        return np.bincount(self.indices, minlength=len(self.customers))
+
+    def edge_rows(self):
+        """Merchant row of every edge"""
+        return np.repeat(np.arange(len(self.merchants), dtype=self.indices.dtype), self.merchant_degrees())
+
+    def overlap(self, max_customer_degree=GRAPH_CRITERIA['overlap_max_customer_degree'], batch=OVERLAP_BATCH):
+        """Merchant pairs (a < b) sharing customers, and how many they share"""
+        degrees = self.customer_degrees()
+        edge_degrees = degrees[self.indices]
+        shared = (edge_degrees >= 2) & (edge_degrees <= max_customer_degree)
+        customers, rows = self.indices[shared], self.edge_rows()[shared]
+        # Edges grouped by customer, each customer's merchants ascending
+        order = np.lexsort((rows, customers))
+        customers, rows = customers[order], rows[order]
+        starts = np.flatnonzero(np.concatenate([[True], customers[1:] != customers[:-1]])) if len(customers) else \
+            np.array([], dtype='int64')
+        start_degrees = degrees[customers[starts]]
+
+        width = np.int64(len(self.merchants))
+        keys, counts = [], []
+        for degree in np.unique(start_degrees):
+            first, second = np.triu_indices(degree, 1)
+            group = starts[start_degrees == degree]
+            step = max(1, batch // len(first))
+            for begin in range(0, len(group), step):
+                members = rows[group[begin:begin + step, None] + np.arange(degree)].astype('int64')
+                batch_keys, batch_counts = _count_keys((members[:, first] * width + members[:, second]).ravel())
+                keys.append(batch_keys)
+                counts.append(batch_counts)
+
+        if not keys:
+            empty = np.array([], dtype='int64')
+            return empty, empty, empty
+        keys, counts = _count_keys(np.concatenate(keys), np.concatenate(counts)) if len(keys) > 1 else \
+            (keys[0], counts[0])
+        return keys // width, keys % width, counts
+
+    def similar_pairs(self, criteria=GRAPH_CRITERIA):
+        """Overlapping merchant pairs passing the cluster criteria: (a, b, shared, jaccard)"""
+        a, b, shared = self.overlap(criteria['overlap_max_customer_degree'])
+        degrees = self.merchant_degrees()
+        jaccard = shared / (degrees[a] + degrees[b] - shared)
+        keep = (shared >= criteria['cluster_min_shared']) & (jaccard >= criteria['cluster_min_jaccard'])
+        return a[keep], b[keep], shared[keep], jaccard[keep]
+
+    def analyze(self, criteria=GRAPH_CRITERIA, customer_counts=None):
+        """Compute clusters and flags (stored on the graph); returns the graph
+
+        customer_counts: customers per merchant row for the aggregator test,
+        when the graph holds only some of them (approximate customer state).
+        """
+        criteria = dict(GRAPH_CRITERIA, **(criteria or {}))
+        n = len(self.merchants)
+
+        a, b, _, _ = self.similar_pairs(criteria)
+        labels = components(n, a, b)
+        sizes = np.bincount(labels, minlength=n)
+        clustered = sizes[labels] >= 2
+        # Cluster ids by size, largest first
+        roots = np.unique(labels[clustered])
+        roots = roots[np.argsort(-sizes[roots], kind='stable')]
+        cluster_ids = np.full(n, -1, dtype='int64')
+        cluster_ids[roots] = np.arange(len(roots))
+        self.clusters = np.where(clustered, cluster_ids[labels], -1).astype('int32')
+
+        degrees = self.merchant_degrees()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            is_merchant = np.isin(self.customers, self.merchants)
+            merchant_share = _row_sums(self.indptr, is_merchant[self.indices]) / degrees
+            hubs = self.customer_degrees() > criteria['overlap_max_customer_degree']
+            hub_share = _row_sums(self.indptr, hubs[self.indices]) / degrees
+        counts = degrees if customer_counts is None else np.asarray(customer_counts, dtype='int64')
+        aggregator = (counts >= criteria['aggregator_min_customers']) & \
+            (counts >= (np.percentile(counts, criteria['aggregator_percentile']) if n else 0))
+        p2p = (degrees >= criteria['p2p_min_customers']) & (
+            (merchant_share >= criteria['p2p_merchant_customer_share'])
+            | (hub_share >= criteria['p2p_hub_customer_share']))
+
+        self.flags = np.select([aggregator, p2p, self.clusters >= 0], [0, 1, 2], default=-1).astype('int8')
+        return self
+
+    def flag_labels(self):
+        """graph_flag value per merchant row (None when unflagged)"""
+        labels = np.array([None] + GRAPH_FLAGS, dtype=object)
+        return labels[self.flags + 1]
+
+    def save(self, path=GRAPH_PATH, criteria=GRAPH_CRITERIA):
+        """Write the graph and its analyses as one .npz file (atomically)"""
+        out_dir = os.path.dirname(path)
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+        partial = f'{path}.{os.getpid()}.tmp'
+        arrays = {'merchants': self.merchants, 'customers': self.customers, 'indptr': self.indptr,
+                  'indices': self.indices, 'payments': self.payments,
+                  'criteria': np.array(json.dumps(dict(GRAPH_CRITERIA, **(criteria or {}))))}
+        if self.flags is not None:
+            arrays.update(clusters=self.clusters, flags=self.flags)
+        with open(partial, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(partial, path)
+        return path
+
+    @classmethod
+    def load(cls, path=GRAPH_PATH):
+        with np.load(path) as arrays:
+            return cls(arrays['merchants'], arrays['customers'], arrays['indptr'], arrays['indices'],
+                       arrays['payments'], arrays['clusters'] if 'clusters' in arrays else None,
+                       arrays['flags'] if 'flags' in arrays else None)
+
+
+def merchant_graph(merchants, pairs, criteria=GRAPH_CRITERIA):
+    """Analyzed graph of a merchant table; fills in its graph_flag column
+
+    Returns (merchants with graph_flag, graph).
+    """
+    graph = CustomerGraph.from_pairs(merchants['address'], pairs).analyze(criteria, merchants['unique_customers'])
+    merchants = merchants.copy()
+    merchants['graph_flag'] = graph.flag_labels()
+    return merchants, graph
+
+
+def graph_report(graph):
+    """Run-report lines for a graph"""
+    flags = np.bincount(graph.flags + 1, minlength=len(GRAPH_FLAGS) + 1)
+    return {
+        'graph_edges': graph.num_edges,
+        'graph_customers': len(graph.customers),
+        'customer_clusters': int(graph.clusters.max()) + 1 if len(graph.clusters) else 0,
+        **{f'flagged_{flag}': int(flags[i + 1]) for i, flag in enumerate(GRAPH_FLAGS)},
+    }
+
+
+def graph_view(graph, limit=CLUSTER_LIMIT):
+    """What the dashboard shows of a graph, as plain values"""
+    rows = graph.edge_rows()
+    clusters = graph.clusters
+    cluster_count = int(clusters.max()) + 1 if len(clusters) else 0
+
+    # Customers paying two or more members of the same cluster
+    clustered = clusters[rows] >= 0
+    keys, counts = _count_keys(clusters[rows][clustered].astype('int64') * len(graph.customers)
+                               + graph.indices[clustered])
+    shared = np.bincount(keys[counts >= 2] // len(graph.customers), minlength=cluster_count)
+    members = np.bincount(clusters[clusters >= 0], minlength=cluster_count)
+    payments = np.bincount(clusters[rows][clustered], weights=graph.payments[clustered], minlength=cluster_count)
+
+    listed = []
+    for cluster in range(min(limit, cluster_count)):
+        addresses = graph.merchants[np.flatnonzero(clusters == cluster)[:CLUSTER_ADDRESSES]]
+        listed.append({
+            'cluster': cluster,
+            'merchants': int(members[cluster]),
+            'shared_customers': int(shared[cluster]),
+            'payments': int(payments[cluster]),
+            'addresses': [address.decode() for address in addresses],
+        })
+
+    merchant_bins, merchant_counts = degree_distribution(graph.merchant_degrees())
+    customer_bins, customer_counts = degree_distribution(graph.customer_degrees())
+    flags = np.bincount(graph.flags + 1, minlength=len(GRAPH_FLAGS) + 1)
+    return {
+        'merchants': len(graph.merchants),
+        'customers': len(graph.customers),
+        'edges': graph.num_edges,
+        'flags': {flag: int(flags[i + 1]) for i, flag in enumerate(GRAPH_FLAGS)},
+        'clusters': cluster_count,
+        'degrees': {
+            'merchants': {'bins': merchant_bins, 'counts': merchant_counts},
+            'customers': {'bins': customer_bins, 'counts': customer_counts},
+        },
+        'top_clusters': listed,
+    }
+
+
+def read_graph_view(path=GRAPH_PATH):
+    """graph_view of a saved graph (analyzed with GRAPH_CRITERIA if it was saved without flags)"""
+    graph = CustomerGraph.load(path)
+    if graph.flags is None:
+        graph.analyze()
+    return graph_view(graph)
+
+
+def reanalyze(path=GRAPH_PATH, dataset=MERCHANT_DATASET, criteria=GRAPH_CRITERIA):
+    """Recompute a saved graph's clusters and flags; saves the graph and the dataset's graph_flag
+
+    Returns the graph.
+    """
+    merchants = read_merchants(dataset)
+    graph = CustomerGraph.load(path)
+    rows = pd.Index(merchants['address']).get_indexer(graph.merchants.astype(str))
+    if (rows < 0).any():
+        raise ValueError(f"{path} has {int((rows < 0).sum()):,} merchants that are not in {dataset}")
+
+    customer_counts = np.asarray(merchants['unique_customers'], dtype='int64')[rows]
+    graph.analyze(criteria, customer_counts).save(path, criteria)
+    flags = np.full(len(merchants), None, dtype=object)
+    flags[rows] = graph.flag_labels()
+    merchants['graph_flag'] = flags
+    write_merchants(merchants, dataset)
+    return graph
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize the merchant-customer graph")
+    parser.add_argument('graph', nargs='?', default=GRAPH_PATH)
+    parser.add_argument('--reanalyze', action='store_true',
+                        help="recompute clusters and flags with GRAPH_CRITERIA, then save the graph "
+                             "and rewrite graph_flag in the dataset")
+    parser.add_argument('--dataset', default=MERCHANT_DATASET,
+                        help="Merchant table whose graph_flag --reanalyze rewrites (.parquet, or .csv)")
+    args = parser.parse_args(argv)
+
+    if args.reanalyze:
+        view = graph_view(reanalyze(args.graph, args.dataset))
+        print(f"Saved {args.graph} and graph flags in {args.dataset}")
+    else:
+        view = read_graph_view(args.graph)
+    print(f"{view['merchants']:,} merchants, {view['customers']:,} customers, {view['edges']:,} edges")
+    for flag, count in view['flags'].items():
+        print(f"  {flag:<18} {count:>10,}")
+    print(f"{view['clusters']:,} shared-customer clusters")
+    for cluster in view['top_clusters'][:10]:
+        print(f"  #{cluster['cluster']:<5} {cluster['merchants']:>5} merchants  "
+              f"{cluster['shared_customers']:>7,} shared customers  {', '.join(cluster['addresses'][:3])}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,322 @@
+"""
+Merchant Identification Engine
+Builds output/identified_merchants.csv from a raw TRON USDT transfer log
+
+The transfer log is a CSV with one row per USDT transfer:
+
+    timestamp,sender,receiver,amount
+    2025-06-03 14:40:15,TXyz...,TAbc...,12.50
+
+Timestamps are UTC (ISO strings or unix seconds). The log is never loaded
+whole: a first pass keeps only a transaction count and volume per receiving
+address, which is enough to discard every address failing the volume
+criteria. A second pass folds the remaining candidates' transfers, chunk by
+chunk, into mergeable per-address aggregates (tracker.state.AggregateState)
+and computes the full merchant profile from them, so memory follows the
+number of candidates and their customers, never their transfers. The merchants' payments
+per customer also form the merchant-customer graph (see tracker.graph),
+which sets each merchant's graph_flag and is saved next to the table.
+Transfers to or from addresses on the --exclude denylists (exchanges,
+bridges; see tracker.exclusions) are dropped in both passes.
+
+The merchant table is written as a Parquet dataset (see tracker.dataset),
+optionally with a CSV export alongside. Addresses are kept exactly as
+they appear in the log (Base58 is case sensitive); the report counts
+merchant addresses that fail Base58Check validation.
+
+Usage:
+    python -m tracker.identify transfers.csv --csv output/identified_merchants.csv
+    python -m tracker.identify transfers.csv --workers 32   # see tracker.parallel
+    python -m tracker.identify transfers.csv --exclude lists/
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from tracker.addresses import valid_address_mask
+from tracker.dataset import MERCHANT_DATASET, MERCHANT_SCHEMA, hour_matrix, pack_hours, write_merchants
+from tracker.exclusions import (
+    EXCLUSION_SETTINGS, ExclusionList, exclude, exclude_chunks, exclusion_counters, exclusion_report,
+)
+from tracker.graph import GRAPH_PATH, graph_report, merchant_graph
+from tracker.profiles import hourly_profile, infer_utc_offsets, offset_peak_hours
+from tracker.sketches import QuantileSketch
+
+TRANSFER_COLUMNS = ['timestamp', 'sender', 'receiver', 'amount']
+
+CHUNK_SIZE = 1_000_000
+
+# Merchant Identification Criteria (see "How I Collected This Data")
+MERCHANT_CRITERIA = {
+    'min_transactions': 5,
+    'min_customers': 5,
+    'min_volume_usdt': 75.0,
+    'min_avg_payment': 1.0,
+    'max_avg_payment': 100.0,
+    'max_customer_share': 0.8,
+}
+
+# Column order of the merchant table
+MERCHANT_COLUMNS = MERCHANT_SCHEMA.names
+
+# Payment-size percentiles read from each address's quantile sketch
+PAYMENT_QUANTILES = {
+    'median_payment_size': 0.5,
+    'p90_payment_size': 0.9,
+}
+
+SECONDS_PER_DAY = 86400
+
+
+def normalize_transfers(chunk):
+    """Clean one chunk of the transfer log into the engine's column types"""
+    chunk = chunk.dropna(subset=TRANSFER_COLUMNS)
+
+    timestamps = chunk['timestamp']
+    if pd.api.types.is_numeric_dtype(timestamps):
+        seconds = timestamps.astype('int64')
+    else:
+        parsed = pd.to_datetime(timestamps, utc=True)
+        seconds = (parsed - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1)
+
+    transfers = pd.DataFrame({
+        'timestamp': seconds.astype('int64'),
+        'sender': chunk['sender'].astype(str),
+        'receiver': chunk['receiver'].astype(str),
+        'amount': chunk['amount'].astype('float64'),
+    })
+
+    # Zero-value transfers and self-transfers are never payments
+    keep = (transfers['amount'] > 0) & (transfers['sender'] != transfers['receiver'])
+    return transfers[keep]
+
+
+def read_transfers(path, chunksize=CHUNK_SIZE):
+    """Yield the transfer log in normalized chunks"""
+    reader = pd.read_csv(
+        path,
+        usecols=TRANSFER_COLUMNS,
+        dtype={'sender': str, 'receiver': str, 'amount': 'float64'},
+        chunksize=chunksize,
+    )
+    for chunk in reader:
+        yield normalize_transfers(chunk)
+
+
+def receiver_totals(chunks):
+    """First pass: transaction count and volume for every receiving address"""
+    totals = None
+    for chunk in chunks:
+        part = chunk.groupby('receiver', sort=False)['amount'].agg(['size', 'sum'])
+        totals = part if totals is None else totals.add(part, fill_value=0)
+
+    if totals is None:
+        totals = pd.DataFrame({'size': [], 'sum': []}, index=pd.Index([], name='receiver'))
+    return totals.rename(columns={'size': 'transaction_count', 'sum': 'total_received_usdt'})
+
+
+def volume_candidates(totals, criteria=MERCHANT_CRITERIA):
+    """Addresses passing the count, volume and average-payment criteria"""
+    count = totals['transaction_count']
+    volume = totals['total_received_usdt']
+    avg_payment = volume / count
+
+    mask = (
+        (count >= criteria['min_transactions'])
+        & (volume >= criteria['min_volume_usdt'])
+        & avg_payment.between(criteria['min_avg_payment'], criteria['max_avg_payment'])
+    )
+    return totals.index[mask]
+
+
+def hour_histogram(receivers, timestamps):
+    """24-bin UTC hour histogram per receiver (one row per receiver, sorted)"""
+    return hourly_profile(receivers, timestamps)
+
+
+def payment_quantiles(sketch):
+    """PAYMENT_QUANTILES columns from a payment-size sketch"""
+    quantiles = sketch.quantiles(list(PAYMENT_QUANTILES.values()))
+    quantiles.columns = list(PAYMENT_QUANTILES)
+    return quantiles
+
+
+def summarize_receivers(transfers):
+    """Raw per-receiver statistics from a set of transfers (exact)"""
+    receivers = transfers['receiver']
+    grouped = transfers.groupby('receiver')
+
+    stats = grouped.agg(
+        transaction_count=('amount', 'size'),
+        total_received_usdt=('amount', 'sum'),
+        first_seen=('timestamp', 'min'),
+        last_seen=('timestamp', 'max'),
+    )
+
+    # Customer concentration from per (receiver, sender) payment counts
+    pairs = transfers.groupby(['receiver', 'sender']).size()
+    per_receiver = pairs.groupby(level='receiver')
+    stats['unique_customers'] = per_receiver.size()
+    stats['returning_customers'] = (pairs > 1).groupby(level='receiver').sum()
+    stats['max_customer_payments'] = per_receiver.max()
+
+    sketch = QuantileSketch.from_values(receivers, transfers['amount'])
+    stats = stats.join(payment_quantiles(sketch))
+
+    days = transfers['timestamp'] // SECONDS_PER_DAY
+    stats['days_active'] = days.groupby(receivers).nunique()
+
+    hist = hour_histogram(receivers, transfers['timestamp'])
+    stats['hours_active'] = (hist > 0).sum(axis=1)
+    stats['peak_hour_utc'] = hist.to_numpy().argmax(axis=1)
+    stats['hourly_transactions'] = pack_hours(hist.to_numpy(), index=hist.index)
+
+    return stats
+
+
+def estimate_region(peak_hour_utc):
+    """Map a (business-hours) peak UTC hour to region, assuming 9AM-5PM local business hours"""
+    hour = np.asarray(peak_hour_utc)
+    return np.select(
+        [(hour >= 7) & (hour <= 13), (hour >= 14) & (hour <= 21)],
+        ['Europe-Africa', 'Americas'],
+        default='Asia-Pacific',
+    )
+
+
+def merchant_size(transaction_count):
+    """Size tier by weekly transaction count"""
+    count = np.asarray(transaction_count)
+    return np.select([count >= 200, count >= 50], ['Large', 'Medium'], default='Small')
+
+
+def finalize_merchants(stats, criteria=MERCHANT_CRITERIA):
+    """Apply the customer criteria and format raw statistics as merchant rows"""
+    merchants = stats.copy()
+    count = merchants['transaction_count']
+    merchants['avg_payment_size'] = merchants['total_received_usdt'] / count
+    merchants['max_customer_share'] = merchants['max_customer_payments'] / count
+
+    mask = (
+        (count >= criteria['min_transactions'])
+        & (merchants['unique_customers'] >= criteria['min_customers'])
+        & (merchants['total_received_usdt'] >= criteria['min_volume_usdt'])
+        & merchants['avg_payment_size'].between(criteria['min_avg_payment'], criteria['max_avg_payment'])
+        & (merchants['max_customer_share'] <= criteria['max_customer_share'])
+    )
+    merchants = merchants[mask].copy()
+
+    merchants['customer_return_rate'] = merchants['returning_customers'] / merchants['unique_customers']
+    merchants['transaction_span_days'] = (merchants['last_seen'] - merchants['first_seen']) // SECONDS_PER_DAY
+    # Timezone fitted to the whole 24-hour profile, not just the single peak hour
+    utc_offsets, confidence = infer_utc_offsets(hour_matrix(merchants['hourly_transactions']))
+    merchants['utc_offset'] = utc_offsets
+    merchants['region_confidence'] = confidence
+    merchants['estimated_region'] = estimate_region(offset_peak_hours(utc_offsets))
+    merchants['merchant_size'] = merchant_size(merchants['transaction_count'])
+    # Set from the customer graph once every merchant is known (tracker.graph)
+    merchants['graph_flag'] = None
+    for col in ['first_seen', 'last_seen']:
+        merchants[col] = pd.to_datetime(merchants[col], unit='s', utc=True)
+
+    merchants = merchants.round({
+        'total_received_usdt': 2,
+        'avg_payment_size': 2,
+        'median_payment_size': 2,
+        'p90_payment_size': 2,
+        'max_customer_share': 3,
+        'customer_return_rate': 3,
+        'region_confidence': 3,
+    })
+
+    merchants = merchants.rename_axis('address').reset_index()
+    merchants = merchants.sort_values(['transaction_count', 'address'], ascending=[False, True])
+    return merchants[MERCHANT_COLUMNS].reset_index(drop=True)
+
+
+def identify_merchants(path, chunksize=CHUNK_SIZE, criteria=MERCHANT_CRITERIA, graph_path=None, exclusions=None):
+    """Run both passes over a transfer log; returns (merchants, report)
+
+    The merchant-customer graph is saved to graph_path when given. Transfers
+    involving an address on `exclusions` (an ExclusionList) are dropped.
+    """
+    excluded = exclusion_counters()
+    totals = receiver_totals(exclude_chunks(read_transfers(path, chunksize), exclusions, excluded))
+    candidates = volume_candidates(totals, criteria)
+
+    # Imported here: tracker.state builds on this module
+    from tracker.state import build_state
+
+    # Second pass folds each chunk of the candidates' transfers into per-address aggregates
+    state = build_state(
+        exclude(chunk[chunk['receiver'].isin(candidates)], exclusions)
+        for chunk in read_transfers(path, chunksize)
+    )
+
+    merchants = finalize_merchants(state.stats(), criteria)
+    merchants, graph = merchant_graph(merchants, state.customers.pairs())
+    if graph_path:
+        graph.save(graph_path)
+
+    report = {
+        'transfers': int(totals['transaction_count'].sum()) + excluded['excluded_transfers'],
+        **exclusion_report(exclusions, excluded),
+        'receiving_addresses': len(totals),
+        'volume_candidates': len(candidates),
+        'candidate_transfers': int(state.receivers['transaction_count'].sum()),
+        'merchants': len(merchants),
+        'invalid_addresses': int((~valid_address_mask(merchants['address'])).sum()),
+        **graph_report(graph),
+    }
+    return merchants, report
+
+
+def print_report(report):
+    """Print a run report"""
+    width = max(len(key) for key in report)
+    for key, value in report.items():
+        label = key.replace('_', ' ').capitalize()
+        print(f"{label:<{width}}  {value:>12,}" if isinstance(value, int) else f"{label:<{width}}  {value}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Identify USDT merchants from a raw TRON transfer log")
+    parser.add_argument('transfers', help="Transfer log CSV (timestamp, sender, receiver, amount)")
+    parser.add_argument('-o', '--output', default=MERCHANT_DATASET,
+                        help="Where to write the merchant table (.parquet, or .csv)")
+    parser.add_argument('--csv', help="Also export the merchant table as CSV here")
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE,
+                        help="Transfers read per chunk")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Worker processes; above 1 runs the sharded engine (0 = all cores)")
+    parser.add_argument('--graph', default=GRAPH_PATH,
+                        help="Where to save the merchant-customer graph ('' to skip)")
+    parser.add_argument('--exclude', action='append', default=[],
+                        help="Address denylist (.txt or .csv), or a directory of them; repeatable")
+    parser.add_argument('--false-positive-rate', type=float, default=EXCLUSION_SETTINGS['false_positive_rate'],
+                        help="Share of unlisted addresses a large (Bloom-filtered) denylist may exclude")
+    args = parser.parse_args(argv)
+
+    exclusions = None
+    if args.exclude:
+        exclusions = ExclusionList.load(args.exclude, {'false_positive_rate': args.false_positive_rate})
+
+    if args.workers == 1:
+        merchants, report = identify_merchants(args.transfers, chunksize=args.chunksize, graph_path=args.graph,
+                                               exclusions=exclusions)
+    else:
+        from tracker.parallel import identify_merchants_parallel
+        merchants, report = identify_merchants_parallel(args.transfers, workers=args.workers or None,
+                                                        chunksize=args.chunksize, graph_path=args.graph,
+                                                        exclusions=exclusions)
+    write_merchants(merchants, args.output)
+    if args.csv:
+        write_merchants(merchants, args.csv)
+    print_report(report)
+    print(f"Wrote {len(merchants):,} merchants to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+"""
+Merchant Index
+Bitmap and sorted-array indexes answering dashboard filters without scanning rows
+
+Built once per dataset version from the shared table (see tracker.shared):
+
+- categorical columns (estimated_region, merchant_size) get one bitmap per
+  category, a bit per merchant row packed eight to a byte;
+- numeric columns (volume, payment sizes, counts and the activity
+  percentile) get their row ids sorted by value, so a range is two binary
+  searches and a slice, plus bitmaps of the rows below each of RANGE_BINS
+  quantile boundaries, so a range is also two bitmaps and the few rows of
+  its partial end bins.
+
+query() answers a selective filter from the rows of its most selective
+part, testing only those against the rest (a bit lookup or a comparison per
+row); a broad one by ANDing the bitmaps of every part. Either way it never
+scans the merchant rows. The result is the matching row ids in table order,
+for MerchantSnapshot.view(rows=...).
+
+Filters are a dict: column -> list of categories, or column -> (low, high)
+with inclusive bounds, either of which may be None.
+
+Usage:
+    python -m tracker.index --region Asia-Pacific --range total_received_usdt 1000 -
+"""
+
+import argparse
+import hashlib
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from tracker.dataset import MERCHANT_DATASET
+from tracker.shared import MerchantSnapshot
+
+CATEGORY_COLUMNS = ['estimated_region', 'merchant_size']
+RANGE_COLUMNS = ['total_received_usdt', 'avg_payment_size', 'median_payment_size', 'p90_payment_size',
+                 'transaction_count', 'unique_customers']
+# Percentile rank of transaction_count over the whole table (as the dashboard computes it)
+ACTIVITY_COLUMN = 'activity_percentile'
+# Quantile boundaries per range column with a precomputed bitmap of the rows below it
+RANGE_BINS = 32
+# Queries whose most selective filter keeps under 1/SPARSE_FRACTION of the rows test candidates row by row
+SPARSE_FRACTION = 16
+
+
+def filter_key(filters):
+    """Short, stable name of a set of filters, for cache keys"""
+    text = json.dumps(filters, sort_keys=True, default=list)
+    return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+
+def _column_values(table, column):
+    """A column as a numpy array, nulls as NaN"""
+    values = table.column(column).to_numpy()
+    return values if values.dtype.kind in 'iuf' else values.astype('float64')
+
+
+def _bound(dtype, value, to_integer):
+    """A range bound in a column's own type - a bound of another type would make
+    every search convert the whole column"""
+    if dtype.kind == 'f':
+        return dtype.type(value)
+    info = np.iinfo(dtype)
+    return dtype.type(min(max(to_integer(value), info.min), info.max))
+
+
+class MerchantIndex:
+    """Filter indexes over one version of the merchant table"""
+
+    def __init__(self, table, range_bins=RANGE_BINS):
+        self.num_rows = table.num_rows
+        self.bitmaps, self.counts = {}, {}
+        self.values, self.order, self.sorted, self.boundaries, self.below = {}, {}, {}, {}, {}
+
+        for column in CATEGORY_COLUMNS:
+            if column in table.column_names:
+                codes = pd.Categorical(table.column(column).to_pandas())
+                self.bitmaps[column], self.counts[column] = {}, {}
+                for code, category in enumerate(codes.categories):
+                    matches = codes.codes == code
+                    self.bitmaps[column][str(category)] = np.packbits(matches)
+                    self.counts[column][str(category)] = int(matches.sum())
+
+        for column in RANGE_COLUMNS:
+            if column in table.column_names:
+                values = _column_values(table, column)
+                # NaN sorts last, so missing values never fall inside a range
+                self._add_range(column, values, np.argsort(values, kind='stable'), range_bins)
+
+        if 'transaction_count' in self.values:
+            # Ranks follow transaction_count, so its sort order serves the percentile too
+            percentile = pd.Series(self.values['transaction_count']).rank(pct=True).to_numpy() * 100
+            self._add_range(ACTIVITY_COLUMN, percentile, self.order['transaction_count'], range_bins)
+
+    def _add_range(self, column, values, order, bins):
+        """Sorted order of a column, plus bitmaps of the rows below each of `bins` quantile boundaries"""
+        order = order.astype('int32' if self.num_rows < 2**31 else 'int64')
+        ordered = values[order]
+        valid = int(np.count_nonzero(~np.isnan(ordered))) if ordered.dtype.kind == 'f' else len(ordered)
+        boundaries = np.linspace(0, valid, bins + 1).astype('int64')
+
+        below = np.zeros((bins + 1, (self.num_rows + 7) // 8), dtype='uint8')
+        for j in range(1, bins + 1):
+            below[j] = below[j - 1] | self._bitmap(order[boundaries[j - 1]:boundaries[j]])
+        self.values[column], self.order[column], self.sorted[column] = values, order, ordered
+        self.boundaries[column], self.below[column] = boundaries, below
+
+    @classmethod
+    def build(cls, snapshot):
+        return cls(snapshot.table)
+
+    def _bitmap(self, rows):
+        """Packed bitmap with the bits of `rows` set"""
+        mask = np.zeros(self.num_rows, dtype=bool)
+        mask[rows] = True
+        return np.packbits(mask)
+
+    def categories(self, column):
+        return list(self.bitmaps.get(column, {}))
+
+    def percentile(self, column, value):
+        """Percentile rank of a value among a range column's values (ties averaged, as pandas ranks them)"""
+        valid = int(self.boundaries[column][-1])
+        if value is None or not valid or np.isnan(value):
+            return None
+        ordered = self.sorted[column][:valid]
+        value = ordered.dtype.type(value)
+        below = np.searchsorted(ordered, value, side='left')
+        through = np.searchsorted(ordered, value, side='right')
+        return (below + through + 1) / 2 / valid * 100
+
+    def _span(self, column, low, high):
+        """Positions in the sorted order of the values within [low, high]"""
+        ordered, valid = self.sorted[column], int(self.boundaries[column][-1])
+        ordered = ordered[:valid]
+        start = 0 if low is None else int(np.searchsorted(ordered, _bound(ordered.dtype, low, np.ceil), side='left'))
+        stop = valid if high is None else int(np.searchsorted(ordered, _bound(ordered.dtype, high, np.floor), side='right'))
+        return start, max(stop, start)
+
+    def _range_bitmap(self, column, start, stop):
+        """Bitmap of the rows at sorted positions [start, stop): whole bins from the
+        boundary bitmaps, rows of the partial bins at either end set one by one"""
+        boundaries, order = self.boundaries[column], self.order[column]
+        first = int(np.searchsorted(boundaries, start, side='left'))
+        last = int(np.searchsorted(boundaries, stop, side='right')) - 1
+        if first >= last:
+            return self._bitmap(order[start:stop])
+        below = self.below[column]
+        edges = np.concatenate([order[start:boundaries[first]], order[boundaries[last]:stop]])
+        return (below[last] & ~below[first]) | self._bitmap(edges)
+
+    def _terms(self, filters):
+        """(matching rows, their row ids, their bitmap, membership test) per filter"""
+        for column, selection in filters.items():
+            if column in self.bitmaps:
+                selected = [str(value) for value in selection if str(value) in self.bitmaps[column]]
+                bitmap = np.zeros((self.num_rows + 7) // 8, dtype='uint8')
+                for category in selected:
+                    bitmap |= self.bitmaps[column][category]
+                # Each row has one category, so the counts of the selected ones add up
+                count = sum(self.counts[column][category] for category in selected)
+                rows = lambda bitmap=bitmap: np.flatnonzero(np.unpackbits(bitmap, count=self.num_rows).view(bool))
+                test = lambda rows, bitmap=bitmap: (bitmap[rows >> 3] >> (7 - (rows & 7)).astype('uint8')) & 1 == 1
+                yield count, rows, lambda bitmap=bitmap: bitmap, test
+            elif column in self.sorted:
+                low, high = selection
+                start, stop = self._span(column, low, high)
+                rows = lambda order=self.order[column], start=start, stop=stop: np.sort(order[start:stop]).astype('int64')
+                # NaN compares false, so missing values never match
+                test = lambda rows, values=self.values[column], low=low, high=high: (
+                    (values[rows] >= (-np.inf if low is None else low)) & (values[rows] <= (np.inf if high is None else high)))
+                yield stop - start, rows, lambda column=column, start=start, stop=stop: self._range_bitmap(column, start, stop), test
+            else:
+                raise KeyError(f"No index on column: {column}")
+
+    def query(self, filters):
+        """Row ids (ascending) of the merchants matching every filter"""
+        terms = sorted(self._terms(filters or {}), key=lambda term: term[0])
+        if not terms:
+            return np.arange(self.num_rows)
+
+        count, rows, _, _ = terms[0]
+        if count <= self.num_rows // SPARSE_FRACTION:
+            # Few candidates: take them from the most selective filter and test them against the rest
+            rows = rows()
+            for _, _, _, test in terms[1:]:
+                if not len(rows):
+                    break
+                rows = rows[test(rows)]
+            return rows
+
+        # Many: intersect whole bitmaps, a byte per eight merchants
+        bitmap = terms[0][2]()
+        for _, _, term_bitmap, _ in terms[1:]:
+            bitmap = bitmap & term_bitmap()
+        return np.flatnonzero(np.unpackbits(bitmap, count=self.num_rows).view(bool))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the merchant index and time a filter query")
+    parser.add_argument('source', nargs='?', default=MERCHANT_DATASET)
+    parser.add_argument('--region', action='append', help="keep only these regions (repeatable)")
+    parser.add_argument('--size', action='append', help="keep only these merchant sizes (repeatable)")
+    parser.add_argument('--range', nargs=3, action='append', metavar=('COLUMN', 'LOW', 'HIGH'), default=[],
+                        help="keep values in [LOW, HIGH] ('-' for no bound; repeatable)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    index = MerchantIndex.build(MerchantSnapshot.open(args.source))
+    built = time.perf_counter() - start
+
+    filters = {}
+    if args.region:
+        filters['estimated_region'] = args.region
+    if args.size:
+        filters['merchant_size'] = args.size
+    for column, low, high in args.range:
+        filters[column] = tuple(None if bound == '-' else float(bound) for bound in (low, high))
+
+    start = time.perf_counter()
+    rows = index.query(filters)
+    print(f"Indexed {index.num_rows:,} merchants in {built:.2f}s; "
+          f"{len(rows):,} match in {(time.perf_counter() - start) * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,452 @@
+"""
+Transfer Ingest
+Async, checkpointed download of TRON USDT transfers from the Bitquery API
+
+The requested period is cut into time windows of WINDOW_SECONDS. Up to
+`concurrency` windows are fetched at once over one pool of keep-alive HTTP
+connections, each window page by page (offset pagination, PAGE_SIZE
+transfers a page). Requests are paced by a client-side rate limit, and
+failed requests (connection errors, timeouts, 429 and 5xx responses) are
+retried with exponential backoff and jitter; a 429 holds every request back
+for its Retry-After.
+
+Pages are never written to disk: each one is normalized (and cleared of
+transfers involving --exclude addresses, see tracker.exclusions) while the
+next is downloading, and the transfers of finished windows are folded into the
+run's AggregateState (see tracker.state) in chunks of up to CHUNK_SIZE, as
+tracker.state folds the chunks of a transfer log. Every checkpoint_windows
+finished windows, a checkpoint saves that state and the list of finished
+windows in the checkpoint directory. A killed run started again with the same arguments
+loads the checkpoint and fetches only the windows it had not finished;
+windows in flight at the kill are fetched again from their first page, so
+no transfer is counted twice.
+
+Once every window is in, the merchant table is classified and flagged from
+the state as tracker.state init does, and the state is saved to --state-dir, so later
+days can be folded in with `python -m tracker.state apply`.
+
+tracker.mockapi serves synthetic transfers in the same format for offline
+runs (see benchmarks/ingest.py).
+
+Usage:
+    BITQUERY_TOKEN=... python -m tracker.ingest 2025-06-03 2025-06-10
+    python -m tracker.ingest 2025-06-03 2025-06-04 --endpoint http://127.0.0.1:8765/graphql
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import time
+from datetime import datetime, timezone
+
+import aiohttp
+import pandas as pd
+
+from tracker.dataset import MERCHANT_DATASET, write_merchants
+from tracker.exclusions import EXCLUSION_SETTINGS, ExclusionList, exclude, exclusion_counters, exclusion_report
+from tracker.graph import GRAPH_PATH, graph_report, merchant_graph
+from tracker.identify import CHUNK_SIZE, normalize_transfers, print_report
+from tracker.state import CUSTOMER_SKETCH, STATE_DIR, AggregateState, classify
+
+BITQUERY_ENDPOINT = 'https://streaming.bitquery.io/graphql'
+USDT_CONTRACT = 'TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t'
+
+TRANSFERS_QUERY = """
+query ($token: String, $since: DateTime, $till: DateTime, $limit: Int, $offset: Int) {
+  Tron {
+    Transfers(
+      where: {Transfer: {Currency: {SmartContract: {is: $token}}},
+              Block: {Time: {since: $since, till: $till}}}
+      limit: {count: $limit, offset: $offset}
+      orderBy: {ascending: Block_Time}
+    ) {
+      Block { Time }
+      Transfer { Sender Receiver Amount }
+    }
+  }
+}
+"""
+
+CHECKPOINT_DIR = 'output/ingest'
+WINDOW_SECONDS = 3600
+PAGE_SIZE = 10_000
+
+# Connection, pacing and checkpoint settings
+INGEST_SETTINGS = {
+    'concurrency': 8,              # windows fetched at once
+    'connections': 8,              # pooled keep-alive HTTP connections
+    'requests_per_second': 10.0,   # client-side pacing (0 = unpaced)
+    'retries': 6,                  # attempts after the first, per request
+    'backoff_seconds': 0.5,        # first retry delay, doubled per attempt
+    'max_backoff_seconds': 30.0,
+    'timeout_seconds': 120.0,      # per request
+    'checkpoint_windows': 24,      # finished windows merged and saved per checkpoint
+}
+
+
+def parse_time(text):
+    """Unix seconds of a date or ISO time (UTC unless it says otherwise)"""
+    moment = pd.Timestamp(text)
+    if moment.tzinfo is None:
+        moment = moment.tz_localize('UTC')
+    return int(moment.timestamp())
+
+
+def iso_time(seconds):
+    return datetime.fromtimestamp(seconds, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def time_windows(start, end, window_seconds=WINDOW_SECONDS):
+    """(since, till) unix seconds covering [start, end), `till` exclusive"""
+    return [(since, min(since + window_seconds, end)) for since in range(start, end, window_seconds)]
+
+
+def page_transfers(rows):
+    """Normalized transfers (see tracker.identify) of one page of API results"""
+    return normalize_transfers(pd.DataFrame({
+        'timestamp': [row['Block']['Time'] for row in rows],
+        'sender': [row['Transfer']['Sender'] for row in rows],
+        'receiver': [row['Transfer']['Receiver'] for row in rows],
+        'amount': pd.to_numeric(pd.Series([row['Transfer']['Amount'] for row in rows], dtype=object)),
+    }))
+
+
+def _retry_after(headers, default):
+    try:
+        return max(float(headers.get('Retry-After', default)), 0.0)
+    except ValueError:
+        return default
+
+
+class RateLimiter:
+    """Spaces requests 1/rate seconds apart; pause() holds every request back (after a 429)"""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0.0
+        self.next_slot = 0.0
+        self.paused_until = 0.0
+
+    async def wait(self):
+        now = time.monotonic()
+        slot = max(now, self.next_slot, self.paused_until)
+        self.next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class Checkpoint:
+    """Finished windows and the state they add up to, saved in a directory
+
+    progress.json names the run, its finished windows and the state-NNNNNN
+    directory holding their state. A new checkpoint writes a new state
+    directory first and then replaces progress.json in one step, so a run
+    killed at any point leaves the previous checkpoint intact.
+    """
+
+    def __init__(self, directory, run):
+        self.directory = directory
+        self.run = run
+        self.finished = []
+        self.generation = 0
+        self.totals = {'pages': 0, 'transfers': 0, **exclusion_counters()}
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, 'progress.json')
+
+    def _state_dir(self, generation):
+        return os.path.join(self.directory, f'state-{generation:06d}')
+
+    def load(self, approximate=None):
+        """Saved state (or an empty one) - also picks up the finished windows"""
+        if not os.path.exists(self.path):
+            return AggregateState.empty(approximate)
+        with open(self.path) as f:
+            progress = json.load(f)
+        if progress['run'] != self.run:
+            raise ValueError(f"Checkpoint in {self.directory} is for another run ({progress['run']}); "
+                             "use --fresh or another --checkpoint-dir")
+        self.finished = progress['finished']
+        self.generation = progress['generation']
+        self.totals = dict(self.totals, **progress['totals'])
+        state, _ = AggregateState.load(self._state_dir(self.generation))
+        return state
+
+    def save(self, state, finished, totals):
+        os.makedirs(self.directory, exist_ok=True)
+        generation = self.generation + 1
+        shutil.rmtree(self._state_dir(generation), ignore_errors=True)
+        state.save(self._state_dir(generation))
+
+        partial = f'{self.path}.{os.getpid()}.tmp'
+        with open(partial, 'w') as f:
+            json.dump({'run': self.run, 'generation': generation, 'totals': totals,
+                       'finished': sorted(finished)}, f)
+        os.replace(partial, self.path)
+
+        # Earlier states, and any left half-written by a killed run
+        for name in os.listdir(self.directory):
+            if name.startswith('state-') and name != os.path.basename(self._state_dir(generation)):
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+        self.generation, self.finished, self.totals = generation, sorted(finished), dict(totals)
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class TransferIngest:
+    """One ingest run: windows fetched concurrently, their transfers folded into one state"""
+
+    def __init__(self, start, end, endpoint=BITQUERY_ENDPOINT, token=None, checkpoint_dir=CHECKPOINT_DIR,
+                 window_seconds=WINDOW_SECONDS, page_size=PAGE_SIZE, chunksize=CHUNK_SIZE, settings=None,
+                 approximate=None, exclusions=None):
+        self.endpoint = endpoint
+        self.token = token
+        self.page_size = page_size
+        self.chunksize = chunksize
+        self.settings = dict(INGEST_SETTINGS, **(settings or {}))
+        self.approximate = approximate
+        self.exclusions = exclusions
+        self.windows = time_windows(start, end, window_seconds)
+        run = {'endpoint': endpoint, 'token': USDT_CONTRACT, 'start': start, 'end': end,
+               'window_seconds': window_seconds}
+        if exclusions is not None:
+            # A resumed run must drop the same addresses
+            run['exclusions'] = exclusions.fingerprint()
+        self.checkpoint = Checkpoint(checkpoint_dir, run)
+        # Finished windows already folded into self.state, not yet in a checkpoint
+        self.unsaved = []
+        self.counters = {'pages': 0, 'transfers': 0, 'retried_requests': 0, 'rate_limited': 0}
+
+    async def _post(self, session, limiter, variables):
+        """Rows of one page, retrying failed requests"""
+        settings = self.settings
+        body = {'query': TRANSFERS_QUERY, 'variables': variables}
+        failure = None
+        for attempt in range(settings['retries'] + 1):
+            if attempt:
+                self.counters['retried_requests'] += 1
+            await limiter.wait()
+            delay = min(settings['backoff_seconds'] * 2 ** attempt, settings['max_backoff_seconds'])
+            delay *= random.uniform(0.5, 1.0)
+            try:
+                async with session.post(self.endpoint, json=body) as response:
+                    if response.status == 200:
+                        payload = await response.json(content_type=None)
+                        if payload.get('errors'):
+                            raise RuntimeError(f"Query failed: {payload['errors']}")
+                        return payload['data']['Tron']['Transfers']
+                    failure = f"HTTP {response.status}: {(await response.text())[:200]}"
+                    if response.status == 429:
+                        self.counters['rate_limited'] += 1
+                        limiter.pause(_retry_after(response.headers, delay))
+                        continue
+                    if response.status < 500:
+                        raise RuntimeError(f"Request for {variables} failed with {failure}")
+            except (aiohttp.ClientError, asyncio.TimeoutError, json.JSONDecodeError) as error:
+                failure = repr(error)
+            await asyncio.sleep(delay)
+        raise RuntimeError(f"Request for {variables} failed after {settings['retries'] + 1} attempts: {failure}")
+
+    def _page(self, rows, excluded):
+        return exclude(page_transfers(rows), self.exclusions, excluded)
+
+    async def _window(self, session, limiter, since, till):
+        """Normalized transfers of one window, page by page; each page is normalized while the next downloads
+
+        Returns (pages, transfers fetched, exclusion counters).
+        """
+        pages, offset, normalizing = [], 0, None
+        excluded = exclusion_counters()
+        while True:
+            # `till` is inclusive in the API, so a window ends a second before the next one starts
+            rows = await self._post(session, limiter, {
+                'token': USDT_CONTRACT, 'since': iso_time(since), 'till': iso_time(till - 1),
+                'limit': self.page_size, 'offset': offset,
+            })
+            if normalizing is not None:
+                pages.append(await normalizing)
+            normalizing = asyncio.create_task(asyncio.to_thread(self._page, rows, excluded))
+            self.counters['pages'] += 1
+            self.counters['transfers'] += len(rows)
+            offset += len(rows)
+            if len(rows) < self.page_size:
+                pages.append(await normalizing)
+                return pages, offset, excluded
+
+    def _fold(self, pages):
+        """Fold buffered pages into the state, as one chunk"""
+        pages = [page for page in pages if len(page)]
+        if pages:
+            transfers = pd.concat(pages, ignore_index=True)
+            self.state = self.state.merge(AggregateState.from_transfers(transfers, self.approximate))
+
+    async def _finish(self, lock, pending, force=False):
+        """Fold finished windows into the state once they add up to chunksize transfers,
+        and save a checkpoint every checkpoint_windows windows"""
+        async with lock:
+            windows = len(self.unsaved) + len(pending)
+            save = windows and (force or windows >= self.settings['checkpoint_windows'])
+            if not save and sum(window['transfers'] for window, _ in pending) < self.chunksize:
+                return
+            taken = pending[:]
+            del pending[:]
+            await asyncio.to_thread(self._fold, [page for _, pages in taken for page in pages])
+            self.unsaved.extend(window for window, _ in taken)
+            if not save:
+                return
+
+            saved, self.unsaved = self.unsaved, []
+            totals = {key: self.checkpoint.totals[key] + sum(window[key] for window in saved)
+                      for key in self.checkpoint.totals}
+            finished = self.checkpoint.finished + [window['since'] for window in saved]
+            await asyncio.to_thread(self.checkpoint.save, self.state, finished, totals)
+            elapsed = time.perf_counter() - self.started
+            print(f"Checkpoint: {len(finished):,}/{len(self.windows):,} windows, "
+                  f"{self.counters['transfers']:,} transfers ({self.counters['transfers'] / elapsed:,.0f}/s)",
+                  flush=True)
+
+    async def run(self):
+        """Fetch every unfinished window; returns the state of the whole period"""
+        self.started = time.perf_counter()
+        self.state = await asyncio.to_thread(self.checkpoint.load, self.approximate)
+        # A resumed run keeps the customer tracking of its checkpoint
+        self.approximate = self.state.approximate
+        finished = set(self.checkpoint.finished)
+        queue = asyncio.Queue()
+        for since, till in self.windows:
+            if since not in finished:
+                queue.put_nowait((since, till))
+        self.resumed = len(finished)
+
+        lock = asyncio.Lock()
+        # (window, its normalized pages) of finished windows not yet folded in
+        pending = []
+        limiter = RateLimiter(self.settings['requests_per_second'])
+        connector = aiohttp.TCPConnector(limit=self.settings['connections'])
+        timeout = aiohttp.ClientTimeout(total=self.settings['timeout_seconds'])
+        headers = {'Authorization': f'Bearer {self.token}'} if self.token else {}
+
+        async def worker(session):
+            while not queue.empty():
+                since, till = queue.get_nowait()
+                pages, transfers, excluded = await self._window(session, limiter, since, till)
+                pending.append(({'since': since, 'pages': len(pages), 'transfers': transfers, **excluded}, pages))
+                await self._finish(lock, pending)
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers) as session:
+            try:
+                async with asyncio.TaskGroup() as group:
+                    for _ in range(min(self.settings['concurrency'], queue.qsize())):
+                        group.create_task(worker(session))
+            except ExceptionGroup as failed:
+                raise failed.exceptions[0]
+            finally:
+                # Keep what finished, even when a window failed for good
+                await self._finish(lock, pending, force=True)
+        return self.state
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            'windows': len(self.windows),
+            'resumed_windows': self.resumed,
+            'pages': self.counters['pages'],
+            'transfers': self.counters['transfers'],
+            'retried_requests': self.counters['retried_requests'],
+            'rate_limited': self.counters['rate_limited'],
+            'elapsed_seconds': round(elapsed, 1),
+            'transfers_per_second': int(self.counters['transfers'] / elapsed) if elapsed else 0,
+        }
+
+
+def ingest_transfers(start, end, endpoint=BITQUERY_ENDPOINT, token=None, checkpoint_dir=CHECKPOINT_DIR,
+                     state_dir=STATE_DIR, merchants_path=MERCHANT_DATASET, window_seconds=WINDOW_SECONDS,
+                     page_size=PAGE_SIZE, chunksize=CHUNK_SIZE, settings=None, approximate=None, fresh=False,
+                     graph_path=GRAPH_PATH, exclusions=None):
+    """Ingest [start, end) (unix seconds), save its state and write the merchant table
+
+    Resumes from checkpoint_dir unless fresh. Returns (merchants, report).
+    """
+    ingest = TransferIngest(start, end, endpoint, token, checkpoint_dir, window_seconds, page_size, chunksize,
+                            settings, approximate, exclusions)
+    if fresh:
+        ingest.checkpoint.clear()
+    state = asyncio.run(ingest.run())
+    merchants, graph = merchant_graph(classify(state), state.customers.pairs())
+
+    state.save(state_dir, manifest={'sources': [f'bitquery:{iso_time(start)}..{iso_time(end)}']})
+    write_merchants(merchants, merchants_path)
+    if graph_path:
+        graph.save(graph_path)
+
+    report = ingest.report()
+    report['total_transfers'] = ingest.checkpoint.totals['transfers']
+    report.update(exclusion_report(exclusions, {key: ingest.checkpoint.totals[key] for key in exclusion_counters()}))
+    report['receiving_addresses'] = len(state.receivers)
+    report['merchants'] = len(merchants)
+    report.update(graph_report(graph))
+    return merchants, report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest TRON USDT transfers from the Bitquery API")
+    parser.add_argument('start', help="first day or time to ingest (UTC)")
+    parser.add_argument('end', help="day or time to stop before (UTC)")
+    parser.add_argument('--endpoint', default=BITQUERY_ENDPOINT)
+    parser.add_argument('--token', default=os.environ.get('BITQUERY_TOKEN'),
+                        help="API token (default: $BITQUERY_TOKEN)")
+    parser.add_argument('--checkpoint-dir', default=CHECKPOINT_DIR)
+    parser.add_argument('--fresh', action='store_true', help="discard any checkpoint and start over")
+    parser.add_argument('--state-dir', default=STATE_DIR)
+    parser.add_argument('-o', '--output', default=MERCHANT_DATASET,
+                        help="Merchant table to write (.parquet, or .csv)")
+    parser.add_argument('--csv', help="Also export the merchant table as CSV here")
+    parser.add_argument('--graph', default=GRAPH_PATH,
+                        help="Where to save the merchant-customer graph ('' to skip)")
+    parser.add_argument('--window', type=int, default=WINDOW_SECONDS, help="seconds of transfers per window")
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE)
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE, help="transfers folded into the state at once")
+    parser.add_argument('--concurrency', type=int, default=INGEST_SETTINGS['concurrency'])
+    parser.add_argument('--connections', type=int, default=INGEST_SETTINGS['connections'])
+    parser.add_argument('--rate', type=float, default=INGEST_SETTINGS['requests_per_second'],
+                        help="requests per second (0 = unpaced)")
+    parser.add_argument('--checkpoint-windows', type=int, default=INGEST_SETTINGS['checkpoint_windows'])
+    parser.add_argument('--approximate', action='store_true', help="track customers with sketches")
+    parser.add_argument('--exclude', action='append', default=[],
+                        help="Address denylist (.txt or .csv), or a directory of them; repeatable")
+    parser.add_argument('--false-positive-rate', type=float, default=EXCLUSION_SETTINGS['false_positive_rate'],
+                        help="Share of unlisted addresses a large (Bloom-filtered) denylist may exclude")
+    args = parser.parse_args(argv)
+
+    exclusions = None
+    if args.exclude:
+        exclusions = ExclusionList.load(args.exclude, {'false_positive_rate': args.false_positive_rate})
+
+    settings = {
+        'concurrency': args.concurrency,
+        'connections': args.connections,
+        'requests_per_second': args.rate,
+        'checkpoint_windows': args.checkpoint_windows,
+    }
+    merchants, report = ingest_transfers(
+        parse_time(args.start), parse_time(args.end), endpoint=args.endpoint, token=args.token,
+        checkpoint_dir=args.checkpoint_dir, state_dir=args.state_dir, merchants_path=args.output,
+        window_seconds=args.window, page_size=args.page_size, chunksize=args.chunksize, settings=settings,
+        approximate=dict(CUSTOMER_SKETCH) if args.approximate else None, fresh=args.fresh, graph_path=args.graph,
+        exclusions=exclusions,
+    )
+    if args.csv:
+        write_merchants(merchants, args.csv)
+    print_report(report)
+    print(f"Wrote {len(merchants):,} merchants to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
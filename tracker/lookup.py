@@ -0,0 +1,212 @@
+"""
+Address Lookup
+Exact and prefix search over merchant addresses
+
+AddressLookup answers "is this address a merchant?" and type-ahead
+searches over one version of the merchant table:
+
+- exact: an open-addressing hash table of row ids, keyed by a hash of the
+  stored address (its 21-byte payload, or the text of legacy addresses)
+  and built in vectorized probing rounds. A lookup decodes the typed
+  address, probes a few slots and compares the stored bytes of their rows.
+- prefix: the first PREFIX_CHARS characters of every address, lowercased
+  and packed big-endian into a uint64 (so the numbers sort like the text),
+  sorted with their row ids. A prefix of up to PREFIX_CHARS characters is
+  one binary-search range; a longer one narrows that range by its full text.
+
+Whole addresses match exactly (Base58 is case sensitive); prefixes match in
+any case, as people type them. Address strings for the prefix index are
+read from the dataset rather than re-encoded from millions of payloads.
+
+Usage:
+    python -m tracker.lookup TDyJ
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from tracker.addresses import PAYLOAD_BYTES, decode_address, decode_addresses, encode_address, encode_addresses
+from tracker.dataset import MERCHANT_DATASET, read_merchants
+from tracker.shared import MerchantSnapshot
+
+PREFIX_CHARS = 8
+SUGGESTION_LIMIT = 10
+# Rows of the dataset's address strings checked against the shared table before they are used
+ALIGNMENT_SAMPLE = 64
+
+_FNV_OFFSET = np.uint64(0xCBF29CE484222325)
+_FNV_PRIME = np.uint64(0x100000001B3)
+
+
+def _byte_matrix(column):
+    """(N, width) uint8 matrix of an address column (a view for fixed-width binary)"""
+    array = column.combine_chunks() if isinstance(column, pa.ChunkedArray) else column
+    if pa.types.is_fixed_size_binary(array.type):
+        width = array.type.byte_width
+        data = np.frombuffer(array.buffers()[1], dtype='uint8')
+        return data[array.offset * width:(array.offset + len(array)) * width].reshape(len(array), width)
+    values = np.array(pc.cast(array, pa.binary()).to_pylist(), dtype=bytes)
+    return values.view('uint8').reshape(len(values), values.dtype.itemsize)
+
+
+def _hashes(matrix):
+    """FNV-1a hash of each row's bytes, folded so the low bits mix all of it"""
+    hashes = np.full(len(matrix), _FNV_OFFSET, dtype='uint64')
+    for column in range(matrix.shape[1]):
+        hashes ^= matrix[:, column]
+        hashes *= _FNV_PRIME
+    return hashes ^ (hashes >> np.uint64(32))
+
+
+def _hash_slots(hashes):
+    """Linear-probing table of row ids (-1 empty), at most two thirds full
+
+    Every row still looking for a slot probes at once; among rows probing
+    the same free slot the first takes it and the rest move one slot on.
+    """
+    size = 1 << max((len(hashes) * 3 // 2).bit_length(), 4)
+    slots = np.full(size, -1, dtype='int32' if len(hashes) < 2**31 else 'int64')
+    pending = np.arange(len(hashes))
+    positions = (hashes & np.uint64(size - 1)).astype('int64')
+    while len(pending):
+        free = np.flatnonzero(slots[positions] == -1)
+        _, first = np.unique(positions[free], return_index=True)
+        taken = free[first]
+        slots[positions[taken]] = pending[taken]
+        waiting = np.ones(len(pending), dtype=bool)
+        waiting[taken] = False
+        pending, positions = pending[waiting], (positions[waiting] + 1) & (size - 1)
+    return slots
+
+
+def _prefix_keys(addresses):
+    """First PREFIX_CHARS characters of each address, lowercased, as big-endian uint64"""
+    prefixes = pc.utf8_lower(pc.utf8_slice_codeunits(addresses, 0, PREFIX_CHARS))
+    padded = pc.utf8_rpad(prefixes, PREFIX_CHARS, padding='\0')
+    matrix = _byte_matrix(pc.cast(pc.cast(padded, pa.binary()), pa.binary(PREFIX_CHARS)))
+    return matrix.copy().view('>u8').ravel().astype('uint64')
+
+
+def _prefix_range(prefix):
+    """Smallest and largest prefix key starting with `prefix` (at most PREFIX_CHARS characters)"""
+    text = prefix.lower().encode()[:PREFIX_CHARS]
+    low = text.ljust(PREFIX_CHARS, b'\0')
+    high = text.ljust(PREFIX_CHARS, b'\xff')
+    return np.frombuffer(low, dtype='>u8')[0], np.frombuffer(high, dtype='>u8')[0]
+
+
+class AddressLookup:
+    """Exact and prefix indexes over the addresses of one merchant table"""
+
+    def __init__(self, stored, addresses):
+        # stored: (N, width) bytes of the table's address column; addresses: their strings
+        self.stored = stored
+        self.payloads = stored.shape[1] == PAYLOAD_BYTES
+        self.slots = _hash_slots(_hashes(stored))
+        keys = _prefix_keys(addresses)
+        self.order = np.argsort(keys, kind='stable').astype(self.slots.dtype)
+        self.keys = keys[self.order]
+
+    @classmethod
+    def build(cls, snapshot, source=None):
+        """Lookup for a snapshot; `source` (its dataset) supplies the address strings"""
+        column = snapshot.table.column('address')
+        stored = _byte_matrix(column)
+        if stored.shape[1] != PAYLOAD_BYTES:
+            return cls(stored, pc.cast(pc.cast(column, pa.binary()), pa.string()))
+
+        addresses = None
+        if source is not None:
+            addresses = pa.array(read_merchants(source, ['address'])['address'], pa.string())
+            sample = np.linspace(0, len(stored) - 1, min(ALIGNMENT_SAMPLE, len(stored))).astype('int64')
+            payloads, valid = decode_addresses(addresses.take(sample).to_pylist())
+            if len(addresses) != len(stored) or not (valid.all() and np.array_equal(payloads, stored[sample])):
+                # Another version of the source: encode this snapshot's own payloads
+                addresses = None
+        if addresses is None:
+            addresses = pa.array(encode_addresses(stored), pa.string())
+        return cls(stored, addresses)
+
+    def __len__(self):
+        return len(self.stored)
+
+    def _stored_form(self, address):
+        """An address as the table stores it, or None if it cannot be a stored address"""
+        address = address.strip()
+        if self.payloads:
+            return decode_address(address)
+        data = address.encode()
+        if len(data) > self.stored.shape[1]:
+            return None
+        return np.frombuffer(data.ljust(self.stored.shape[1], b'\0'), dtype='uint8')
+
+    def find(self, address):
+        """Row of a merchant address, or None"""
+        stored = self._stored_form(address)
+        if stored is None:
+            return None
+        mask = len(self.slots) - 1
+        position = int(_hashes(stored[None, :])[0]) & mask
+        while (row := self.slots[position]) != -1:
+            if np.array_equal(self.stored[row], stored):
+                return int(row)
+            position = (position + 1) & mask
+        return None
+
+    def addresses(self, rows):
+        """Address strings of some rows"""
+        stored = self.stored[np.asarray(rows, dtype='int64')]
+        if self.payloads:
+            # A handful (suggestions, one drill-down) is cheaper one at a time
+            return [encode_address(row) for row in stored] if len(stored) <= 64 else list(encode_addresses(stored))
+        return [bytes(row).rstrip(b'\0').decode() for row in stored]
+
+    def prefix(self, prefix, limit=SUGGESTION_LIMIT):
+        """Rows of up to `limit` addresses starting with `prefix` (any case), in address order"""
+        prefix = prefix.strip()
+        if not prefix:
+            return []
+        low, high = _prefix_range(prefix)
+        start = np.searchsorted(self.keys, low, side='left')
+        stop = np.searchsorted(self.keys, high, side='right')
+        if len(prefix) <= PREFIX_CHARS:
+            return self.order[start:min(stop, start + limit)].tolist()
+
+        # Longer prefixes: check the full text of the rows sharing the first PREFIX_CHARS characters
+        rows, wanted = [], prefix.lower()
+        for begin in range(start, stop, 4 * limit):
+            candidates = self.order[begin:min(stop, begin + 4 * limit)]
+            rows.extend(int(row) for row, address in zip(candidates, self.addresses(candidates))
+                        if address.lower().startswith(wanted))
+            if len(rows) >= limit:
+                break
+        return rows[:limit]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Look up merchant addresses by full address or prefix")
+    parser.add_argument('query', help="a full address, or its first characters")
+    parser.add_argument('--source', default=MERCHANT_DATASET)
+    parser.add_argument('--limit', type=int, default=SUGGESTION_LIMIT)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    lookup = AddressLookup.build(MerchantSnapshot.open(args.source), args.source)
+    built = time.perf_counter() - start
+
+    start = time.perf_counter()
+    row = lookup.find(args.query)
+    rows = [row] if row is not None else lookup.prefix(args.query, args.limit)
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"Indexed {len(lookup):,} addresses in {built:.2f}s; "
+          f"{'exact match' if row is not None else f'{len(rows)} prefix matches'} in {elapsed:.2f} ms")
+    for row, address in zip(rows, lookup.addresses(rows)):
+        print(f"  {row:>10}  {address}")
+
+
+if __name__ == '__main__':
+    main()
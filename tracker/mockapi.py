@@ -0,0 +1,214 @@
+"""
+Mock Bitquery API
+Local stand-in for the Bitquery GraphQL endpoint, serving synthetic TRON USDT transfers
+
+Answers the transfers query of tracker.ingest (only its variables are read:
+since, till, limit, offset) with a synthetic but fixed stream of transfers.
+Each minute's transfers come from a generator seeded with (seed, minute),
+so every window and page layout sees exactly the same transfers. A
+population of merchants receives customer payments, mostly during local
+business hours in their own time zone, among peer-to-peer transfers, so
+ingested data yields merchants in every region.
+
+Rate limiting (429 with Retry-After), random 503 responses and added
+latency can be switched on to exercise the ingester's retries.
+
+Usage:
+    python -m tracker.mockapi --port 8765
+    python -m tracker.mockapi --port 8765 --rate-limit 20 --error-rate 0.05 --latency 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+
+import numpy as np
+from aiohttp import web
+
+from tracker.addresses import ADDRESS_PREFIX, PAYLOAD_BYTES, encode_addresses
+
+# Shape of the synthetic network
+MOCK_NETWORK = {
+    'merchants': 3_000,
+    'customers': 200_000,
+    'transfers_per_minute': 2_000,
+    'merchant_share': 0.3,           # fraction of transfers that pay a merchant
+    'off_hours_weight': 0.05,        # merchant traffic outside 9AM-5PM local, relative to business hours
+}
+# Merchant time zones (UTC offsets) and their weights
+MOCK_OFFSETS = {-5: 0.2, -3: 0.1, 0: 0.1, 1: 0.15, 3: 0.1, 5.5: 0.1, 8: 0.15, 9: 0.1}
+MAX_PAGE_SIZE = 25_000
+
+
+def parse_time(text):
+    """Unix seconds of an ISO time (UTC unless it says otherwise)"""
+    moment = datetime.fromisoformat(text)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+
+class SyntheticTransfers:
+    """Deterministic synthetic transfer stream over a fixed address population"""
+
+    def __init__(self, seed=0, network=None):
+        self.seed = seed
+        self.network = dict(MOCK_NETWORK, **(network or {}))
+        merchants, customers = self.network['merchants'], self.network['customers']
+
+        rng = np.random.default_rng([seed, 2**32])
+        payloads = rng.integers(0, 256, (customers + merchants, PAYLOAD_BYTES), dtype='uint8')
+        payloads[:, 0] = ADDRESS_PREFIX
+        self.addresses = encode_addresses(payloads).astype(object)
+
+        # Heavy-tailed customer activity, so many customers come back
+        self.customer_cdf = np.cumsum(rng.pareto(1.5, customers) + 1)
+
+        # Merchant popularity by rank, shaped per UTC hour by the merchant's business hours
+        popularity = 1 / np.arange(1, merchants + 1) ** 1.1
+        offsets = rng.choice(list(MOCK_OFFSETS), size=merchants, p=list(MOCK_OFFSETS.values()))
+        local = (np.arange(24)[:, None] + offsets[None, :]) % 24
+        weights = np.where((local >= 9) & (local < 17), 1.0, self.network['off_hours_weight']) * popularity
+        self.merchant_cdf = np.cumsum(weights, axis=1)
+
+    @lru_cache(maxsize=None)
+    def count(self, minute):
+        """Transfers in one minute"""
+        return int(np.random.default_rng([self.seed, minute, 0]).poisson(self.network['transfers_per_minute']))
+
+    @lru_cache(maxsize=512)
+    def minute(self, minute):
+        """(seconds, sender ids, receiver ids, amounts) of one minute's transfers, in time order"""
+        rng = np.random.default_rng([self.seed, minute, 1])
+        count = self.count(minute)
+        customers = self.network['customers']
+
+        seconds = minute * 60 + np.sort(rng.integers(0, 60, count))
+        senders = np.searchsorted(self.customer_cdf, rng.random(count) * self.customer_cdf[-1])
+
+        paying = rng.random(count) < self.network['merchant_share']
+        receivers = rng.integers(0, customers, count)
+        cdf = self.merchant_cdf[(minute // 60) % 24]
+        receivers[paying] = customers + np.searchsorted(cdf, rng.random(int(paying.sum())) * cdf[-1])
+
+        amounts = np.where(paying, rng.lognormal(3, 0.8, count), rng.lognormal(4.5, 1.5, count))
+        return seconds, senders, receivers, np.round(amounts, 2).clip(0.01)
+
+    def _rows(self, minute, since, till):
+        seconds, senders, receivers, amounts = self.minute(minute)
+        keep = (seconds >= since) & (seconds <= till)
+        return seconds[keep], senders[keep], receivers[keep], amounts[keep]
+
+    def page(self, since, till, offset, limit):
+        """Transfers `offset` to `offset + limit` of those in [since, till] (inclusive seconds), in API format"""
+        minutes = np.arange(since // 60, till // 60 + 1)
+        counts = np.array([self.count(int(minute)) for minute in minutes], dtype='int64')
+        # Edge minutes may be cut by the window
+        for i in {0, len(minutes) - 1}:
+            counts[i] = len(self._rows(int(minutes[i]), since, till)[0])
+        ends = np.cumsum(counts)
+        starts = ends - counts
+
+        picked = np.flatnonzero((ends > offset) & (starts < offset + limit))
+        if not len(picked):
+            return []
+        parts = [self._rows(int(minutes[i]), since, till) for i in picked]
+        skip = offset - int(starts[picked[0]])
+        seconds, senders, receivers, amounts = (np.concatenate(column)[skip:skip + limit] for column in zip(*parts))
+
+        times = np.datetime_as_string(seconds.astype('datetime64[s]'))
+        return [
+            {'Block': {'Time': f'{moment}Z'},
+             'Transfer': {'Sender': sender, 'Receiver': receiver, 'Amount': amount}}
+            for moment, sender, receiver, amount in zip(
+                times, self.addresses[senders], self.addresses[receivers], np.char.mod('%.2f', amounts).tolist())
+        ]
+
+
+class RequestBudget:
+    """Token bucket of requests per second (burst up to one second's worth)"""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+
+    def take(self):
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+def make_app(transfers, rate_limit=0, error_rate=0.0, latency=0.0, seed=0):
+    """aiohttp application serving `transfers` (a SyntheticTransfers) at /graphql"""
+    budget = RequestBudget(rate_limit) if rate_limit else None
+    faults = np.random.default_rng([seed, 2**32 + 1])
+    stats = {'requests': 0, 'rate_limited': 0, 'failed': 0, 'transfers': 0}
+
+    async def graphql(request):
+        stats['requests'] += 1
+        if latency:
+            await asyncio.sleep(latency)
+        if budget is not None and not budget.take():
+            stats['rate_limited'] += 1
+            return web.json_response({'errors': [{'message': "Rate limit exceeded"}]}, status=429,
+                                     headers={'Retry-After': '1'})
+        if error_rate and faults.random() < error_rate:
+            stats['failed'] += 1
+            return web.json_response({'errors': [{'message': "Service unavailable"}]}, status=503)
+
+        variables = (await request.json()).get('variables') or {}
+        try:
+            since, till = parse_time(variables['since']), parse_time(variables['till'])
+            limit = min(int(variables.get('limit', MAX_PAGE_SIZE)), MAX_PAGE_SIZE)
+            offset = int(variables.get('offset', 0))
+        except (KeyError, TypeError, ValueError) as error:
+            return web.json_response({'errors': [{'message': f"Bad variables: {error}"}]}, status=400)
+
+        rows = transfers.page(since, till, offset, limit)
+        stats['transfers'] += len(rows)
+        return web.Response(text=json.dumps({'data': {'Tron': {'Transfers': rows}}}),
+                            content_type='application/json')
+
+    async def status(request):
+        return web.json_response(stats)
+
+    app = web.Application()
+    app.router.add_post('/graphql', graphql)
+    app.router.add_get('/stats', status)
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve synthetic TRON USDT transfers in Bitquery's format")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--merchants', type=int, default=MOCK_NETWORK['merchants'])
+    parser.add_argument('--customers', type=int, default=MOCK_NETWORK['customers'])
+    parser.add_argument('--transfers-per-minute', type=int, default=MOCK_NETWORK['transfers_per_minute'])
+    parser.add_argument('--rate-limit', type=float, default=0, help="requests per second before 429s (0 = none)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every response")
+    args = parser.parse_args(argv)
+
+    transfers = SyntheticTransfers(args.seed, {
+        'merchants': args.merchants,
+        'customers': args.customers,
+        'transfers_per_minute': args.transfers_per_minute,
+    })
+    app = make_app(transfers, args.rate_limit, args.error_rate, args.latency, args.seed)
+    web.run_app(app, host=args.host, port=args.port,
+                print=lambda _: print(f"Serving synthetic transfers on http://{args.host}:{args.port}/graphql",
+                                      flush=True))
+
+
+if __name__ == '__main__':
+    main()
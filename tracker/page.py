@@ -0,0 +1,381 @@
+"""
+Dashboard Page Content
+Text, styles and HTML fragments shared by the live dashboard and static exports
+
+app.py and tracker.static render the same page - one through Streamlit, one
+as a standalone HTML file - so everything both show (theme, header, cards,
+section texts, methodology) is kept here once. Only the standard library is
+used, so the dashboard's fast-start mode can import it.
+"""
+
+TITLE = 'Global Crypto Merchant Heatmap'
+SUBTITLE = 'Tracking real-world USDT merchant adoption on TRON blockchain'
+TAB_LABELS = ["Global Heatmap", "Regional Analysis", "Merchant Insights", "How I Collected This Data"]
+
+REGION_COLORS = {
+    'Asia-Pacific': '#00ff88',
+    'Europe-Africa': '#0099ff',
+    'Americas': '#ff6b6b'
+}
+
+# Clean dark theme with IBM Plex Sans font
+THEME_CSS = """
+<style>
+    /* Import IBM Plex Sans */
+    @import url('https://fonts.googleapis.com/css2?family=IBM+Plex+Sans:wght@400;500;600;700&family=IBM+Plex+Mono:wght@400;500&display=swap');
+    
+    /* Dark theme base */
+    .stApp {
+        background: #0a0a0a;
+        color: #e0e0e0;
+        font-family: 'IBM Plex Sans', sans-serif;
+    }
+    
+    /* Headers */
+    h1, h2, h3, h4, h5, h6 {
+        font-family: 'IBM Plex Sans', sans-serif !important;
+        font-weight: 700;
+    }
+    
+    /* Main title styling */
+    .main-title {
+        font-size: 3.5rem;
+        background: linear-gradient(135deg, #00ff88 0%, #0099ff 100%);
+        -webkit-background-clip: text;
+        -webkit-text-fill-color: transparent;
+        text-align: center;
+        margin-bottom: 0.5rem;
+        letter-spacing: -0.03em;
+    }
+    
+    /* Subtitle */
+    .subtitle {
+        text-align: center;
+        color: #666;
+        font-size: 1.1rem;
+        margin-bottom: 1rem;
+    }
+    
+    /* Author credit */
+    .author-credit {
+        position: absolute;
+        top: 40px;
+        right: 20px;
+        font-size: 0.9rem;
+        color: #999;
+        z-index: 9999 !important;
+    }
+    
+    .author-credit a {
+        color: #00ff88;
+        text-decoration: none;
+        margin-left: 1rem;
+        transition: opacity 0.3s ease;
+    }
+    
+    .author-credit a:hover {
+        opacity: 0.8;
+    }
+    
+    /* Methodology box with animated line */
+    .methodology-box {
+        background: rgba(0, 255, 136, 0.05);
+        border: 1px solid rgba(0, 255, 136, 0.2);
+        border-radius: 12px;
+        padding: 1.2rem;
+        margin: 2rem auto;
+        max-width: 900px;
+        position: relative;
+        overflow: hidden;
+    }
+    
+    .methodology-box::before {
+        content: '';
+        position: absolute;
+        top: 0;
+        left: 0;
+        right: 0;
+        height: 2px;
+        background: linear-gradient(90deg, transparent, #00ff88, transparent);
+        animation: slide 3s infinite;
+    }
+    
+    @keyframes slide {
+        0% { transform: translateX(-100%); }
+        100% { transform: translateX(100%); }
+    }
+    
+    /* Metric cards */
+    .metric-card {
+        background: #111111;
+        border: 1px solid #222;
+        border-radius: 12px;
+        padding: 1.5rem;
+        transition: all 0.3s ease;
+        position: relative;
+        overflow: hidden;
+    }
+    
+    .metric-card:hover {
+        border-color: #00ff88;
+        transform: translateY(-2px);
+    }
+    
+    .metric-number {
+        font-family: 'IBM Plex Mono', monospace;
+        font-size: 2.5rem;
+        font-weight: 500;
+        color: #00ff88;
+        line-height: 1;
+    }
+    
+    .metric-label {
+        color: #666;
+        font-size: 0.9rem;
+        text-transform: uppercase;
+        letter-spacing: 0.05em;
+        margin-top: 0.5rem;
+        font-family: 'IBM Plex Sans', sans-serif;
+    }
+    
+    /* Hide Streamlit elements */
+    #MainMenu {visibility: hidden;}
+    footer {visibility: hidden;}
+    header {visibility: hidden;}
+    
+    /* Tabs styling */
+    .stTabs [data-baseweb="tab-list"] {
+        gap: 2rem;
+        background-color: transparent;
+        border-bottom: 1px solid #222;
+    }
+    
+    .stTabs [data-baseweb="tab"] {
+        background-color: transparent;
+        color: #666;
+        border: none;
+        font-weight: 600;
+        font-size: 1.1rem;
+        padding: 1rem 0;
+        font-family: 'IBM Plex Sans', sans-serif;
+    }
+    
+    .stTabs [aria-selected="true"] {
+        background-color: transparent;
+        color: #00ff88;
+        border-bottom: 2px solid #00ff88;
+    }
+    
+    /* All text elements */
+    p, span, div, label {
+        font-family: 'IBM Plex Sans', sans-serif;
+    }
+    
+    /* Chart description */
+    .chart-description {
+        color: #999;
+        font-size: 0.95rem;
+        margin-bottom: 1rem;
+        text-align: left;
+    }
+</style>
+"""
+
+AUTHOR_CREDIT = """
+<div class="author-credit">
+    Analysis by Connor DeFrain
+    <a href="https://x.com/connordefrain_" target="_blank">Twitter</a>
+    <a href="http://www.linkedin.com/in/connor-defrain-5a1404297" target="_blank">LinkedIn</a>
+</div>
+<div style="height: 100px;"></div>
+"""
+
+# Methodology box
+METHODOLOGY_BOX = """
+<div class="methodology-box">
+    <div style="display: flex; align-items: center; gap: 1rem; margin-bottom: 0.5rem;">
+        <div style="width: 12px; height: 12px; background: #00ff88; border-radius: 50%; 
+                    animation: pulse 2s infinite;"></div>
+        <strong style="color: #00ff88; font-size: 1.1rem;">Geographic Estimation Methodology</strong>
+    </div>
+    <p style="margin: 0; color: #999; line-height: 1.6;">
+        Tracking where crypto merchants actually operate show us which markets are adopting USDT for real commerce. I 
+        analyzed specific wallet behavior criteria that indicate real world commerce activity as well as the peak hours for likely 
+        business hours (9AM to 5PM local time) to estimate merchant like patterns. This is an educated approximation based on 
+        behavioral analysis. Country distribution within regions is weighted by known crypto adoption rates from industry 
+        reports.
+    </p>
+</div>
+
+<style>
+@keyframes pulse {
+    0%, 100% { opacity: 1; transform: scale(1); }
+    50% { opacity: 0.8; transform: scale(1.2); }
+}
+</style>
+"""
+
+REGIONS_TITLE = "Regional Distribution"
+RANKING_TITLES = {
+    'top_adoption': "Top Crypto Adoption Countries",
+    'merchant_leaders': "TRON Merchant Leaders",
+}
+METHODOLOGY_TITLE = "Data Collection"
+
+# Title and description of each chart section
+SECTIONS = {
+    'hourly': ("Peak Activity Hours by Region",
+               "Merchant transaction patterns reveal business hours across time zones, confirming geographic estimates."),
+    'payment_sizes': ("Payment Size Distribution",
+                      "Most transactions fall within retail ranges ($20-80), validating the merchant classification methodology."),
+    'customers_transactions': ("Customer Base vs Transaction Activity",
+                               "The logarithmic relationship between customers and transactions demonstrates consistent merchant behavior across all regions."),
+    'activity': ("Merchant Activity Distribution",
+                 "Activity levels show a healthy distribution with most merchants maintaining regular operations."),
+    'customer_graph': ("Merchant-Customer Network",
+                       "Customers paying several merchants link them: payment aggregators, peer-to-peer traders and merchants sharing a customer base stand out from ordinary shops."),
+}
+
+# Graph flags (tracker.graph) as shown on the dashboard
+GRAPH_FLAG_LABELS = {
+    'aggregator': ("Aggregators", "Customer bases far above typical merchants"),
+    'p2p_trader': ("P2P Traders", "Customers are merchants or trading hubs"),
+    'shared_customers': ("Shared Customers", "Merchants in overlapping-customer clusters"),
+}
+
+METHODOLOGY_MARKDOWN = """
+#### Overview
+Real merchants were identified by analyzing 1.1 million active receiving addresses from June 3-10, 2025. I applied behavioral filters based on patterns typical of actual businesses.
+
+#### Merchant Identification Criteria
+To qualify as a merchant, an address needed to meet ALL of the following criteria:
+- Minimum 5 transactions - Excludes one-time or rarely used wallets
+- Minimum 5 unique customers - Ensures actual business activity vs personal transfers
+- $75+ in total volume - Filters out test transactions and micro-payments
+- Average payment size between $1-100 - Typical retail transaction range
+- Maximum 80% customer concentration - Excludes personal wallets receiving from single sources
+
+#### Geographic Estimation
+I analyzed peak transaction hours for each wallet to estimate time zones:
+1. Calculated hourly transaction distribution for each merchant
+2. Identified peak activity hours (when most transactions occurred)
+3. Assumed merchants operate during typical business hours (9 AM - 5 PM local time)
+4. Mapped peak UTC hours to likely time zones and regions
+5. Distributed merchants within regions based on crypto adoption rates from industry reports
+
+#### Merchant-Customer Network
+Every merchant's customers form a merchant-customer graph. Merchants are flagged, not removed, when the graph shows they are not ordinary shops:
+- Aggregators - customer bases far larger than almost every other merchant's (payment processors)
+- P2P traders - customers that are merchants themselves, or hubs paying more than 100 merchants
+- Shared customers - clusters of merchants serving largely the same customers (one operator's wallets)
+
+#### Network Scaling
+With approximately 3 million daily active addresses on TRON as of June 2025, my analysis covered roughly one-third of all transactions. I applied a 2.5x multiplier to estimate total network activity:
+- Analyzed: ~3,400 merchants from 1.1M addresses
+- Estimated Total: ~8,500 USDT merchants on TRON globally
+
+#### Data Sources
+- Blockchain Data: TRON mainnet via Bitquery API
+- Transaction Period: June 3-10, 2025
+- Crypto Adoption Rates: Chainanalysis Global Crypto Adoption Index 2024
+- Analysis Date: June 2025
+
+#### Limitations
+- Currency Scope: Analysis limited to USDT transactions only
+- Geographic Accuracy: Time zone estimation may not reflect actual physical locations for all merchants
+- Temporal Snapshot: Data represents one week in June 2025; adoption patterns evolve rapidly
+- Exchange Exclusion: Methodology filters out centralized exchanges but may include some P2P traders
+- Payment Processors: Some identified "merchants" may be payment aggregators serving multiple businesses
+"""
+
+FOOTER = """
+<div style='text-align: center; color: #666; font-size: 0.9rem; margin-top: 2rem;'>
+    <p>Data represents TRON blockchain USDT merchant transactions</p>
+    <p style='font-size: 0.8rem;'>Geographic estimations are statistical inferences based on transaction patterns</p>
+</div>
+"""
+
+
+def chart_description(text):
+    return f'<p class="chart-description">{text}</p>'
+
+
+def metric_card(number, label, note):
+    return f"""
+    <div class="metric-card">
+        <div class="metric-number">{number}</div>
+        <div class="metric-label">{label}</div>
+        <div style="color: #666; font-size: 0.8rem; margin-top: 0.5rem;">
+            {note}
+        </div>
+    </div>
+    """
+
+
+def header_cards(metrics):
+    """The two key metric cards: merchants identified and emerging-market share"""
+    return [
+        metric_card(f"{metrics['merchant_count']:,}", "Merchants Identified", "Approximately across all regions"),
+        metric_card(f"{metrics['emerging_pct']:.0f}%", "Emerging Markets", "Operating in developing economies"),
+    ]
+
+
+def graph_cards(view):
+    """Metric cards of the merchant-customer graph: merchants per flag, and clusters"""
+    cards = [metric_card(f"{view['flags'][flag]:,}", label, note) for flag, (label, note) in GRAPH_FLAG_LABELS.items()]
+    cards.append(metric_card(f"{view['clusters']:,}", "Clusters", f"Among {view['edges']:,} merchant-customer links"))
+    return cards
+
+
+def cluster_rows(view):
+    """Rows of the largest shared-customer clusters table"""
+    return [{
+        "Cluster": f"#{cluster['cluster'] + 1}",
+        "Merchants": cluster['merchants'],
+        "Shared customers": cluster['shared_customers'],
+        "Payments": cluster['payments'],
+        "Addresses": ', '.join(cluster['addresses']),
+    } for cluster in view['top_clusters']]
+
+
+def region_card(card):
+    """Card of one region: share of merchants and scaled merchant count"""
+    color = REGION_COLORS.get(card['region'], '#00ff88')
+    return f"""
+        <div style="background: #111; border: 1px solid #222; border-radius: 12px; 
+                    padding: 1.5rem; text-align: center; margin-bottom: 1rem;">
+            <h3 style="color: {color}; margin: 0; font-size: 1.3rem;">
+                {card['region']}
+            </h3>
+            <div style="font-size: 2.5rem; font-weight: 800; color: {color}; 
+                        margin: 0.5rem 0;">
+                {card['percentage']:.1f}%
+            </div>
+            <div style="color: #666; font-size: 0.9rem;">
+                {card['estimated_merchants']:,} merchants
+            </div>
+        </div>
+        """
+
+
+def adoption_row(row):
+    return f"""
+            <div style="display: flex; justify-content: space-between; padding: 0.5rem; 
+                        border-bottom: 1px solid #222; align-items: center;">
+                <span style="color: #00ff88;">#{row['global_rank']}</span>
+                <span style="flex: 1; margin-left: 1rem;">{row['country']}</span>
+                <span style="color: #0099ff;">{row['adoption_rate']:.1f}%</span>
+            </div>
+            """
+
+
+def merchant_leader_row(row):
+    return f"""
+            <div style="display: flex; justify-content: space-between; padding: 0.5rem; 
+                        border-bottom: 1px solid #222; align-items: center;">
+                <span style="flex: 1;">{row['country']}</span>
+                <span style="color: #00ff88; font-family: 'IBM Plex Mono', monospace;">
+                    {row['estimated_merchants']:,} merchants
+                </span>
+            </div>
+            """
@@ -0,0 +1,177 @@
+"""
+Sharded Merchant Identification
+Process-pool version of tracker.identify for multi-core ingest boxes
+
+Runs as two parallel phases over an uncompressed transfer log CSV:
+
+1. Map: the file is cut into byte ranges on line boundaries. Each worker
+   parses one range, drops transfers involving excluded addresses (the
+   ExclusionList is sent to each worker once, when it starts) and
+   hash-partitions the rest by receiving address into per-shard Parquet
+   spill files.
+2. Reduce: each worker loads one shard (every transfer of the addresses
+   hashed to it) and computes their merchant rows exactly as the
+   single-process engine does.
+
+No address spans two shards, so concatenating the shard results gives the
+same table as tracker.identify. Shards also return their merchants'
+payments per customer; the customer graph needs every merchant at once
+(a customer pays merchants in many shards), so it is built afterwards.
+
+Usage:
+    python -m tracker.identify transfers.csv --workers 32
+"""
+
+import io
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from tracker.addresses import valid_address_mask
+from tracker.exclusions import exclude, exclusion_counters, exclusion_report
+from tracker.graph import customer_pairs, graph_report, merchant_graph
+from tracker.identify import (
+    CHUNK_SIZE, MERCHANT_COLUMNS, MERCHANT_CRITERIA, TRANSFER_COLUMNS,
+    finalize_merchants, normalize_transfers, receiver_totals,
+    summarize_receivers, volume_candidates,
+)
+
+# Bytes of CSV parsed by one map task
+RANGE_BYTES = 64 * 2**20
+
+# Shards per worker; more shards keep reduce tasks small and balanced
+SHARDS_PER_WORKER = 4
+
+
+def shard_of(receivers, n_shards):
+    """Stable shard number for each receiving address"""
+    hashes = pd.util.hash_pandas_object(receivers, index=False).to_numpy()
+    return hashes % n_shards
+
+
+def byte_ranges(path, range_bytes=RANGE_BYTES):
+    """Header line plus (start, end) byte ranges covering the data rows"""
+    with open(path, 'rb') as f:
+        header = f.readline()
+        size = os.fstat(f.fileno()).st_size
+    data_start = len(header)
+    starts = range(data_start, size, range_bytes)
+    ranges = [(start, min(start + range_bytes, size)) for start in starts]
+    return header.decode('utf-8').strip(), ranges
+
+
+def read_range(path, start, end):
+    """Raw bytes of every line that starts inside [start, end)"""
+    with open(path, 'rb') as f:
+        # A line belongs to the range its first byte falls in
+        f.seek(start - 1)
+        if f.read(1) != b'\n':
+            f.readline()
+        if f.tell() >= end:
+            return b''
+        data = f.read(end - f.tell())
+        if not data.endswith(b'\n'):
+            data += f.readline()
+    return data
+
+
+# This worker process's ExclusionList (set by _init_worker)
+_exclusions = None
+
+
+def _init_worker(exclusions):
+    global _exclusions
+    _exclusions = exclusions
+
+
+def _map_range(path, header, start, end, range_id, spill_dir, n_shards, chunksize):
+    """Parse one byte range and spill its transfers by shard; returns (transfers, exclusion counters)"""
+    excluded = exclusion_counters()
+    data = read_range(path, start, end)
+    if not data:
+        return 0, excluded
+
+    names = header.split(',')
+    reader = pd.read_csv(
+        io.BytesIO(data),
+        header=None,
+        names=names,
+        usecols=TRANSFER_COLUMNS,
+        dtype={'sender': str, 'receiver': str, 'amount': 'float64'},
+        chunksize=chunksize,
+    )
+
+    rows = 0
+    for chunk_id, chunk in enumerate(reader):
+        transfers = normalize_transfers(chunk)
+        rows += len(transfers)
+        transfers = exclude(transfers, _exclusions, excluded)
+        shards = shard_of(transfers['receiver'], n_shards)
+        for shard, part in transfers.groupby(shards):
+            shard_dir = os.path.join(spill_dir, f'shard-{shard:04d}')
+            os.makedirs(shard_dir, exist_ok=True)
+            part.to_parquet(os.path.join(shard_dir, f'part-{range_id:05d}-{chunk_id:04d}.parquet'),
+                            index=False)
+    return rows, excluded
+
+
+def _reduce_shard(shard_dir, criteria):
+    """Merchant rows for every address in one shard, and their payments per customer"""
+    transfers = pd.read_parquet(shard_dir)
+    totals = receiver_totals([transfers])
+    candidates = volume_candidates(totals, criteria)
+    transfers = transfers[transfers['receiver'].isin(candidates)]
+
+    merchants = finalize_merchants(summarize_receivers(transfers), criteria)
+    pairs = customer_pairs(transfers, merchants['address'])
+    report = {
+        'receiving_addresses': len(totals),
+        'volume_candidates': len(candidates),
+        'candidate_transfers': len(transfers),
+    }
+    return merchants, pairs, report
+
+
+def identify_merchants_parallel(path, workers=None, chunksize=CHUNK_SIZE, criteria=MERCHANT_CRITERIA,
+                                n_shards=None, spill_dir=None, graph_path=None, exclusions=None):
+    """Sharded equivalent of tracker.identify.identify_merchants"""
+    if path.endswith(('.gz', '.bz2', '.zip', '.xz', '.zst')):
+        raise ValueError("Parallel mode needs an uncompressed CSV (byte ranges can't be split)")
+
+    workers = workers or os.cpu_count()
+    n_shards = n_shards or workers * SHARDS_PER_WORKER
+    header, ranges = byte_ranges(path)
+
+    with tempfile.TemporaryDirectory(dir=spill_dir, prefix='merchant-shards-') as tmp, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(exclusions,)) as pool:
+        mapped = [
+            pool.submit(_map_range, path, header, start, end, range_id, tmp, n_shards, chunksize)
+            for range_id, (start, end) in enumerate(ranges)
+        ]
+        mapped = [future.result() for future in mapped]
+        transfers = sum(rows for rows, _ in mapped)
+        excluded = {key: sum(counters[key] for _, counters in mapped) for key in exclusion_counters()}
+
+        shard_dirs = sorted(os.path.join(tmp, name) for name in os.listdir(tmp))
+        reduced = list(pool.map(_reduce_shard, shard_dirs, [criteria] * len(shard_dirs)))
+
+    frames = [merchants for merchants, _, _ in reduced if len(merchants)]
+    merchants = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=MERCHANT_COLUMNS)
+    merchants = merchants.sort_values(['transaction_count', 'address'], ascending=[False, True])
+    merchants = merchants.reset_index(drop=True)
+    pairs = [pairs for _, pairs, _ in reduced] or [customer_pairs(pd.DataFrame(columns=TRANSFER_COLUMNS), [])]
+    merchants, graph = merchant_graph(merchants, pd.concat(pairs))
+    if graph_path:
+        graph.save(graph_path)
+
+    report = {'transfers': transfers, **exclusion_report(exclusions, excluded)}
+    for key in ['receiving_addresses', 'volume_candidates', 'candidate_transfers']:
+        report[key] = sum(shard_report[key] for _, _, shard_report in reduced)
+    report['merchants'] = len(merchants)
+    report['invalid_addresses'] = int((~valid_address_mask(merchants['address'])).sum())
+    report.update(graph_report(graph))
+    report['workers'] = workers
+    report['shards'] = len(shard_dirs)
+    return merchants, report
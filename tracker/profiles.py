@@ -0,0 +1,120 @@
+"""
+Hourly Profiles
+Time-of-day histograms per group in a single bincount pass
+
+hourly_profile() turns (group, time) pairs into a groups x buckets matrix
+without looping over groups or hours: each pair maps to one flat cell
+index (group code * buckets + bucket) and np.bincount adds them all up at
+once, optionally weighted (by volume, transaction count, ...).
+
+Times are seconds (unix timestamps or seconds since midnight). Buckets can
+be any whole number of minutes dividing the day (60 for hours, 15 for
+quarter-hour slots), and a UTC offset - one for all rows or one per row -
+shifts them to local time.
+"""
+
+import numpy as np
+import pandas as pd
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+# Representative UTC offset of each estimated region (see identify.estimate_region)
+REGION_UTC_OFFSET_MINUTES = {
+    'Asia-Pacific': 8 * 60,
+    'Europe-Africa': 1 * 60,
+    'Americas': -5 * 60,
+}
+
+
+def bucket_count(bucket_minutes=60):
+    if (24 * 60) % bucket_minutes:
+        raise ValueError(f"bucket_minutes must divide the day evenly, got {bucket_minutes}")
+    return (24 * 60) // bucket_minutes
+
+
+def time_buckets(seconds, bucket_minutes=60, utc_offset_minutes=0):
+    """Time-of-day bucket index per time, after shifting by the UTC offset"""
+    seconds = np.asarray(seconds, dtype='int64') + np.asarray(utc_offset_minutes, dtype='int64') * 60
+    return (seconds % SECONDS_PER_DAY) // (bucket_minutes * 60)
+
+
+def bucket_labels(bucket_minutes=60):
+    """'HH:MM' start time of each bucket"""
+    starts = np.arange(bucket_count(bucket_minutes)) * bucket_minutes
+    return [f'{start // 60:02d}:{start % 60:02d}' for start in starts]
+
+
+def hourly_profile(groups, seconds, weights=None, bucket_minutes=60, utc_offset_minutes=0, normalize=False):
+    """Groups x time-of-day buckets matrix of counts (or summed weights)
+
+    One row per distinct group (sorted), one column per bucket index. With
+    normalize, each row is scaled to percentages of the group's total.
+    """
+    buckets = bucket_count(bucket_minutes)
+    groups = pd.Series(groups, copy=False)
+    codes, uniques = pd.factorize(groups, sort=True)
+    cells = codes.astype('int64') * buckets + time_buckets(seconds, bucket_minutes, utc_offset_minutes)
+    if weights is not None:
+        weights = np.asarray(weights, dtype='float64')
+    counts = np.bincount(cells, weights=weights, minlength=len(uniques) * buckets)
+    profile = pd.DataFrame(counts.reshape(len(uniques), buckets), index=pd.Index(uniques, name=groups.name))
+
+    if normalize:
+        totals = profile.sum(axis=1).replace(0, np.nan)
+        profile = profile.div(totals, axis=0).fillna(0) * 100
+    return profile
+
+
+def region_offsets(regions, offsets=REGION_UTC_OFFSET_MINUTES):
+    """UTC offset in minutes for each row's region (0 for unknown regions)"""
+    return pd.Series(regions).map(offsets).fillna(0).astype('int64').to_numpy()
+
+
+# Business hours assumed when fitting a timezone: 9AM-5PM local (hour bins 9-16)
+BUSINESS_HOURS = range(9, 17)
+BUSINESS_PEAK_HOUR = 13
+# One candidate per distinct shift of the day
+UTC_OFFSETS = np.arange(-11, 13)
+
+
+def _local_hours():
+    # Local hour of each UTC hour (rows) under each candidate offset (columns)
+    return (np.arange(24)[:, None] + UTC_OFFSETS[None, :]) % 24
+
+
+def business_templates():
+    """(24, offsets) matrix: 1 where a UTC hour is local business hours under an offset"""
+    return np.isin(_local_hours(), BUSINESS_HOURS).astype('float32')
+
+
+def _centring_bump():
+    # Tiny preference for the offset whose local peak hour is closest to the
+    # activity, so equally good fits resolve to the most centred window
+    distance = abs(_local_hours() - BUSINESS_PEAK_HOUR)
+    distance = np.minimum(distance, 24 - distance)
+    return (1e-3 * (12 - distance) / 12).astype('float32')
+
+
+def infer_utc_offsets(hours):
+    """Best-fit UTC offset and confidence for each row of an (N, 24) hour histogram
+
+    Every histogram is scored against every business-hours template in one
+    matrix product. Confidence rescales the share of activity inside the
+    best window: 0 for activity spread evenly over the day (or no activity),
+    1 when it all falls inside business hours.
+    """
+    hours = np.asarray(hours, dtype='float32')
+    totals = hours.sum(axis=1)
+    shares = hours / np.where(totals > 0, totals, 1)[:, None]
+
+    templates = business_templates()
+    best = (shares @ (templates + _centring_bump())).argmax(axis=1)
+    in_window = (shares @ templates)[np.arange(len(best)), best]
+    uniform = len(BUSINESS_HOURS) / 24
+    confidence = np.clip((in_window - uniform) / (1 - uniform), 0, 1)
+    return UTC_OFFSETS[best].astype('int8'), confidence.astype('float64')
+
+
+def offset_peak_hours(utc_offsets):
+    """UTC hour at which a merchant with each offset peaks (local BUSINESS_PEAK_HOUR)"""
+    return (BUSINESS_PEAK_HOUR - np.asarray(utc_offsets, dtype='int64')) % 24
@@ -0,0 +1,217 @@
+"""
+Shared Merchant Table
+Read-only, memory-mapped merchant snapshots for dashboard sessions and processes
+
+The compact merchant table (see tracker.dataset.read_compact) is written once
+per dataset version as an uncompressed Arrow IPC file next to the dataset
+(identified_merchants-<version>.arrow, the version being a content hash of
+the source file). Every session and every app process maps that file instead
+of holding its own copy: the operating system keeps one set of pages in its
+cache, and numeric columns are handed to pandas as zero-copy, read-only views
+over the mapping.
+
+A session works on a view (MerchantSnapshot.view) - a DataFrame over the
+shared buffers. Columns it derives (percentiles, payment bins, ...) are added
+to that view only and never reach the shared table.
+
+Each column also carries a fingerprint of its contents. Caches of derived
+aggregates are keyed by version_of(columns they read), so a new snapshot only
+invalidates what actually depends on a changed column.
+
+SnapshotWatcher polls the source in a background thread. When the file
+changes it builds and maps the new version, then swaps it in with a single
+reference assignment. A session pins current() at the start of its run, so
+in-flight runs finish on the snapshot they started with.
+
+Usage:
+    python -m tracker.shared                  # build the shared table for the current dataset
+    python -m tracker.shared output/identified_merchants.csv
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+
+import pyarrow as pa
+
+from tracker.dataset import MERCHANT_DATASET, arrow_types, dataset_version, read_compact
+
+# Seconds between checks of the source file for a new snapshot
+RELOAD_INTERVAL = 5.0
+
+VERSION_KEY = b'merchant_tracker.version'
+FINGERPRINTS_KEY = b'merchant_tracker.columns'
+
+
+def shared_table_path(source, version):
+    """Location of the shared table built from one version of source"""
+    stem = os.path.splitext(source)[0]
+    return f'{stem}-{version}.arrow'
+
+
+def column_fingerprints(table):
+    """Content hash per column (IPC-serialized, so dictionaries are included)"""
+    fingerprints = {}
+    for name in table.column_names:
+        column = table.select([name])
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, column.schema) as writer:
+            writer.write_table(column)
+        fingerprints[name] = hashlib.blake2b(sink.getvalue(), digest_size=8).hexdigest()
+    return fingerprints
+
+
+def write_shared_table(source=MERCHANT_DATASET, path=None, version=None):
+    """Write the compact merchant table as an Arrow IPC file; returns its path"""
+    version = version or dataset_version(source)
+    path = path or shared_table_path(source, version)
+    table = pa.Table.from_pandas(read_compact(source), preserve_index=False)
+    # pandas metadata is dropped: it cannot describe fixed-width binary dtypes
+    table = table.replace_schema_metadata({
+        VERSION_KEY: version,
+        FINGERPRINTS_KEY: json.dumps(column_fingerprints(table)),
+    })
+    out_dir = os.path.dirname(path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+
+    partial = f'{path}.{os.getpid()}.tmp'
+    with pa.OSFile(partial, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(partial, path)
+    return path
+
+
+class MerchantSnapshot:
+    """One memory-mapped version of the merchant table"""
+
+    def __init__(self, table, path):
+        self.table = table
+        self.path = path
+        metadata = table.schema.metadata or {}
+        self.version = metadata.get(VERSION_KEY, b'').decode()
+        self.fingerprints = json.loads(metadata.get(FINGERPRINTS_KEY, b'{}'))
+
+    @classmethod
+    def open(cls, source=MERCHANT_DATASET, version=None):
+        """Map the shared table for source, building it first if this version has none"""
+        version = version or dataset_version(source)
+        path = shared_table_path(source, version)
+        if not os.path.exists(path):
+            write_shared_table(source, path, version)
+        return cls(pa.ipc.open_file(pa.memory_map(path)).read_all(), path)
+
+    @property
+    def columns(self):
+        return self.table.column_names
+
+    def view(self, columns=None, rows=None):
+        """Per-session DataFrame over the shared table (only `columns` and `rows` when given)"""
+        table = self.table
+        if columns is not None:
+            table = table.select([col for col in columns if col in self.columns])
+        if rows is not None:
+            table = table.take(rows)
+        return table.to_pandas(split_blocks=True, types_mapper=arrow_types)
+
+    def version_of(self, columns):
+        """Cache key that changes only when one of `columns` changes"""
+        parts = [f'{col}={self.fingerprints.get(col, self.version)}' for col in sorted(columns)]
+        return hashlib.blake2b('|'.join(parts).encode(), digest_size=8).hexdigest()
+
+
+def prune_shared_tables(source, keep):
+    """Remove shared tables (and files derived from them) of other versions than `keep`
+
+    Processes still mapping a removed file keep reading it; the space is
+    freed when the last mapping closes.
+    """
+    directory = os.path.dirname(source) or '.'
+    prefix = os.path.basename(os.path.splitext(source)[0]) + '-'
+    current = os.path.basename(os.path.splitext(keep)[0]) + '.'
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.startswith(prefix) and not name.startswith(current) and not name.endswith('.tmp'):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+class SnapshotWatcher:
+    """Keeps the newest snapshot of a source file mapped, reloading in the background
+
+    `validate` is called with each new snapshot before it is swapped in; a
+    snapshot it rejects (or that fails to load) leaves the current one in place.
+    """
+
+    def __init__(self, source=MERCHANT_DATASET, interval=RELOAD_INTERVAL, validate=None):
+        self.source = source
+        self.interval = interval
+        self.validate = validate
+        self.error = None
+        self._signature = self._stat()
+        self._snapshot = MerchantSnapshot.open(source)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _stat(self):
+        stat = os.stat(self.source)
+        return stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+    def current(self):
+        """The snapshot to use for a whole run"""
+        return self._snapshot
+
+    def check(self):
+        """Swap in a new snapshot if the source changed; returns True on a swap"""
+        try:
+            signature = self._stat()
+            if signature == self._signature:
+                return False
+            version = dataset_version(self.source)
+            if version == self._snapshot.version:
+                self._signature = signature
+                return False
+            snapshot = MerchantSnapshot.open(self.source, version)
+            if self.validate is not None:
+                self.validate(snapshot)
+        except Exception as e:
+            # Keep serving the current snapshot; the next poll tries again
+            self.error = e
+            return False
+
+        self._signature = signature
+        self._snapshot = snapshot
+        self.error = None
+        prune_shared_tables(self.source, keep=snapshot.path)
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='snapshot-watcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the shared, memory-mapped merchant table")
+    parser.add_argument('source', nargs='?', default=MERCHANT_DATASET)
+    args = parser.parse_args(argv)
+
+    path = write_shared_table(args.source)
+    prune_shared_tables(args.source, keep=path)
+    print(f"Wrote {MerchantSnapshot.open(args.source).table.num_rows:,} merchants to {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,292 @@
+"""
+Streaming Sketches
+Compact, mergeable summaries used in place of raw per-address data
+"""
+
+import numpy as np
+import pandas as pd
+
+# Quantiles are returned within this relative error of the true value
+DEFAULT_RELATIVE_ACCURACY = 0.005
+
+
+class QuantileSketch:
+    """Relative-error quantile sketch for many keys at once (DDSketch-style)
+
+    Values are counted in logarithmic buckets: bucket i holds values in
+    (gamma^(i-1), gamma^i] with gamma = (1 + a) / (1 - a), so the value read
+    back for any rank is within relative accuracy a of the true value there.
+    All keys live in one sparse (key, bucket) -> count Series, so merging
+    sketches from different shards or days is an index-aligned add.
+    """
+
+    def __init__(self, counts, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        self.counts = counts
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+
+    @classmethod
+    def from_values(cls, keys, values, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        """Sketch positive values grouped by key (two aligned Series)"""
+        gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        buckets = np.ceil(np.log(values.to_numpy(dtype='float64')) / np.log(gamma)).astype('int32')
+        buckets = pd.Series(buckets, index=keys.index, name='bucket')
+        counts = keys.groupby([keys, buckets]).size().astype('uint32')
+        return cls(counts, relative_accuracy)
+
+    def merge(self, other):
+        """Combine with a sketch over a disjoint set of values"""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Can only merge sketches with the same relative accuracy")
+        counts = self.counts.add(other.counts, fill_value=0).astype('uint32')
+        return QuantileSketch(counts, self.relative_accuracy)
+
+    def select(self, keys):
+        """Sketch restricted to the given keys"""
+        mask = self.counts.index.get_level_values(0).isin(keys)
+        return QuantileSketch(self.counts[mask], self.relative_accuracy)
+
+    def bucket_value(self, buckets):
+        """Representative value for each bucket (minimizes relative error)"""
+        return 2 * np.power(self.gamma, buckets.astype('float64')) / (self.gamma + 1)
+
+    def quantiles(self, qs):
+        """DataFrame of quantiles per key, one column per q in qs"""
+        counts = self.counts
+        if not counts.index.is_monotonic_increasing:
+            counts = counts.sort_index()
+
+        keys = counts.index.get_level_values(0)
+        buckets = counts.index.get_level_values(1).to_numpy()
+        cumulative = np.cumsum(counts.to_numpy(dtype='int64'))
+
+        # Row span of each key within the sorted counts
+        last = np.flatnonzero(np.r_[keys[1:] != keys[:-1], True]) if len(keys) else np.array([], dtype=int)
+        first = np.r_[0, last[:-1] + 1].astype(int) if len(last) else last
+        before = np.where(first > 0, cumulative[first - 1], 0)
+        total = cumulative[last] - before if len(last) else before
+
+        # Linear interpolation between neighbouring ranks, as pandas does
+        result = {}
+        for q in qs:
+            rank = q * (total - 1)
+            lower = np.floor(rank)
+            upper = np.minimum(lower + 1, total - 1)
+            low_value = self.bucket_value(buckets[np.searchsorted(cumulative, before + lower, side='right')])
+            high_value = self.bucket_value(buckets[np.searchsorted(cumulative, before + upper, side='right')])
+            result[q] = low_value + (rank - lower) * (high_value - low_value)
+        return pd.DataFrame(result, index=keys[last] if len(last) else keys[:0])
+
+    def quantile(self, q):
+        """Series with one quantile per key"""
+        return self.quantiles([q])[q]
+
+    def median(self):
+        return self.quantile(0.5)
+
+    def p90(self):
+        return self.quantile(0.9)
+
+    def count(self):
+        """Values sketched per key"""
+        return self.counts.groupby(level=0).sum()
+
+    def memory_usage(self):
+        """Bytes held by the bucket counts and their index"""
+        return int(self.counts.memory_usage(index=True, deep=True))
+
+
+def hash64(values):
+    """Stable 64-bit hash of a Series, Index or DataFrame (rows combined)"""
+    if isinstance(values, pd.Index):
+        values = values.to_series()
+    return pd.util.hash_pandas_object(values, index=False).to_numpy(dtype='uint64')
+
+
+def _leading_zeros(x):
+    """Leading zero bits of each uint64"""
+    high = (x >> np.uint64(32)).astype('float64')
+    low = (x & np.uint64(0xFFFFFFFF)).astype('float64')
+    with np.errstate(divide='ignore'):
+        high_zeros = 31 - np.floor(np.log2(high))
+        low_zeros = 63 - np.floor(np.log2(low))
+    return np.where(high > 0, high_zeros, np.where(low > 0, low_zeros, 64)).astype('int64')
+
+
+class HyperLogLog:
+    """Distinct-count sketch for many keys at once
+
+    Registers are stored sparsely as a (key, register) -> rank Series, so a
+    key with few distinct items only holds a few entries. Relative standard
+    error is about 1.04 / sqrt(2 ** precision).
+    """
+
+    def __init__(self, registers, precision):
+        self.registers = registers
+        self.precision = precision
+
+    @staticmethod
+    def precision_for_error(relative_error):
+        """Smallest precision whose standard error is within relative_error"""
+        return int(np.clip(np.ceil(np.log2((1.04 / relative_error) ** 2)), 4, 18))
+
+    @classmethod
+    def empty(cls, precision, key_name='key'):
+        index = pd.MultiIndex.from_arrays([pd.Index([], dtype=str), pd.Index([], dtype='uint32')],
+                                          names=[key_name, 'register'])
+        return cls(pd.Series([], index=index, dtype='uint8'), precision)
+
+    @classmethod
+    def from_hashes(cls, keys, hashes, precision):
+        """Sketch items (given as uint64 hashes) grouped by key"""
+        shift = np.uint64(64 - precision)
+        register = (hashes >> shift).astype('uint32')
+        rank = np.minimum(_leading_zeros(hashes << np.uint64(precision)), 64 - precision) + 1
+
+        index = pd.MultiIndex.from_arrays([np.asarray(keys), register], names=[keys.name or 'key', 'register'])
+        registers = pd.Series(rank.astype('uint8'), index=index).groupby(level=[0, 1]).max()
+        return cls(registers, precision)
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("Can only merge sketches with the same precision")
+        registers = pd.concat([self.registers, other.registers]).groupby(level=[0, 1]).max()
+        return HyperLogLog(registers, self.precision)
+
+    def select(self, keys):
+        mask = self.registers.index.get_level_values(0).isin(keys)
+        return HyperLogLog(self.registers[mask], self.precision)
+
+    def estimate(self):
+        """Estimated distinct items per key"""
+        m = 2 ** self.precision
+        per_key = (2.0 ** -self.registers.astype('float64')).groupby(level=0)
+        used = per_key.size()
+        empty = m - used
+        harmonic = per_key.sum() + empty
+
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / harmonic
+
+        # Linear counting is far more accurate while most registers are empty
+        with np.errstate(divide='ignore'):
+            linear = m * np.log(m / empty)
+        return raw.where((raw > 2.5 * m) | (empty == 0), linear)
+
+
+class HeavyHitters:
+    """Mergeable Misra-Gries summaries: the most frequent items per key
+
+    Each key keeps at most `capacity` counters. Counts are never above the
+    true count and at most error[key] below it, where error[key] is bounded
+    by n / (capacity + 1) for a key with n items. Keys that never exceed
+    capacity distinct items are tracked exactly (error 0).
+    """
+
+    def __init__(self, counts, error, capacity):
+        self.counts = counts
+        self.error = error
+        self.capacity = capacity
+
+    @staticmethod
+    def capacity_for_error(share_error):
+        """Counters per key so that shares are within share_error"""
+        return max(int(np.ceil(1 / share_error)) - 1, 1)
+
+    def merge(self, other):
+        """Combine two summaries; call truncate() to restore the capacity bound"""
+        counts = self.counts.add(other.counts, fill_value=0).astype('int64')
+        error = self.error.add(other.error, fill_value=0).astype('int64')
+        return HeavyHitters(counts, error, self.capacity)
+
+    def overflowing(self):
+        """Keys holding more than capacity counters"""
+        sizes = self.counts.groupby(level=0).size()
+        return sizes.index[sizes > self.capacity]
+
+    def truncate(self):
+        """Subtract each overflowing key's (capacity + 1)-th largest count"""
+        overflowing = self.overflowing()
+        if not len(overflowing):
+            return self
+
+        keys = self.counts.index.get_level_values(0)
+        over = self.counts[keys.isin(overflowing)]
+        rank = over.groupby(level=0).rank(method='first', ascending=False)
+        cut = over[rank == self.capacity + 1].droplevel(1)
+
+        reduced = over - cut.reindex(over.index.get_level_values(0)).to_numpy()
+        counts = pd.concat([self.counts[~keys.isin(overflowing)], reduced[reduced > 0]]).sort_index()
+        # Evicted items would otherwise linger in the index levels
+        counts.index = counts.index.remove_unused_levels()
+        error = self.error.add(cut, fill_value=0).astype('int64')
+        return HeavyHitters(counts, error, self.capacity)
+
+    def select(self, keys):
+        mask = self.counts.index.get_level_values(0).isin(keys)
+        return HeavyHitters(self.counts[mask], self.error[self.error.index.isin(keys)], self.capacity)
+
+
+class BloomFilter:
+    """Bit-array set membership with a bounded false-positive rate
+
+    Works on uint64 hashes (see hash64) so whole columns are added and
+    tested at once. Filters with the same size merge with a bitwise OR.
+    """
+
+    def __init__(self, bits, hash_count):
+        self.bits = bits
+        self.hash_count = hash_count
+        self.size = len(bits) * 8
+
+    @classmethod
+    def for_capacity(cls, capacity, error_rate):
+        """Empty filter sized for `capacity` items at `error_rate` false positives"""
+        size = int(np.ceil(-capacity * np.log(error_rate) / np.log(2) ** 2))
+        size = max(64, (size + 63) // 64 * 64)
+        hash_count = max(1, int(round(size / max(capacity, 1) * np.log(2))))
+        return cls(np.zeros(size // 8, dtype='uint8'), hash_count)
+
+    def _positions(self, hashes):
+        # Double hashing: position_i = h1 + i * h2
+        h1 = hashes & np.uint64(0xFFFFFFFF)
+        h2 = (hashes >> np.uint64(32)) | np.uint64(1)
+        steps = np.arange(self.hash_count, dtype='uint64')
+        return (h1[:, None] + steps[None, :] * h2[:, None]) % np.uint64(self.size)
+
+    def add(self, hashes):
+        positions = self._positions(hashes).ravel()
+        np.bitwise_or.at(self.bits, (positions >> np.uint64(3)).astype('int64'),
+                         (np.uint8(1) << (positions & np.uint64(7)).astype('uint8')))
+
+    def contains(self, hashes):
+        """Boolean array: True where the item may be in the set
+
+        Probes one hash function at a time over the items still in the
+        running, so items not in the set (most of them, usually) cost about
+        two probes instead of hash_count.
+        """
+        h1 = hashes & np.uint64(0xFFFFFFFF)
+        h2 = (hashes >> np.uint64(32)) | np.uint64(1)
+        candidates = np.arange(len(hashes))
+        for step in range(self.hash_count):
+            if not len(candidates):
+                break
+            positions = (h1[candidates] + np.uint64(step) * h2[candidates]) % np.uint64(self.size)
+            bytes_ = self.bits[(positions >> np.uint64(3)).astype('int64')]
+            hit = (bytes_ >> (positions & np.uint64(7)).astype('uint8')) & 1
+            candidates = candidates[hit.astype(bool)]
+        found = np.zeros(len(hashes), dtype=bool)
+        found[candidates] = True
+        return found
+
+    def merge(self, other):
+        if other.size != self.size or other.hash_count != self.hash_count:
+            raise ValueError("Can only merge filters with the same size and hash count")
+        return BloomFilter(self.bits | other.bits, self.hash_count)
+
+    def fill_ratio(self):
+        return float(np.unpackbits(self.bits).mean())
+
+    def memory_usage(self):
+        return int(self.bits.nbytes)
@@ -0,0 +1,518 @@
+"""
+Incremental Merchant Aggregates
+Persisted, mergeable per-address state behind identified_merchants.csv
+
+Instead of re-reading the whole week every night, each new day of transfers
+is folded into the saved state and only the addresses that received
+transfers that day are re-classified. Every other address keeps its
+existing row, since the criteria only depend on an address's own totals.
+
+Customer statistics are exact by default. With --approximate, addresses
+with many customers switch to HyperLogLog / heavy-hitter sketches instead of
+keeping every (receiver, sender) pair (see ApproximateCustomers). The
+merchant-customer graph (tracker.graph) is rebuilt from the customer state
+on every run, so graph flags follow customers paying merchants in any batch;
+in approximate mode it only holds each address's tracked top customers.
+
+Usage:
+    python -m tracker.state init week.csv        # build state from a full window
+    python -m tracker.state init week.csv --approximate
+    python -m tracker.state apply 2025-06-11.csv  # fold in one more day
+    python -m tracker.state apply 2025-06-11.csv --exclude lists/   # see tracker.exclusions
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from tracker.identify import (
+    CHUNK_SIZE, MERCHANT_COLUMNS, MERCHANT_CRITERIA, SECONDS_PER_DAY,
+    finalize_merchants, hour_histogram, payment_quantiles, print_report,
+    read_transfers, volume_candidates,
+)
+from tracker.dataset import HOUR_COLUMNS, MERCHANT_DATASET, pack_hours, read_merchants, write_merchants
+from tracker.exclusions import (
+    EXCLUSION_SETTINGS, ExclusionList, exclude_chunks, exclusion_counters, exclusion_report,
+)
+from tracker.graph import GRAPH_PATH, graph_report, merchant_graph
+from tracker.sketches import (
+    DEFAULT_RELATIVE_ACCURACY, BloomFilter, HeavyHitters, HyperLogLog,
+    QuantileSketch, hash64,
+)
+
+STATE_DIR = 'output/state'
+MERCHANTS_PATH = MERCHANT_DATASET
+
+
+# Error bounds for ApproximateCustomers
+CUSTOMER_SKETCH = {
+    'distinct_error': 0.02,          # relative standard error of unique/returning customers
+    'share_error': 0.01,             # max_customer_share is at most this much above the true share
+    'repeat_error_rate': 0.01,       # false-positive rate when spotting returning customers
+    'repeat_capacity': 10_000_000,   # customer pairs the returning-customer filter is sized for
+}
+
+
+def _customer_stats(counts):
+    """unique/returning customers and largest customer's payments from pair counts"""
+    per_receiver = counts.groupby(level=0)
+    return pd.DataFrame({
+        'unique_customers': per_receiver.size(),
+        'returning_customers': (counts > 1).groupby(level=0).sum(),
+        'max_customer_payments': per_receiver.max(),
+    })
+
+
+class ExactCustomers:
+    """Payments per (receiver, sender): exact customer statistics"""
+
+    mode = 'exact'
+
+    def __init__(self, payments):
+        self.payments = payments
+
+    @classmethod
+    def from_transfers(cls, transfers, settings=None):
+        return cls(transfers.groupby(['receiver', 'sender']).size().astype('uint32'))
+
+    def merge(self, other):
+        return ExactCustomers(self.payments.add(other.payments, fill_value=0).astype('uint32'))
+
+    def stats(self, addresses):
+        payments = self.payments[self.payments.index.get_level_values('receiver').isin(addresses)]
+        return _customer_stats(payments)
+
+    def pairs(self):
+        """Payments per (receiver, sender)"""
+        return self.payments
+
+    def memory_usage(self):
+        return int(self.payments.memory_usage(index=True, deep=True))
+
+    def save(self, state_dir):
+        self.payments.rename('payments').to_frame().to_parquet(os.path.join(state_dir, 'customers.parquet'))
+
+    @classmethod
+    def load(cls, state_dir, settings=None):
+        return cls(pd.read_parquet(os.path.join(state_dir, 'customers.parquet'))['payments'])
+
+
+class ApproximateCustomers:
+    """Bounded-memory customer statistics
+
+    Every address keeps a Misra-Gries summary of its top customers
+    (HeavyHitters). While an address has no more customers than the summary
+    holds it is tracked exactly, which covers the thresholds in the
+    Merchant Identification Criteria. Once it overflows, its customers are
+    also counted in HyperLogLog sketches (distinct and returning customers)
+    and its (receiver, sender) pairs go into a Bloom filter used to spot
+    returning customers evicted from the summary.
+
+    For overflowed addresses max_customer_payments is an upper bound, so
+    max_customer_share is at most share_error above the true share and the
+    <=80% concentration filter never admits a more concentrated wallet.
+    """
+
+    mode = 'approximate'
+
+    def __init__(self, top, distinct, repeat, seen, settings):
+        self.top = top
+        self.distinct = distinct
+        self.repeat = repeat
+        self.seen = seen
+        self.settings = settings
+
+    @classmethod
+    def from_transfers(cls, transfers, settings=None):
+        settings = dict(CUSTOMER_SKETCH, **(settings or {}))
+        precision = HyperLogLog.precision_for_error(settings['distinct_error'])
+        capacity = HeavyHitters.capacity_for_error(settings['share_error'])
+
+        counts = transfers.groupby(['receiver', 'sender']).size().astype('int64')
+        error = pd.Series([], index=pd.Index([], dtype=str, name='receiver'), dtype='int64')
+        top = HeavyHitters(counts, error, capacity)
+        return cls(top, HyperLogLog.empty(precision, 'receiver'), HyperLogLog.empty(precision, 'receiver'),
+                   None, settings)
+
+    def _new_filter(self):
+        return BloomFilter.for_capacity(self.settings['repeat_capacity'], self.settings['repeat_error_rate'])
+
+    def merge(self, other):
+        top = self.top.merge(other.top)
+        overflowed_self = self.top.error.index
+        overflowed_other = other.top.error.index
+        overflowed = overflowed_self.union(overflowed_other).union(top.overflowing())
+
+        distinct = self.distinct.merge(other.distinct)
+        repeat = self.repeat.merge(other.repeat)
+        seen = self.seen
+        if other.seen is not None:
+            seen = other.seen if seen is None else seen.merge(other.seen)
+
+        if len(overflowed):
+            # Every pair still held for an overflowing address goes into the sketches;
+            # re-adding pairs an overflowed side already sketched changes nothing
+            pairs = top.counts[top.counts.index.get_level_values(0).isin(overflowed)]
+            receivers = pairs.index.get_level_values(0)
+            senders = pairs.index.get_level_values(1)
+            pair_hashes = hash64(pd.DataFrame({'receiver': receivers, 'sender': senders}))
+            sender_hashes = hash64(senders)
+
+            returning = pairs.to_numpy() > 1
+            for side, overflowed_side in [(self, overflowed_self), (other, overflowed_other)]:
+                if side.seen is not None:
+                    unseen = ~pairs.index.isin(side.top.counts.index)
+                    returning |= unseen & receivers.isin(overflowed_side) & side.seen.contains(pair_hashes)
+
+            receivers = pd.Series(receivers, name='receiver')
+            distinct = distinct.merge(HyperLogLog.from_hashes(receivers, sender_hashes, distinct.precision))
+            repeat = repeat.merge(HyperLogLog.from_hashes(receivers[returning], sender_hashes[returning],
+                                                          repeat.precision))
+            if seen is None:
+                seen = self._new_filter()
+            seen.add(pair_hashes)
+
+        return ApproximateCustomers(top.truncate(), distinct, repeat, seen, self.settings)
+
+    def stats(self, addresses):
+        top = self.top.select(addresses)
+        stats = _customer_stats(top.counts)
+
+        overflowed = top.error.index
+        if len(overflowed):
+            # Truncation can evict every counter of an address with only one-time
+            # customers; its largest customer then has at most `error` payments
+            stats = stats.reindex(stats.index.union(overflowed), fill_value=0)
+            unique = self.distinct.select(overflowed).estimate().round()
+            returning = self.repeat.select(overflowed).estimate().round().reindex(overflowed, fill_value=0)
+            stats.loc[overflowed, 'unique_customers'] = unique.astype('int64')
+            stats.loc[overflowed, 'returning_customers'] = returning.clip(upper=unique).astype('int64')
+            stats.loc[overflowed, 'max_customer_payments'] += top.error
+        return stats
+
+    def pairs(self):
+        """Payments per (receiver, sender) of each address's tracked customers (lower bounds)"""
+        return self.top.counts
+
+    def memory_usage(self):
+        total = self.top.counts.memory_usage(index=True, deep=True)
+        total += self.top.error.memory_usage(index=True, deep=True)
+        total += self.distinct.registers.memory_usage(index=True, deep=True)
+        total += self.repeat.registers.memory_usage(index=True, deep=True)
+        total += self.seen.memory_usage() if self.seen is not None else 0
+        return int(total)
+
+    def save(self, state_dir):
+        def path(name):
+            return os.path.join(state_dir, name)
+
+        self.top.counts.rename('payments').to_frame().to_parquet(path('customers.parquet'))
+        self.top.error.rename('error').to_frame().to_parquet(path('customer_errors.parquet'))
+        self.distinct.registers.rename('rank').to_frame().to_parquet(path('customer_distinct.parquet'))
+        self.repeat.registers.rename('rank').to_frame().to_parquet(path('customer_repeat.parquet'))
+        if self.seen is not None:
+            np.save(path('customer_seen.npy'), self.seen.bits)
+
+    @classmethod
+    def load(cls, state_dir, settings=None):
+        def path(name):
+            return os.path.join(state_dir, name)
+
+        settings = dict(CUSTOMER_SKETCH, **(settings or {}))
+        precision = HyperLogLog.precision_for_error(settings['distinct_error'])
+        capacity = HeavyHitters.capacity_for_error(settings['share_error'])
+
+        top = HeavyHitters(pd.read_parquet(path('customers.parquet'))['payments'],
+                           pd.read_parquet(path('customer_errors.parquet'))['error'], capacity)
+        distinct = HyperLogLog(pd.read_parquet(path('customer_distinct.parquet'))['rank'], precision)
+        repeat = HyperLogLog(pd.read_parquet(path('customer_repeat.parquet'))['rank'], precision)
+
+        seen = None
+        if os.path.exists(path('customer_seen.npy')):
+            template = BloomFilter.for_capacity(settings['repeat_capacity'], settings['repeat_error_rate'])
+            seen = BloomFilter(np.load(path('customer_seen.npy')), template.hash_count)
+        return cls(top, distinct, repeat, seen, settings)
+
+
+CUSTOMER_MODES = {
+    ExactCustomers.mode: ExactCustomers,
+    ApproximateCustomers.mode: ApproximateCustomers,
+}
+
+
+class AggregateState:
+    """Mergeable per-address aggregates
+
+    receivers  transaction_count, total_received_usdt, first_seen, last_seen
+    hours      24-bin UTC hour histogram per receiver
+    days       transfers per (receiver, UTC day)
+    customers  ExactCustomers or ApproximateCustomers
+    payments   payment-size quantile sketch per receiver
+    """
+
+    def __init__(self, receivers, hours, days, customers, payments):
+        self.receivers = receivers
+        self.hours = hours
+        self.days = days
+        self.customers = customers
+        self.payments = payments
+
+    @classmethod
+    def empty(cls, approximate=None):
+        return cls.from_transfers(pd.DataFrame({
+            'timestamp': pd.Series(dtype='int64'),
+            'sender': pd.Series(dtype=str),
+            'receiver': pd.Series(dtype=str),
+            'amount': pd.Series(dtype='float64'),
+        }), approximate)
+
+    @classmethod
+    def from_transfers(cls, transfers, approximate=None):
+        """Aggregate one batch of normalized transfers
+
+        approximate: None for exact customer statistics, or a dict of
+        CUSTOMER_SKETCH error bounds to use ApproximateCustomers.
+        """
+        receivers = transfers.groupby('receiver').agg(
+            transaction_count=('amount', 'size'),
+            total_received_usdt=('amount', 'sum'),
+            first_seen=('timestamp', 'min'),
+            last_seen=('timestamp', 'max'),
+        )
+
+        hours = hour_histogram(transfers['receiver'], transfers['timestamp'])
+        hours.columns = HOUR_COLUMNS
+        hours = hours.reindex(receivers.index, fill_value=0).astype('uint32')
+
+        day = (transfers['timestamp'] // SECONDS_PER_DAY).rename('day')
+        days = transfers.groupby(['receiver', day]).size().astype('uint32')
+        customers = (ExactCustomers if approximate is None else ApproximateCustomers).from_transfers(
+            transfers, approximate)
+        payments = QuantileSketch.from_values(transfers['receiver'], transfers['amount'])
+
+        return cls(receivers, hours, days, customers, payments)
+
+    @property
+    def addresses(self):
+        return self.receivers.index
+
+    @property
+    def approximate(self):
+        """Customer sketch settings, or None when customers are tracked exactly"""
+        return self.customers.settings if self.customers.mode == ApproximateCustomers.mode else None
+
+    def merge(self, other):
+        """Combine two states covering disjoint sets of transfers"""
+        receivers = pd.concat([self.receivers, other.receivers]).groupby(level=0).agg({
+            'transaction_count': 'sum',
+            'total_received_usdt': 'sum',
+            'first_seen': 'min',
+            'last_seen': 'max',
+        })
+        hours = self.hours.add(other.hours, fill_value=0).astype('uint32')
+        days = self.days.add(other.days, fill_value=0).astype('uint32')
+        customers = self.customers.merge(other.customers)
+        payments = self.payments.merge(other.payments)
+        return AggregateState(receivers, hours, days, customers, payments)
+
+    def stats(self, addresses=None):
+        """Raw per-receiver statistics in the layout finalize_merchants expects"""
+        if addresses is None:
+            addresses = self.addresses
+        addresses = pd.Index(addresses).intersection(self.addresses).sort_values()
+
+        stats = self.receivers.loc[addresses].copy()
+
+        stats = stats.join(self.customers.stats(addresses))
+
+        days = self.days[self.days.index.get_level_values('receiver').isin(addresses)]
+        stats['days_active'] = days.groupby(level='receiver').size()
+
+        hours = self.hours.loc[addresses].to_numpy()
+        stats['hours_active'] = (hours > 0).sum(axis=1)
+        stats['peak_hour_utc'] = hours.argmax(axis=1)
+        stats['hourly_transactions'] = pack_hours(hours, index=stats.index)
+
+        stats = stats.join(payment_quantiles(self.payments.select(addresses)))
+
+        return stats
+
+    def save(self, state_dir=STATE_DIR, manifest=None):
+        """Write every table as Parquet plus a small JSON manifest"""
+        os.makedirs(state_dir, exist_ok=True)
+        self.receivers.to_parquet(os.path.join(state_dir, 'receivers.parquet'))
+        self.hours.to_parquet(os.path.join(state_dir, 'hours.parquet'))
+        self.days.rename('transfers').to_frame().to_parquet(os.path.join(state_dir, 'days.parquet'))
+        self.customers.save(state_dir)
+        self.payments.counts.rename('payments').to_frame().to_parquet(os.path.join(state_dir, 'payments.parquet'))
+
+        manifest = dict(manifest or {}, payment_sketch_accuracy=self.payments.relative_accuracy,
+                        customers={'mode': self.customers.mode, 'settings': self.approximate})
+        with open(os.path.join(state_dir, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+    @classmethod
+    def load(cls, state_dir=STATE_DIR):
+        """Read a state written by save(); returns (state, manifest)"""
+        def table(name):
+            return pd.read_parquet(os.path.join(state_dir, f'{name}.parquet'))
+
+        with open(os.path.join(state_dir, 'manifest.json')) as f:
+            manifest = json.load(f)
+
+        accuracy = manifest.get('payment_sketch_accuracy', DEFAULT_RELATIVE_ACCURACY)
+        customers = manifest.get('customers', {'mode': ExactCustomers.mode, 'settings': None})
+        state = cls(
+            table('receivers'),
+            table('hours'),
+            table('days')['transfers'],
+            CUSTOMER_MODES[customers['mode']].load(state_dir, customers['settings']),
+            QuantileSketch(table('payments')['payments'], accuracy),
+        )
+        return state, manifest
+
+
+def build_state(chunks, state=None, approximate=None):
+    """Fold a stream of normalized transfer chunks into a state (a new one by default)"""
+    if state is None:
+        state = AggregateState.empty(approximate)
+    for chunk in chunks:
+        state = state.merge(AggregateState.from_transfers(chunk, state.approximate))
+    return state
+
+
+def classify(state, addresses=None, criteria=MERCHANT_CRITERIA):
+    """Merchant rows for the given addresses (all by default)"""
+    receivers = state.receivers if addresses is None else \
+        state.receivers.loc[pd.Index(addresses).intersection(state.addresses)]
+    candidates = volume_candidates(receivers, criteria)
+    return finalize_merchants(state.stats(candidates), criteria)
+
+
+def init_state(path, state_dir=STATE_DIR, merchants_path=MERCHANTS_PATH, chunksize=CHUNK_SIZE,
+               approximate=None, graph_path=GRAPH_PATH, exclusions=None):
+    """Build state from a full transfer window and write the merchant table"""
+    excluded = exclusion_counters()
+    chunks = exclude_chunks(read_transfers(path, chunksize), exclusions, excluded)
+    state = build_state(chunks, approximate=approximate)
+    merchants, graph = merchant_graph(classify(state), state.customers.pairs())
+
+    state.save(state_dir, manifest={'sources': [os.path.basename(path)]})
+    write_merchants(merchants, merchants_path)
+    if graph_path:
+        graph.save(graph_path)
+
+    return merchants, {
+        **exclusion_report(exclusions, excluded),
+        'receiving_addresses': len(state.receivers),
+        'customer_state_bytes': state.customers.memory_usage(),
+        'merchants': len(merchants),
+        **graph_report(graph),
+    }
+
+
+def apply_delta(path, state_dir=STATE_DIR, merchants_path=MERCHANTS_PATH, chunksize=CHUNK_SIZE,
+                criteria=MERCHANT_CRITERIA, graph_path=GRAPH_PATH, exclusions=None):
+    """Fold a new batch of transfers into the saved state
+
+    Only addresses that received transfers in the batch are re-classified;
+    rows for every other address are carried over from merchants_path. Graph
+    flags are recomputed for every merchant, since a new customer of one
+    merchant changes the overlap with all the others it pays. Exclusions
+    apply to the new batch only; the saved state is not re-filtered.
+    """
+    state, manifest = AggregateState.load(state_dir)
+
+    # Chunks are folded straight into the saved state (rather than building a
+    # separate delta first) so approximate customer sketches see every sender
+    touched = []
+    excluded = exclusion_counters()
+
+    def chunks():
+        for chunk in exclude_chunks(read_transfers(path, chunksize), exclusions, excluded):
+            touched.append(chunk['receiver'].unique())
+            yield chunk
+
+    state = build_state(chunks(), state)
+    touched = pd.Index(np.concatenate(touched) if touched else [], dtype=str).unique()
+
+    rechecked = classify(state, touched, criteria)
+
+    if os.path.exists(merchants_path):
+        previous = read_merchants(merchants_path)
+        unchanged = previous[~previous['address'].isin(touched)]
+    else:
+        unchanged = pd.DataFrame(columns=MERCHANT_COLUMNS)
+
+    merchants = pd.concat([unchanged, rechecked], ignore_index=True)
+    merchants = merchants.sort_values(['transaction_count', 'address'], ascending=[False, True])
+    merchants = merchants.reset_index(drop=True)
+    merchants, graph = merchant_graph(merchants, state.customers.pairs())
+
+    manifest.setdefault('sources', []).append(os.path.basename(path))
+    state.save(state_dir, manifest=manifest)
+    write_merchants(merchants, merchants_path)
+    if graph_path:
+        graph.save(graph_path)
+
+    return merchants, {
+        **exclusion_report(exclusions, excluded),
+        'receiving_addresses': len(state.receivers),
+        'customer_state_bytes': state.customers.memory_usage(),
+        'touched_addresses': len(touched),
+        'unchanged_merchants': len(unchanged),
+        'rechecked_merchants': len(rechecked),
+        'merchants': len(merchants),
+        **graph_report(graph),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain merchant aggregates incrementally")
+    parser.add_argument('command', choices=['init', 'apply'],
+                        help="init: build state from a full window; apply: fold in a new batch")
+    parser.add_argument('transfers', help="Transfer log CSV (timestamp, sender, receiver, amount)")
+    parser.add_argument('--state-dir', default=STATE_DIR)
+    parser.add_argument('-o', '--output', default=MERCHANTS_PATH,
+                        help="Merchant table to write (.parquet, or .csv)")
+    parser.add_argument('--csv', help="Also export the merchant table as CSV here")
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--graph', default=GRAPH_PATH,
+                        help="Where to save the merchant-customer graph ('' to skip)")
+    parser.add_argument('--exclude', action='append', default=[],
+                        help="Address denylist (.txt or .csv), or a directory of them; repeatable")
+    parser.add_argument('--false-positive-rate', type=float, default=EXCLUSION_SETTINGS['false_positive_rate'],
+                        help="Share of unlisted addresses a large (Bloom-filtered) denylist may exclude")
+    parser.add_argument('--approximate', action='store_true',
+                        help="init only: track customers with sketches (apply follows the saved state)")
+    parser.add_argument('--distinct-error', type=float, default=CUSTOMER_SKETCH['distinct_error'],
+                        help="Relative error of unique/returning customer counts in approximate mode")
+    parser.add_argument('--share-error', type=float, default=CUSTOMER_SKETCH['share_error'],
+                        help="Max slack on max_customer_share in approximate mode")
+    args = parser.parse_args(argv)
+
+    exclusions = None
+    if args.exclude:
+        exclusions = ExclusionList.load(args.exclude, {'false_positive_rate': args.false_positive_rate})
+
+    if args.command == 'init':
+        approximate = None
+        if args.approximate:
+            approximate = dict(CUSTOMER_SKETCH, distinct_error=args.distinct_error, share_error=args.share_error)
+        merchants, report = init_state(args.transfers, state_dir=args.state_dir, merchants_path=args.output,
+                                       chunksize=args.chunksize, approximate=approximate, graph_path=args.graph,
+                                       exclusions=exclusions)
+    else:
+        merchants, report = apply_delta(args.transfers, state_dir=args.state_dir, merchants_path=args.output,
+                                        chunksize=args.chunksize, graph_path=args.graph, exclusions=exclusions)
+    if args.csv:
+        write_merchants(merchants, args.csv)
+    print_report(report)
+    print(f"Wrote {len(merchants):,} merchants to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,291 @@
+"""
+Static Dashboard Export
+The whole dashboard as one self-contained HTML file, for serving from a CDN
+
+export_html() renders a dashboard summary (see tracker.summary) into a
+single page: header metrics, regional cards, all four tabs with every chart
+and the methodology text. Figure specs - every variant of each chart - are
+embedded in the page, and plotly.js is inlined, so the file needs no server
+and no other request. Tab and chart controls are a few lines of script that
+switch between the embedded specs; nothing is recomputed in the browser.
+
+The live Streamlit app is still the place for interactive analysis and the
+merchant address export, which needs the merchant rows.
+
+Usage:
+    python -m tracker.static                  # export the current dataset to output/dashboard.html
+    python -m tracker.static --summary output/dashboard_summary.json -o public/index.html
+    python -m tracker.static --plotlyjs cdn   # load plotly.js from its CDN (much smaller file)
+"""
+
+import argparse
+import html
+import json
+import os
+import re
+
+from tracker.page import (
+    AUTHOR_CREDIT, FOOTER, METHODOLOGY_BOX, METHODOLOGY_MARKDOWN, METHODOLOGY_TITLE, RANKING_TITLES,
+    REGIONS_TITLE, SECTIONS, SUBTITLE, TAB_LABELS, THEME_CSS, TITLE, adoption_row, chart_description,
+    cluster_rows, graph_cards, header_cards, merchant_leader_row, region_card,
+)
+from tracker.summary import read_summary
+
+STATIC_PATH = 'output/dashboard.html'
+PLOTLY_CDN = 'https://cdn.plot.ly/plotly-{version}.min.js'
+
+# Layout of the page outside the shared theme: Streamlit's wide layout, columns, tabs and radios
+PAGE_CSS = """
+<style>
+    body { margin: 0; background: #0a0a0a; color: #e0e0e0; font-family: 'IBM Plex Sans', sans-serif; }
+    .stApp { position: relative; max-width: 1600px; margin: 0 auto; padding: 1rem 5rem 3rem; }
+    .columns { display: grid; grid-template-columns: repeat(var(--columns), minmax(0, 1fr)); gap: 1rem; }
+    .tab-list { display: flex; gap: 2rem; border-bottom: 1px solid #222; margin: 1rem 0; }
+    .tab-list button { background: transparent; color: #666; border: none; border-bottom: 2px solid transparent;
+                       font: 600 1.1rem 'IBM Plex Sans', sans-serif; padding: 1rem 0; cursor: pointer; }
+    .tab-list button[aria-selected="true"] { color: #00ff88; border-bottom-color: #00ff88; }
+    .tab-panel[hidden] { display: none; }
+    .radio-group { display: flex; gap: 1rem; align-items: center; margin: 0.5rem 0 1rem; color: #999; }
+    .radio-group label { cursor: pointer; }
+    .data-table { width: 100%; border-collapse: collapse; margin: 1rem 0; font-size: 0.9rem; }
+    .data-table th, .data-table td { padding: 0.5rem; border-bottom: 1px solid #222; text-align: left; }
+    .data-table th { color: #999; font-weight: 600; }
+    .data-table td.number { text-align: right; font-variant-numeric: tabular-nums; }
+    hr { border: none; border-top: 1px solid #222; margin: 2rem 0; }
+</style>
+"""
+
+# Tabs, and radio controls that swap a chart to the spec of their current choices
+PAGE_SCRIPT = """
+const FIGURES = JSON.parse(document.getElementById('figures').textContent);
+const CONFIG = {responsive: true, displaylogo: false};
+
+function figureName(chart, params) {
+    return [chart].concat(Object.keys(params).sort().map(key => key + '=' + params[key])).join(';');
+}
+
+function drawChart(element) {
+    const params = {};
+    document.querySelectorAll(`input[data-chart="${element.dataset.chart}"]:checked`)
+        .forEach(input => { params[input.name.split(':')[1]] = input.value; });
+    const spec = FIGURES[figureName(element.dataset.chart, params)];
+    Plotly.react(element, spec.data, spec.layout, CONFIG);
+}
+
+function openTab(index) {
+    document.querySelectorAll('.tab-list button').forEach((button, i) => {
+        button.setAttribute('aria-selected', i === index);
+    });
+    document.querySelectorAll('.tab-panel').forEach((panel, i) => {
+        panel.hidden = i !== index;
+        // Charts are drawn once their tab is visible, so they size to it
+        if (i === index) panel.querySelectorAll('.chart').forEach(drawChart);
+    });
+}
+
+document.querySelectorAll('.tab-list button').forEach((button, i) => button.addEventListener('click', () => openTab(i)));
+document.querySelectorAll('input[data-chart]').forEach(input => input.addEventListener('change', () => {
+    drawChart(document.querySelector(`.chart[data-chart="${input.dataset.chart}"]`));
+}));
+openTab(0);
+"""
+
+
+def markdown_html(text):
+    """HTML for the small Markdown subset of the page texts: headings, lists and paragraphs"""
+    blocks, items, list_tag = [], [], None
+
+    def inline(line):
+        return re.sub(r'\*\*(.+?)\*\*', r'<strong>\1</strong>', html.escape(line, quote=False))
+
+    def close_list():
+        nonlocal items, list_tag
+        if items:
+            blocks.append(f'<{list_tag}>' + ''.join(f'<li>{item}</li>' for item in items) + f'</{list_tag}>')
+        items, list_tag = [], None
+
+    for line in text.strip().splitlines():
+        line = line.strip()
+        heading = re.match(r'(#{1,6}) (.*)', line)
+        item = re.match(r'(- |\d+\. )(.*)', line)
+        if item:
+            tag = 'ul' if item.group(1) == '- ' else 'ol'
+            if tag != list_tag:
+                close_list()
+                list_tag = tag
+            items.append(inline(item.group(2)))
+            continue
+        close_list()
+        if heading:
+            level = len(heading.group(1))
+            blocks.append(f'<h{level}>{inline(heading.group(2))}</h{level}>')
+        elif line:
+            blocks.append(f'<p>{inline(line)}</p>')
+    close_list()
+    return '\n'.join(blocks)
+
+
+def columns_html(cells, count):
+    return f'<div class="columns" style="--columns: {count}">' + ''.join(f'<div>{cell}</div>' for cell in cells) + '</div>'
+
+
+def section_html(chart):
+    title, description = SECTIONS[chart]
+    return f'<h3>{html.escape(title)}</h3>{chart_description(description)}'
+
+
+def radio_html(chart, param, options, label=None):
+    """Radio group choosing one parameter of a chart; options are (label, value) pairs"""
+    inputs = ''.join(
+        f'<label><input type="radio" name="{chart}:{param}" data-chart="{chart}" value="{html.escape(str(value))}"'
+        f'{" checked" if i == 0 else ""}> {html.escape(text)}</label>'
+        for i, (text, value) in enumerate(options)
+    )
+    caption = f'<span>{html.escape(label)}</span>' if label else ''
+    return f'<div class="radio-group">{caption}{inputs}</div>'
+
+
+def table_html(rows):
+    """Table of dict rows (the keys of the first are the headings); numbers are right-aligned"""
+    headings = list(rows[0])
+    head = ''.join(f'<th>{html.escape(heading)}</th>' for heading in headings)
+    body = ''.join(
+        '<tr>' + ''.join(
+            f'<td class="number">{row[heading]:,}</td>' if isinstance(row[heading], int)
+            else f'<td>{html.escape(str(row[heading]))}</td>'
+            for heading in headings) + '</tr>'
+        for row in rows
+    )
+    return f'<table class="data-table"><thead><tr>{head}</tr></thead><tbody>{body}</tbody></table>'
+
+
+def chart_html(chart):
+    return f'<div class="chart" data-chart="{chart}"></div>'
+
+
+def tab_panels(summary):
+    """HTML of the four tabs, in TAB_LABELS order"""
+    rankings, controls = summary['rankings'], summary['controls']
+
+    heatmap = chart_html('heatmap') + columns_html([
+        f"<h3>{RANKING_TITLES['top_adoption']}</h3>" + ''.join(adoption_row(row) for row in rankings['top_adoption']),
+        f"<h3>{RANKING_TITLES['merchant_leaders']}</h3>" + ''.join(merchant_leader_row(row) for row in rankings['merchant_leaders']),
+    ], 2)
+
+    regional = (
+        section_html('hourly')
+        + columns_html([
+            radio_html('hourly', 'weighting', [(w, w) for w in controls['hourly_weightings']], "Weight by"),
+            radio_html('hourly', 'time_basis', [(t, t) for t in controls['time_bases']], "Time basis"),
+        ], 2)
+        + chart_html('hourly')
+        + section_html('payment_sizes')
+        + radio_html('payment_sizes', 'statistic', list(controls['payment_statistics'].items()))
+        + chart_html('payment_sizes')
+    )
+
+    insights = (
+        section_html('customers_transactions') + chart_html('customers_transactions')
+        + section_html('activity') + chart_html('activity')
+    )
+    if summary.get('graph'):
+        insights += (section_html('customer_graph') + columns_html(graph_cards(summary['graph']), 4)
+                     + chart_html('customer_graph'))
+        if summary['graph']['top_clusters']:
+            insights += table_html(cluster_rows(summary['graph']))
+
+    methodology = f'<h3>{METHODOLOGY_TITLE}</h3>' + markdown_html(METHODOLOGY_MARKDOWN)
+    return [heatmap, regional, insights, methodology]
+
+
+def plotly_script(plotlyjs='inline'):
+    """plotly.js, inlined or loaded from its CDN"""
+    from plotly.offline import get_plotlyjs, get_plotlyjs_version
+
+    if plotlyjs == 'cdn':
+        return f'<script src="{PLOTLY_CDN.format(version=get_plotlyjs_version())}" charset="utf-8"></script>'
+    return f'<script type="text/javascript">{get_plotlyjs()}</script>'
+
+
+def export_html(summary, plotlyjs='inline'):
+    """The dashboard for one summary as a standalone HTML document"""
+    # Embedded as JSON data, never as markup: '</' could otherwise end the script element
+    figures = json.dumps(summary['figures'], separators=(',', ':')).replace('</', '<\\/')
+    tabs = ''.join(
+        f'<button type="button" aria-selected="{str(i == 0).lower()}">{html.escape(label)}</button>'
+        for i, label in enumerate(TAB_LABELS)
+    )
+    panels = ''.join(
+        f'<section class="tab-panel"{"" if i == 0 else " hidden"}>{panel}</section>'
+        for i, panel in enumerate(tab_panels(summary))
+    )
+
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<meta name="generator" content="merchant-tracker {summary['version']} ({summary['built_at']})">
+<title>TRON Merchant Analytics | Global Heatmap</title>
+{THEME_CSS}
+{PAGE_CSS}
+{plotly_script(plotlyjs)}
+</head>
+<body>
+<div class="stApp">
+{AUTHOR_CREDIT}
+<h1 class="main-title">{TITLE}</h1>
+<p class="subtitle">{SUBTITLE}</p>
+{METHODOLOGY_BOX}
+{columns_html(header_cards(summary['metrics']), 2)}
+<h3>{REGIONS_TITLE}</h3>
+{columns_html([region_card(card) for card in summary['regions']], 3)}
+<nav class="tab-list" role="tablist">{tabs}</nav>
+{panels}
+<hr>
+{FOOTER}
+</div>
+<script type="application/json" id="figures">{figures}</script>
+<script>{PAGE_SCRIPT}</script>
+</body>
+</html>
+"""
+
+
+def write_html(document, path=STATIC_PATH):
+    """Write the page atomically; returns its path"""
+    out_dir = os.path.dirname(path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+
+    partial = f'{path}.{os.getpid()}.tmp'
+    with open(partial, 'w', encoding='utf-8') as f:
+        f.write(document)
+    os.replace(partial, path)
+    return path
+
+
+def main(argv=None):
+    from tracker.dataset import MERCHANT_DATASET
+
+    parser = argparse.ArgumentParser(description="Export the dashboard as one self-contained HTML file")
+    parser.add_argument('source', nargs='?', default=MERCHANT_DATASET,
+                        help="dataset to summarize (ignored with --summary)")
+    parser.add_argument('--summary', help="prebuilt summary to export instead of summarizing the dataset")
+    parser.add_argument('-o', '--output', default=STATIC_PATH)
+    parser.add_argument('--plotlyjs', choices=['inline', 'cdn'], default='inline')
+    args = parser.parse_args(argv)
+
+    if args.summary:
+        summary = read_summary(args.summary)
+    else:
+        from tracker.summary import build_summary
+        summary = build_summary(args.source)
+
+    path = write_html(export_html(summary, args.plotlyjs), args.output)
+    print(f"Wrote dashboard for version {summary['version']} to {path} "
+          f"({os.path.getsize(path) / 2**20:,.1f} MiB, {len(summary['figures'])} figures)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Dashboard Summary
+Everything the dashboard shows for one dataset version, precomputed into one file
+
+build_summary() renders a dataset version headlessly: header metrics,
+regional cards, country rankings, the aggregate cube and the JSON spec of
+every figure the dashboard can show (each chart under each choice of its
+controls), plus the merchant-customer graph view when the pipeline saved a
+graph (tracker.graph). The dashboard's fast-start mode boots from this file alone, so a
+fresh replica imports neither pandas, numpy, pyarrow nor plotly.express
+and reads no merchant rows until a user asks for raw-row data.
+
+Reading a summary needs only the standard library; the modules that build
+one are imported by build_summary itself.
+
+Usage:
+    python -m tracker.summary                 # summarize the current dataset
+    python -m tracker.summary output/identified_merchants.csv -o output/dashboard_summary.json
+    MERCHANT_SUMMARY=output/dashboard_summary.json streamlit run app.py
+"""
+
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+SUMMARY_PATH = 'output/dashboard_summary.json'
+# Environment variable naming the summary the dashboard boots from
+SUMMARY_ENV = 'MERCHANT_SUMMARY'
+
+
+def figure_name(chart, **params):
+    """Name a figure is stored under: the chart plus its sorted parameters"""
+    return ';'.join([chart] + [f'{key}={value}' for key, value in sorted(params.items())])
+
+
+def build_summary(source, multiplier=None, graph_path=None):
+    """Summary of one dataset version as a JSON-ready dict
+
+    graph_path defaults to tracker.graph.GRAPH_PATH; a missing graph is left out.
+    """
+    import plotly.io as pio
+
+    from tracker.charts import (
+        MULTIPLIER, country_rankings, dashboard_controls, dashboard_figures, header_summary,
+        region_distribution,
+    )
+    from tracker.countries import apportion
+    from tracker.cube import CUBE_COLUMNS, load_cube
+    from tracker.export import export_controls
+    from tracker.graph import GRAPH_PATH, read_graph_view
+    from tracker.shared import MerchantSnapshot
+
+    multiplier = MULTIPLIER if multiplier is None else multiplier
+    snapshot = MerchantSnapshot.open(source)
+    cube = load_cube(snapshot)
+    country_df = apportion(region_distribution(cube), multiplier=multiplier)
+    graph_path = GRAPH_PATH if graph_path is None else graph_path
+    graph = read_graph_view(graph_path) if graph_path and os.path.exists(graph_path) else None
+
+    summary = {
+        'source': source,
+        'version': snapshot.version,
+        'cube_version': snapshot.version_of(CUBE_COLUMNS),
+        'built_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        **header_summary(cube, multiplier),
+        'rankings': country_rankings(country_df),
+        'controls': dashboard_controls(cube),
+        'export': export_controls(snapshot.table),
+        'cube': {col: cube[col].tolist() for col in cube.columns},
+        'graph': graph,
+        'figures': {},
+    }
+    for chart, params, build in dashboard_figures(snapshot, cube, multiplier, graph):
+        spec = json.loads(pio.to_json(build(), validate=False))
+        # The default template is left to the renderer, which themes it as the live app does
+        spec['layout'].pop('template', None)
+        summary['figures'][figure_name(chart, **params)] = spec
+    return summary
+
+
+def write_summary(summary, path=SUMMARY_PATH):
+    """Write a summary atomically; returns its path"""
+    out_dir = os.path.dirname(path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+
+    partial = f'{path}.{os.getpid()}.tmp'
+    with open(partial, 'w') as f:
+        json.dump(summary, f, separators=(',', ':'))
+    os.replace(partial, path)
+    return path
+
+
+def read_summary(path=SUMMARY_PATH):
+    with open(path) as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    from tracker.dataset import MERCHANT_DATASET
+
+    parser = argparse.ArgumentParser(description="Precompute everything the dashboard shows for a dataset version")
+    parser.add_argument('source', nargs='?', default=MERCHANT_DATASET)
+    parser.add_argument('-o', '--output', default=SUMMARY_PATH)
+    parser.add_argument('--graph', help="Merchant-customer graph to include (default: output/customer_graph.npz)")
+    args = parser.parse_args(argv)
+
+    start = time.time()
+    summary = build_summary(args.source, graph_path=args.graph)
+    path = write_summary(summary, args.output)
+    print(f"Wrote {len(summary['figures'])} figures for version {summary['version']} to {path} "
+          f"({os.path.getsize(path) / 2**10:,.0f} KiB, {time.time() - start:.1f}s)")
+
+
+if __name__ == '__main__':
+    main()